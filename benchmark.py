@@ -0,0 +1,254 @@
+"""Benchmarks for the simulation, file and editor hot paths.
+
+Runs every synthetic circuit from engine.generators through the headless
+engines and, when PySide6 is available, through LogicCircuitEditor on the
+offscreen Qt platform. Results are written as JSON so two runs can be compared.
+
+    python benchmark.py -o results.json
+    python benchmark.py --scale 0.1 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from engine.binary_format import load_binary, save_binary
+from engine.bitsim import BitSimulator
+from engine.codegen import compile_scalar
+from engine.event_sim import EventSimulator
+from engine.generators import GENERATORS
+from engine.json_stream import load_circuit
+from engine.levelize import levelize
+from engine.netlist import Netlist, HIGH, UNKNOWN
+from engine.optimize import optimize
+from engine.timing import TimedSimulator
+from engine.truth_table import primary_inputs
+
+# Generator argument at scale 1
+SIZES = {
+    'adder': 64,
+    'chain': 10000,
+    'and_tree': 4096,
+    'or_tree': 4096,
+    'wide_and': 4096,  # one gate with every input, past what a single generated expression can hold
+    'random_dag': 10000,
+    'ring': 101,
+    'bus_pipeline': 1000,
+}
+
+
+def measure(fn, setup=None, repeat=5):
+    times = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+
+    return {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def _fresh(netlist: Netlist) -> Netlist:
+    netlist.state[:] = bytes([UNKNOWN]) * netlist.n_gates
+    netlist.words.clear()
+    return netlist
+
+
+def bench_headless(name: str, netlist: Netlist, repeat: int) -> dict:
+    data = netlist.serialize()
+    results = {
+        "serialize": measure(netlist.serialize, repeat=repeat),
+        "deserialize": measure(lambda: Netlist.deserialize(data), repeat=repeat),
+        "levelize": measure(lambda: levelize(netlist), repeat=repeat),
+        "event_settle": measure(lambda sim: sim.step(), lambda: EventSimulator(_fresh(netlist)), repeat),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "circuit.json")
+        binary_path = os.path.join(tmp, "circuit.lcb")
+        netlist.save(json_path)
+        save_binary(netlist, binary_path)
+        results["json_stream_load"] = measure(lambda: load_circuit(json_path), repeat=repeat)
+        results["binary_save"] = measure(lambda: save_binary(netlist, binary_path), repeat=repeat)
+        results["binary_load"] = measure(lambda: load_binary(binary_path), repeat=repeat)
+
+    simulator = EventSimulator(netlist)
+    simulator.step()
+    results["event_idle_tick"] = measure(simulator.step, repeat=repeat)
+
+    def edit_setup():
+        # Settled copy, so only the edit's fan-out cone is left to simulate
+        edited = EventSimulator(netlist.copy())
+        edited.step()
+        return edited
+
+    def edit(sim):
+        gid = sim.netlist.add_gate("NotGate")
+        sim.netlist.add_wire(gid - 1, gid)
+        sim.netlist.add_wire(gid, gid // 2)
+        sim.step()
+
+    results["event_edit_resettle"] = measure(edit, edit_setup, repeat)
+
+    def timed_toggle_setup():
+        # Settled circuit with every primary input about to go high; oscillators are cut off
+        timed = TimedSimulator(_fresh(netlist))
+        timed.run(until=10000)
+        for gid in primary_inputs(netlist):
+            timed.drive(gid, HIGH)
+        return timed
+
+    results["timed_toggle"] = measure(lambda sim: sim.run(until=sim.now + 10000), timed_toggle_setup, repeat)
+
+    width = 4096
+    rng = random.Random(0)
+    stimuli = {gid: rng.getrandbits(width) for gid in primary_inputs(netlist)}
+    bit_simulator = BitSimulator(netlist)
+    results[f"bitsim_{width}_vectors"] = measure(lambda: bit_simulator.run(stimuli, width), repeat=repeat)
+
+    results["optimize"] = measure(lambda: optimize(netlist, stimuli), repeat=repeat)
+    optimized_simulator = BitSimulator(netlist, optimized=True)
+    results[f"bitsim_{width}_vectors_optimized"] = measure(lambda: optimized_simulator.run(stimuli, width),
+                                                           repeat=repeat)
+    codegen_simulator = BitSimulator(netlist, codegen=True)
+    codegen_simulator.run(stimuli, width)  # compiled once, outside the measurement
+    results[f"bitsim_{width}_vectors_codegen"] = measure(lambda: codegen_simulator.run(stimuli, width),
+                                                         repeat=repeat)
+
+    settle = compile_scalar(netlist)
+    results["codegen_settle"] = measure(lambda state: settle(state), lambda: bytearray([UNKNOWN]) * netlist.n_gates,
+                                        repeat)
+
+    return {f"{name}.{key}": value for key, value in results.items()}
+
+
+def bench_editor(name: str, netlist: Netlist, repeat: int) -> dict:
+    from editor import LogicCircuitEditor
+
+    data = netlist.serialize()
+    editor = LogicCircuitEditor()
+    editor.sim_timer.stop()
+
+    results = {
+        "editor_deserialize": measure(lambda: editor.deserialize(data), repeat=repeat),
+        "editor_serialize": measure(editor.serialize, repeat=repeat),
+        "editor_settle": measure(lambda _: editor.simulation_step(), lambda: editor.deserialize(data), repeat),
+    }
+
+    # Drag the gate with the most connected wires
+    gate = max(editor.gates, key=lambda g: len(g.connected_inputs) + len(g.connected_outputs))
+    origin = gate.pos()
+
+    def drag():
+        for dx in range(100):
+            gate.setPos(origin.x() + dx, origin.y())
+            editor.flush_moves()  # one frame per move
+
+    results["drag_redraw_100_moves"] = measure(drag, repeat=repeat)
+
+    # Move a rubber-band selection of up to 500 gates, as Qt does for a drag of selected items
+    selection = editor.gates[:500]
+    for item in selection:
+        item.setSelected(True)
+
+    def drag_selection():
+        for _ in range(100):
+            for item in selection:
+                item.moveBy(1, 0)
+            editor.flush_moves()
+        editor.journal.checkpoint()
+
+    results["drag_selection_100_moves"] = measure(drag_selection, repeat=repeat)
+
+    # Snap queries around the input ports of up to 1000 gates, as the pointer moves over them
+    netlist = editor.netlist
+    spots = [(netlist.xs[gid] + 3, netlist.ys[gid] + 28) for gid in list(netlist.gate_ids())[:1000]]
+    results["port_snap_1000_queries"] = measure(lambda: [editor.port_near(x, y) for x, y in spots], repeat=repeat)
+    editor.deleteLater()
+
+    return {f"{name}.{key}": value for key, value in results.items()}
+
+
+def run(scale: float, repeat: int, gui: bool) -> dict:
+    results = {}
+    app = None
+
+    if gui:
+        try:
+            from PySide6.QtWidgets import QApplication
+            app = QApplication.instance() or QApplication(sys.argv)
+        except ImportError:
+            print("PySide6 not available, skipping editor benchmarks", file=sys.stderr)
+
+    for name, generator in GENERATORS.items():
+        size = max(1, int(SIZES[name] * scale))
+        if name == 'ring':
+            size |= 1
+        netlist = generator(size)
+        print(f"{name}({size}): {netlist.n_gates} gates, {netlist.n_wires} wires", file=sys.stderr)
+
+        results.update(bench_headless(name, netlist, repeat))
+        if app is not None:
+            results.update(bench_editor(name, netlist, repeat))
+
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(baseline: dict, current: dict):
+    print(f"{'benchmark':<45} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for key, value in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        ratio = value["min"] / old["min"] if old["min"] else float('inf')
+        print(f"{key:<45} {old['min'] * 1000:>10.3f}ms {value['min'] * 1000:>10.3f}ms {ratio:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Logic circuit simulator benchmarks')
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against an earlier results file')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier for the circuit sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-gui', action='store_true', help='skip the editor benchmarks')
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": args.scale,
+        },
+        "results": run(args.scale, args.repeat, not args.no_gui),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    elif not args.output:
+        json.dump(report, sys.stdout, indent=4)
+
+
+if __name__ == "__main__":
+    main()
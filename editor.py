@@ -1,24 +1,65 @@
-from PySide6.QtCore import QTimer, Qt
-from PySide6.QtGui import QPen
+from PySide6.QtCore import QTimer, Qt, Signal, QRectF
+from PySide6.QtGui import QPen, QColor, QFont
 from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsEllipseItem, QGraphicsLineItem
 
-from gate_item import GateItem
+from engine.binary_format import is_binary, load_binary, save_binary
+from engine.event_sim import EventSimulator
+from engine.journal import Journal
+from engine.json_stream import load_circuit
+from engine.netlist import Netlist, to_bool
+from engine.optimize import OptimizedSimulator
+from engine.profiler import SimulationProfiler
+from engine.subcircuit import is_internal_wire, owner
+from engine.timing import TimedSimulator
+from engine.waveform import WaveformRecorder
+from engine.worker import SimulationWorker
+from gate_item import GateItem, LOD_THRESHOLD
 from gates.and_gate import AndGate
+import gates.bus_gates  # gives every bus width an item class
 from gates.false_gate import FalseGate
 from gates.led_gate import LEDGate
 from gates.not_gate import NotGate
 from gates.or_gate import OrGate
+import gates.subcircuit_gate  # gives every subcircuit definition an item class
 from gates.true_gate import TrueGate
+from port_index import PortIndex
+from virtual_scene import VirtualScene
 from wire_item import WireItem
 
+# Distance in view pixels within which a click or a dragged wire snaps to a port
+SNAP_RADIUS = 12
+
 
 class LogicCircuitEditor(QGraphicsView):
+    # Emitted with the ids of gates that did not settle within the delta cap
+    oscillation_detected = Signal(list)
+    # Emitted by the timed simulation with the settle time and the critical path as (gate id, time) pairs
+    timing_settled = Signal(int, list)
+
     def __init__(self):
         super().__init__()
         self.setMouseTracking(True)
+        self.setDragMode(QGraphicsView.DragMode.RubberBandDrag)
         self.scene = QGraphicsScene()
         self.setScene(self.scene)
 
+        self.netlist = Netlist()
+        self.simulator = EventSimulator(self.netlist, max_deltas=1000)
+        self.gate_items = {}  # gate id -> GateItem
+
+        # Labels are only shown while zoomed in past LOD_THRESHOLD
+        self.show_detail = True
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+
+        # Virtualized mode: items exist only for gates around the viewport
+        self.virtual = None
+        self.horizontalScrollBar().valueChanged.connect(self._viewport_changed)
+        self.verticalScrollBar().valueChanged.connect(self._viewport_changed)
+
+        # Port positions for hit-testing and snapping, following the netlist like the virtual scene
+        self.ports = PortIndex(self)
+        self.snap_marker = None
+
         self.gates = [
             AndGate(50, 50, self),
             OrGate(250, 100, self),
@@ -30,26 +71,317 @@ class LogicCircuitEditor(QGraphicsView):
         for gate in self.gates:
             self.scene.addItem(gate)
 
+        # Undo/redo and autosave; undo and redo edit the netlist, _sync_items follows with the items
+        self.journal = Journal(self.netlist)
+        self.netlist.observers.append(self._sync_items)
+        self.autosave_timer = QTimer()
+        self.autosave_timer.timeout.connect(self.journal.autosave)
+
+        # Gates moved since the last frame; their wires and netlist positions are updated together
+        self._moved = {}  # gate id -> GateItem
+        self.move_timer = QTimer()
+        self.move_timer.setSingleShot(True)
+        self.move_timer.timeout.connect(self.flush_moves)
+        self.frame_interval = 16
+
         # Wiring tool state
-        self.pending_endpoint = None  # (gate, point_type)
+        self.pending_endpoint = None  # (gate, point_type, port)
         self.temp_line = None  # temporary line while dragging
         self.current_tool = "Pointer"
 
+        # Profiling is off unless enabled; the HUD needs it on
+        self.profiler = None
+        self.hud_visible = False
+
+        # The simulation only runs while there is work: edits wake it, long settles are
+        # time-sliced to frame_budget seconds per event-loop pass, and oscillating loops
+        # keep ticking every oscillation_interval ms
+        self.frame_budget = 0.008
+        self.oscillation_interval = 50
+
+        # Timed simulation advances time_slice units every timed_interval ms, so changes can be watched
+        self.gate_delays = {}
+        self.time_slice = 1
+        self.timed_interval = 16
+        self._timing_pending = False
+
+        # Waveform capture of the state changes made by the simulation, see start_recording()
+        self.recorder = None
+
         self.sim_timer = QTimer()
+        self.sim_timer.setSingleShot(True)
         self.sim_timer.timeout.connect(self.simulation_step)
-        self.sim_timer.start(50)
+
+        # Background simulation: the worker settles its own copy of the netlist and the
+        # GUI only applies the state diffs it publishes
+        self.worker = None
+        self._worker_epoch = 0
+        self.diff_timer = QTimer()
+        self.diff_timer.timeout.connect(self._apply_worker_diff)
+
+        self.wake_simulation()
+
+    def wake_simulation(self):
+        if self.worker is None and not self.sim_timer.isActive():
+            self.sim_timer.start(0)
+
+    def gate_moved(self, gate: GateItem):
+        self._moved[gate.gate_id] = gate
+        if not self.move_timer.isActive():
+            self.move_timer.start(self.frame_interval)
+
+    def flush_moves(self):
+        """Apply the gate moves made since the last frame to the netlist and the wires, each wire once."""
+        self.move_timer.stop()
+        moved, self._moved = self._moved, {}
+        if not moved:
+            return
+
+        profiler = self.profiler
+        if profiler is None:
+            self._apply_moves(moved)
+        else:
+            with profiler.section('wire_update'):
+                self._apply_moves(moved)
+
+    def _apply_moves(self, moved: dict):
+        netlist = self.netlist
+        wires = set()
+        for gid, gate in moved.items():
+            if self.gate_items.get(gid) is not gate:
+                continue  # removed since
+            x, y = gate.x(), gate.y()
+            if (netlist.xs[gid], netlist.ys[gid]) != (x, y):
+                netlist.move_gate(gid, x, y)
+            wires.update(gate.wires())
+
+        for wire in wires:
+            wire.update_position()
+
+    def undo(self):
+        self._handle_wiring_event_cancel()
+        self.flush_moves()
+        if self.journal.undo():
+            self.wake_simulation()
+
+    def redo(self):
+        self._handle_wiring_event_cancel()
+        self.flush_moves()
+        if self.journal.redo():
+            self.wake_simulation()
+
+    def enable_autosave(self, directory: str, interval: int = 30000):
+        self.journal.enable_autosave(directory)
+        self.autosave_timer.start(interval)
+
+    def _sync_items(self, command: tuple):
+        if not self.journal.replaying:
+            return  # edits made through the items already have them
+
+        name = command[0]
+        if name == 'move_gate':
+            gate = self.gate_items.get(command[1])
+            if gate is not None and (gate.x(), gate.y()) != (command[2], command[3]):
+                gate.setPos(command[2], command[3])
+        elif self.virtual is not None:
+            return  # the virtual scene follows the netlist on its own
+        elif name == 'restore_gate':
+            gid = command[1]
+            if owner(self.netlist, gid) == gid:  # other subcircuit pins come with their first one
+                gate = GateItem.registry[self.netlist.type_name(gid)](self.netlist.xs[gid], self.netlist.ys[gid],
+                                                                     self, gate_id=gid)
+                self.gates.append(gate)
+                self.scene.addItem(gate)
+        elif name == 'remove_gate':
+            gate = self.gate_items.pop(command[1], None)
+            if gate is not None:
+                self.gates.remove(gate)
+                self.scene.removeItem(gate)
+        elif name == 'add_wire' and not is_internal_wire(self.netlist, command[1], command[2]):
+            self._add_wire_item(command[1], command[2])
+        elif name == 'remove_wire' and not is_internal_wire(self.netlist, command[1], command[2]):
+            _, src_id, dst_id = command
+            src = self.gate_items[owner(self.netlist, src_id)]
+            wire = next(w for w in src.connected_outputs if w.src_id == src_id and w.dst_id == dst_id)
+            src.connected_outputs.remove(wire)
+            wire.dst_gate.connected_inputs.remove(wire)
+            self.scene.removeItem(wire)
+
+    def _add_wire_item(self, src_id: int, dst_id: int):
+        netlist = self.netlist
+        wire = WireItem(self.gate_items[owner(netlist, src_id)], self.gate_items[owner(netlist, dst_id)], self,
+                        mirror=True, src_id=src_id, dst_id=dst_id)
+        self.scene.addItem(wire)
+
+    def set_threaded(self, enabled: bool):
+        if enabled and self.worker is None:
+            self.sim_timer.stop()
+            self.worker = SimulationWorker(self.netlist, max_deltas=self.simulator.max_deltas)
+            self._worker_epoch = 0
+            self.netlist.observers.append(self.worker.submit)
+            self.worker.start()
+            self.diff_timer.start(16)
+        elif not enabled and self.worker is not None:
+            self.netlist.observers.remove(self.worker.submit)
+            self.worker.stop()
+            self.diff_timer.stop()
+            self._apply_worker_diff()
+
+            # Hand the settled state back to the in-process simulator
+            self.netlist.state[:] = self.worker.netlist.state
+            self.netlist.words = dict(self.worker.netlist.words)
+            self.worker = None
+            self.simulator.schedule_all()
+            self.wake_simulation()
+
+    @property
+    def timed(self) -> bool:
+        return isinstance(self.simulator, TimedSimulator)
+
+    def set_simulation_mode(self, mode: str):
+        """'event' (zero delay), 'optimized' (zero delay on the optimized circuit) or 'timed'."""
+        simulators = {'event': EventSimulator, 'optimized': OptimizedSimulator, 'timed': TimedSimulator}
+        if type(self.simulator) is simulators[mode]:
+            return
+
+        profiler, max_deltas = self.simulator.profiler, self.simulator.max_deltas
+        if mode == 'timed':
+            self.simulator = TimedSimulator(self.netlist, self.gate_delays, max_deltas)
+            self.simulator.time_slice = self.time_slice
+        else:
+            self.simulator = simulators[mode](self.netlist, max_deltas)
+        self.simulator.profiler = profiler
+        self.simulator.schedule_all()
+        self._timing_pending = False
+        self.wake_simulation()
+
+    def set_gate_delays(self, delays: dict):
+        """(rise, fall) per gate type name, for the timed simulation."""
+        self.gate_delays = dict(delays)
+        if self.timed:
+            self.simulator.set_delays(self.gate_delays)
+            self.wake_simulation()
+
+    def start_recording(self, gate_ids=None, capacity: int = 1 << 20) -> WaveformRecorder:
+        """Record the given gates (every gate if None) from now on, replacing any earlier recording."""
+        self.recorder = WaveformRecorder(self.netlist, gate_ids, capacity, self._record_time() or 0)
+        return self.recorder
+
+    def stop_recording(self):
+        self.recorder = None
+
+    def _record_time(self):
+        # Simulated time when timed, otherwise the recorder counts simulation steps
+        return self.simulator.now if self.timed else None
+
+    def _apply_worker_diff(self):
+        epoch, diff = self.worker.take_diff()
+        if epoch != self._worker_epoch:
+            return
+
+        for gid, value in diff.items():
+            gate = self.gate_items.get(gid)
+            if gate is not None:
+                gate.state = to_bool(value)
+                gate.update_graphics()
+
+        if self.recorder is not None and diff:
+            # The recorder reads the GUI netlist, whose state otherwise lags behind the worker's
+            state = self.netlist.state
+            for gid, value in diff.items():
+                if gid < len(state):
+                    state[gid] = value
+            self.recorder.record(diff)
+
+        if self.worker.oscillating:
+            self.oscillation_detected.emit(self.worker.oscillating)
 
     def simulation_step(self):
-        changed = False
-        for gate in self.gates:
-            new_state = gate.compute_output()  # pure function
-            if new_state != gate.state:
-                gate.state = new_state
+        changed = self.simulator.step(self.frame_budget)
+        if self.recorder is not None:
+            self.recorder.record(changed, self._record_time())
+
+        if self.profiler is None:
+            self._update_gate_graphics(changed)
+        else:
+            with self.profiler.section('update_graphics'):
+                self._update_gate_graphics(changed)
+            if self.hud_visible:
+                self.viewport().update()
+
+        if self.simulator.oscillating:
+            self.oscillation_detected.emit(self.simulator.oscillating)
+
+        if self.timed:
+            self._timing_pending |= bool(changed)
+            if self._timing_pending and not self.simulator.busy:
+                self._timing_pending = False
+                self.timing_settled.emit(self.simulator.settle_time, self.simulator.critical_path())
+
+        if self.simulator.settling:
+            self.sim_timer.start(self.timed_interval if self.timed else 0)
+        elif self.simulator.busy:
+            self.sim_timer.start(self.oscillation_interval)
+
+    def _update_gate_graphics(self, gate_ids):
+        gate_items = self.gate_items
+        for gid in gate_ids:
+            gate = gate_items.get(gid)
+            if gate is not None:  # not materialized in a virtualized scene
+                gate.state = self.netlist.get_state(gid)
                 gate.update_graphics()
-                changed = True
-        # Optionally: loop until stable (important for feedback)
-        if changed:
-            self.simulation_step()
+
+    def enable_profiling(self, track_hot_gates: bool = False) -> SimulationProfiler:
+        if self.profiler is None:
+            self.profiler = SimulationProfiler(track_hot_gates)
+            self.simulator.profiler = self.profiler
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
+        self.simulator.profiler = None
+        self.set_hud_visible(False)
+
+    def set_hud_visible(self, visible: bool):
+        if visible:
+            self.enable_profiling(track_hot_gates=True)
+        self.hud_visible = visible
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        if self.profiler is None:
+            return super().paintEvent(event)
+
+        with self.profiler.section('paint'):
+            return super().paintEvent(event)
+
+    def drawForeground(self, painter, rect):
+        super().drawForeground(painter, rect)
+        if not self.hud_visible or self.profiler is None:
+            return
+
+        profiler = self.profiler
+        last = profiler.last
+        lines = [
+            f"ticks {profiler.ticks}   last {last.wall_time * 1000:.2f} ms",
+            f"evaluated {last.evaluated}   changed {last.changed}",
+            f"iterations {last.iterations}   loop sweeps {last.loop_sweeps}",
+            f"simulate {profiler.totals['wall_time'] * 1000:.1f} ms total",
+        ]
+        lines += [f"{name} {seconds * 1000:.1f} ms total" for name, seconds in sorted(profiler.sections.items())]
+        lines += [f"{name}: {count}" for name, count in profiler.type_histogram.most_common()]
+        lines += [f"hot gate {gid} ({self.netlist.type_name(gid)}): {count}" for gid, count in profiler.hot_gates(5)]
+
+        # Draw in viewport coordinates so the overlay ignores zoom and scroll
+        painter.save()
+        painter.resetTransform()
+        painter.setFont(QFont("monospace", 9))
+        line_height = painter.fontMetrics().height()
+        painter.fillRect(8, 8, 300, line_height * len(lines) + 8, QColor(0, 0, 0, 160))
+        painter.setPen(Qt.GlobalColor.white)
+        for i, line in enumerate(lines):
+            painter.drawText(14, 12 + line_height * (i + 1) - painter.fontMetrics().descent(), line)
+        painter.restore()
 
     def _handle_wiring_event(self, item: QGraphicsEllipseItem):
         point_type = item.data(0)
@@ -58,18 +390,15 @@ class LogicCircuitEditor(QGraphicsView):
         if isinstance(gate, GateItem):
             # Step 1: First click (either output OR input)
             if self.pending_endpoint is None:
-                self.pending_endpoint = (gate, point_type)
-                item.setBrush(Qt.GlobalColor.green)
-
-                if point_type == "output":
-                    start = gate.output_point.sceneBoundingRect().center()
-                elif point_type == "input":
-                    start = gate.input_point.sceneBoundingRect().center()
-                else:
+                if point_type not in ("output", "input"):
                     return
 
+                self.pending_endpoint = (gate, point_type, item)
+                item.setBrush(Qt.GlobalColor.green)
+                x, y = gate.port_pos(self._port_gate(gate, item), point_type)
+
                 # Start temporary dashed wire
-                self.temp_line = QGraphicsLineItem(start.x(), start.y(), start.x(), start.y())
+                self.temp_line = QGraphicsLineItem(x, y, x, y)
                 self.temp_line.setZValue(-1)  # behind all interactive items
                 self.temp_line.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
                 self.temp_line.setPen(QPen(Qt.GlobalColor.darkGray, 2, Qt.PenStyle.DashLine))
@@ -77,37 +406,52 @@ class LogicCircuitEditor(QGraphicsView):
                 return
 
             # Step 2: Second click must be the opposite type
-            prev_gate, prev_type = self.pending_endpoint
+            prev_gate, prev_type, prev_port = self.pending_endpoint
             if prev_type != point_type:  # only allow input→output or output→input
                 if prev_type == "output" and point_type == "input":
                     src_gate, dst_gate = prev_gate, gate
+                    src_port, dst_port = prev_port, item
                 elif prev_type == "input" and point_type == "output":
                     src_gate, dst_gate = gate, prev_gate
+                    src_port, dst_port = item, prev_port
                 else:
                     return
 
-                if len(src_gate.connected_outputs) >= src_gate.n_outputs:
+                src_id, dst_id = self._port_gate(src_gate, src_port), self._port_gate(dst_gate, dst_port)
+
+                if len(self.netlist.fanout(src_id)) >= src_gate.n_outputs:
                     self._handle_wiring_event_cancel()
                     return
 
-                if len(dst_gate.connected_inputs) >= dst_gate.n_inputs:
+                if len(self.netlist.fanin(dst_id)) >= dst_gate.n_inputs:
                     self._handle_wiring_event_cancel()
                     return
 
-                wire = WireItem(src_gate, dst_gate, self)
-                self.scene.addItem(wire)
+                with self.journal.action():
+                    if self.virtual is not None:
+                        # Wires of a virtualized scene are drawn by its wire layer
+                        self.netlist.add_wire(src_id, dst_id)
+                    else:
+                        wire = WireItem(src_gate, dst_gate, self, src_id=src_id, dst_id=dst_id)
+                        self.scene.addItem(wire)
+                self.wake_simulation()
 
         self._handle_wiring_event_cancel()
 
+    @staticmethod
+    def _port_gate(gate: GateItem, port: QGraphicsEllipseItem) -> int:
+        # Subcircuit ports carry their pin index; every other item has one gate
+        return gate.gate_id + (port.data(1) or 0)
+
     def _handle_wiring_event_cancel(self):
         # Clicked elsewhere → cancel
         if self.pending_endpoint:
-            gate, io_type = self.pending_endpoint
+            gate, io_type, port = self.pending_endpoint
 
             if io_type == "output":
-                gate.output_point.setBrush(Qt.GlobalColor.red)
+                port.setBrush(Qt.GlobalColor.red)
             elif io_type == "input":
-                gate.input_point.setBrush(Qt.GlobalColor.blue)
+                port.setBrush(Qt.GlobalColor.blue)
 
             self.pending_endpoint = None
 
@@ -115,16 +459,56 @@ class LogicCircuitEditor(QGraphicsView):
                 self.scene.removeItem(self.temp_line)
                 self.temp_line = None
 
+    def _wanted_port_kind(self):
+        # Once a wire is started only ports of the other kind can finish it
+        if self.pending_endpoint is None:
+            return None
+        return "input" if self.pending_endpoint[1] == "output" else "output"
+
+    def port_near(self, x: float, y: float, kind: str = None):
+        """(gate id, kind) of the port a click at these scene coordinates snaps to, or None."""
+        return self.ports.nearest(x, y, SNAP_RADIUS / self.transform().m11(), kind)
+
+    def _show_snap(self, hit):
+        if hit is None:
+            if self.snap_marker is not None:
+                self.snap_marker.hide()
+            return
+
+        if self.snap_marker is None:
+            self.snap_marker = QGraphicsEllipseItem(-8, -8, 16, 16)
+            self.snap_marker.setPen(QPen(Qt.GlobalColor.green, 2))
+            self.snap_marker.setZValue(2)
+            self.snap_marker.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+            self.scene.addItem(self.snap_marker)
+        self.snap_marker.setPos(*self.ports.position(*hit))
+        self.snap_marker.show()
+
+    def _drop_scene_items(self):
+        self.scene.clear()
+        self.snap_marker = None
+        self.gates.clear()
+        self.gate_items.clear()
+
     def mousePressEvent(self, event):
         pos = event.position().toPoint()
-        item = self.itemAt(pos)
 
         if self.current_tool == "Pointer":
-            if isinstance(item, QGraphicsEllipseItem):
-                self._handle_wiring_event(item)
+            scene_pos = self.mapToScene(pos)
+            hit = self.port_near(scene_pos.x(), scene_pos.y(), self._wanted_port_kind())
+            gate = self.gate_items.get(owner(self.netlist, hit[0])) if hit is not None else None
+            if gate is not None:
+                self._handle_wiring_event(gate.port_point(*hit))
                 return
 
             self._handle_wiring_event_cancel()
+        elif self.current_tool == "Wire Cutter" and self.virtual is not None:
+            scene_pos = self.mapToScene(pos)
+            wire = self.virtual.wire_at(scene_pos.x(), scene_pos.y())
+            if wire is not None:
+                with self.journal.action():
+                    self.netlist.remove_wire(*wire)
+                self.wake_simulation()
         elif self.current_tool.startswith("GATE_"):
             scene_pos = self.mapToScene(event.position().toPoint())
 
@@ -137,84 +521,140 @@ class LogicCircuitEditor(QGraphicsView):
                 'GATE_NOT': NotGate,
             }
 
-            gate = possible_gates.get(self.current_tool)
-            new_gate = gate(int(scene_pos.x() - 40), int(scene_pos.y() - 20), self)
+            gate = possible_gates.get(self.current_tool) or GateItem.registry[self.current_tool[len('GATE_'):]]
+            with self.journal.action():
+                new_gate = gate(int(scene_pos.x() - 40), int(scene_pos.y() - 20), self)
 
             self.gates.append(new_gate)
             self.scene.addItem(new_gate)
+            self.wake_simulation()
 
         super().mousePressEvent(event)
 
-    def mouseMoveEvent(self, event):
-        """Update temporary wire while dragging"""
-        if self.pending_endpoint and self.temp_line:
-            gate, io_type = self.pending_endpoint
+    def mouseReleaseEvent(self, event):
+        # A drag ends here, with every gate it moved in one undo step; the next move is a new one
+        super().mouseReleaseEvent(event)
+        self.flush_moves()
+        self.journal.checkpoint()
 
-            if io_type == "output":
-                start = gate.output_point.sceneBoundingRect().center()
-                end = self.mapToScene(event.position().toPoint())
-            else:
-                start = self.mapToScene(event.position().toPoint())
-                end = gate.input_point.sceneBoundingRect().center()
+    def mouseMoveEvent(self, event):
+        """Highlight the port under the cursor and update the temporary wire, snapped to it"""
+        scene_pos = self.mapToScene(event.position().toPoint())
+        hit = None
+        if self.current_tool == "Pointer":
+            hit = self.port_near(scene_pos.x(), scene_pos.y(), self._wanted_port_kind())
+        self._show_snap(hit)
 
-            self.temp_line.setLine(start.x(), start.y(), end.x(), end.y())
+        if self.pending_endpoint and self.temp_line:
+            gate, io_type, port = self.pending_endpoint
+            x1, y1 = gate.port_pos(self._port_gate(gate, port), io_type)
+            x2, y2 = self.ports.position(*hit) if hit is not None else (scene_pos.x(), scene_pos.y())
+            if io_type == "input":
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            self.temp_line.setLine(x1, y1, x2, y2)
 
         super().mouseMoveEvent(event)
 
-    def serialize(self):
-        gates_data = []
-        wires_data = []
+    def wheelEvent(self, event):
+        factor = 1.15 ** (event.angleDelta().y() / 120)
+        self.scale(factor, factor)
+        self._update_detail()
+        self._viewport_changed()
 
-        for i, gate in enumerate(self.gates):
-            gates_data.append({
-                "id": i,
-                "type": gate.__class__.__name__,
-                "x": gate.pos().x(),
-                "y": gate.pos().y()
-            })
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._viewport_changed()
 
-        # Give each gate a unique id
-        gate_to_id = {gate: i for i, gate in enumerate(self.gates)}
+    def _viewport_changed(self):
+        if self.virtual is not None:
+            self.virtual.refresh()
 
+    def set_virtualized(self, enabled: bool):
+        if enabled == (self.virtual is not None):
+            return
+
+        self._handle_wiring_event_cancel()
+        self.flush_moves()
+        if enabled:
+            # Drop the mirror items without touching the netlist
+            self._drop_scene_items()
+            self.virtual = VirtualScene(self)
+            self.virtual.refresh()
+        else:
+            self.virtual.detach()
+            self.virtual = None
+            self.scene.setSceneRect(QRectF())
+            self._mirror_netlist()
+
+    def _mirror_netlist(self):
+        netlist = self.netlist
+        scene = self.scene
+
+        # Build the scene's BSP index and repaint once at the end, not after every item
+        self.setUpdatesEnabled(False)
+        scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+        try:
+            for gid in netlist.gate_ids():
+                if owner(netlist, gid) != gid:
+                    continue  # created along with the first pin of its subcircuit
+                gate_cls = GateItem.registry[netlist.type_name(gid)]
+                gate = gate_cls(netlist.xs[gid], netlist.ys[gid], self, gate_id=gid)
+                self.gates.append(gate)
+                scene.addItem(gate)
+
+            for src, dst in zip(netlist.wire_src, netlist.wire_dst):
+                if not is_internal_wire(netlist, src, dst):
+                    self._add_wire_item(src, dst)
+        finally:
+            scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.BspTreeIndex)
+            self.setUpdatesEnabled(True)
+
+    def _update_detail(self):
+        show_detail = self.transform().m11() >= LOD_THRESHOLD
+        if show_detail == self.show_detail:
+            return
+
+        self.show_detail = show_detail
         for gate in self.gates:
-            for wire in gate.connected_outputs:
-                wires_data.append({
-                    "src": gate_to_id[wire.src_gate],
-                    "dst": gate_to_id[wire.dst_gate]
-                })
+            if gate.label is not None:
+                gate.label.setVisible(show_detail)
 
-        return {
-            "gates": gates_data,
-            "wires": wires_data
-        }
+    def serialize(self):
+        self.flush_moves()
+        return self.netlist.serialize()
 
     def deserialize(self, data):
-        # Clear existing scene
-        self.scene.clear()
-        self.gates.clear()
-
-        gate_map = {}
-
-        # Rebuild gates
-        for g in data.get("gates", []):
-            gate_type = g["type"]
-            x, y = g["x"], g["y"]
-
-            gate_cls = GateItem.registry.get(gate_type)
-
-            if not gate_cls:
-                raise RuntimeError(f'Unknown gate: {gate_type}')
-
-            gate = gate_cls(x, y, self)
-
-            self.gates.append(gate)
-            self.scene.addItem(gate)
-            gate_map[g["id"]] = gate
-
-        # Rebuild wires
-        for w in data.get("wires", []):
-            src = gate_map.get(w["src"])
-            dst = gate_map.get(w["dst"])
-            if src and dst:
-                wire = WireItem(src, dst, self)
-                self.scene.addItem(wire)
\ No newline at end of file
+        self.load_netlist(Netlist.deserialize(data))
+
+    def load_file(self, path: str, progress=None):
+        """Open a binary or JSON circuit file; see load_circuit for progress and cancellation."""
+        if is_binary(path):
+            self.load_netlist(load_binary(path))
+        else:
+            self.load_netlist(load_circuit(path, progress))
+
+    def save_file(self, path: str):
+        self.flush_moves()
+        if path.endswith(".lcb"):
+            save_binary(self.netlist, path)
+        else:
+            self.netlist.save(path)
+
+    def load_netlist(self, loaded: Netlist):
+        """Replace the circuit with the contents of another netlist in one bulk edit."""
+        self._handle_wiring_event_cancel()
+        self._moved.clear()
+        if self.worker is not None:
+            self._worker_epoch += 1
+
+        if self.virtual is not None:
+            # The virtual scene drops its items on clear and reindexes once on extend
+            self.netlist.clear()
+            self.netlist.extend(loaded)
+        else:
+            self._drop_scene_items()
+            self.netlist.clear()
+            self.netlist.extend(loaded)
+            self._mirror_netlist()
+
+        self.wake_simulation()
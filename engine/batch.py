@@ -0,0 +1,159 @@
+"""Headless batch runner for saved circuit files.
+
+Each circuit is simulated against a stimulus set, split into chunks of vectors
+that are spread across a process pool. Workers keep every circuit they have
+parsed (and its optimized circuit and generated code), so a circuit is
+loaded and compiled at most once per worker no matter how many chunks it
+gets. LED results are aggregated into a
+single JSON report.
+
+Stimuli are CSV rows with one 0/1 column per primary input, in the layout
+written by engine.truth_table (a header row is skipped and output columns are
+ignored). Without stimuli each circuit runs once with its sources as drawn.
+
+    python -m engine.batch circuits/*.json --stimuli vectors.csv -j 8 -o report.json
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from engine.bitsim import BitSimulator, pack
+from engine.netlist import Netlist
+from engine.truth_table import primary_inputs, primary_outputs
+
+# Per-worker cache of parsed circuits
+_netlists = {}
+
+
+def _load(path: str) -> Netlist:
+    netlist = _netlists.get(path)
+    if netlist is None:
+        netlist = _netlists[path] = Netlist.load(path)
+    return netlist
+
+
+def read_stimuli(path: str) -> list:
+    with open(path, newline='') as f:
+        rows = [row for row in csv.reader(f) if row]
+
+    if rows and not all(cell.strip() in ('0', '1') for cell in rows[0]):
+        header = rows.pop(0)
+        n_inputs = sum(1 for name in header if name.startswith('in'))
+        rows = [row[:n_inputs] for row in rows]
+
+    return [[cell.strip() == '1' for cell in row] for row in rows]
+
+
+def _run_chunk(path: str, chunk: int, columns, width: int, max_deltas: int):
+    netlist = _load(path)
+    inputs = primary_inputs(netlist)
+    outputs = primary_outputs(netlist)
+
+    stimuli = {}
+    if columns is not None:
+        if len(columns) < len(inputs):
+            raise ValueError(f'Stimuli have {len(columns)} inputs, circuit has {len(inputs)}')
+        stimuli = dict(zip(inputs, columns))
+
+    state = BitSimulator(netlist, max_deltas, optimized=True, codegen=True).run(stimuli, width)
+
+    digest = hashlib.sha1()
+    counts = []
+    for gid in outputs:
+        hi, lo = state.hi[gid], state.lo[gid]
+        n_true, n_false = hi.bit_count(), lo.bit_count()
+        counts.append((n_true, n_false, width - n_true - n_false))
+        digest.update(hi.to_bytes((width + 7) // 8, 'little'))
+        digest.update(lo.to_bytes((width + 7) // 8, 'little'))
+
+    return path, chunk, counts, state.oscillating.bit_count(), digest.hexdigest()
+
+
+def _chunks(vectors: list, chunk_size: int):
+    # Pack each chunk column-wise: one word per input
+    for start in range(0, len(vectors), chunk_size):
+        rows = vectors[start:start + chunk_size]
+        n_inputs = min(len(row) for row in rows)
+        yield [pack(row[i] for row in rows) for i in range(n_inputs)], len(rows)
+
+
+def run_batch(paths: list, vectors: list = None, jobs: int = None, chunk_size: int = 4096,
+              max_deltas: int = 1000) -> dict:
+    """Simulate every circuit against the vectors and return the aggregated report."""
+    chunks = list(_chunks(vectors, chunk_size)) if vectors else [(None, 1)]
+
+    results = {path: [] for path in paths}
+    errors = {}
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(_run_chunk, path, i, columns, width, max_deltas): path
+            for path in paths
+            for i, (columns, width) in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path].append(future.result())
+            except Exception as e:
+                errors[path] = str(e)
+
+    report = {}
+    for path in paths:
+        if path in errors:
+            report[path] = {"error": errors[path]}
+            continue
+
+        parts = sorted(results[path], key=lambda r: r[1])
+        n_outputs = len(parts[0][2])
+        totals = [[0, 0, 0] for _ in range(n_outputs)]
+        digest = hashlib.sha1()
+        oscillating = 0
+
+        for _, _, counts, chunk_oscillating, chunk_digest in parts:
+            for total, count in zip(totals, counts):
+                for k in range(3):
+                    total[k] += count[k]
+            oscillating += chunk_oscillating
+            digest.update(chunk_digest.encode())
+
+        report[path] = {
+            "vectors": sum(width for _, width in chunks),
+            "oscillating": oscillating,
+            "signature": digest.hexdigest(),
+            "outputs": [
+                {"true": t, "false": f, "unknown": u} for t, f, u in totals
+            ]
+        }
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate many circuit files headlessly')
+    parser.add_argument('circuits', nargs='+')
+    parser.add_argument('--stimuli', help='CSV of input vectors applied to every circuit')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=4096, help='vectors per task')
+    parser.add_argument('--max-deltas', type=int, default=1000)
+    parser.add_argument('-o', '--output', help='report file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    vectors = read_stimuli(args.stimuli) if args.stimuli else None
+    report = run_batch(args.circuits, vectors, args.jobs, args.chunk_size, args.max_deltas)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+
+    return 1 if any("error" in entry for entry in report.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
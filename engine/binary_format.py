@@ -0,0 +1,224 @@
+"""Compact binary circuit format.
+
+Layout, all little-endian and every array starting on an 8 byte boundary:
+
+    header      magic b'LCSB', format version (u16), flags (u16),
+                type count (u32), gate count (u64), wire count (u64)
+    type table  per type: name length (u16) and UTF-8 name; gates refer to
+                types by their index in this table
+    subcircuits since version 2: length (u32) and UTF-8 JSON object of the
+                definitions used, as in the "subcircuits" entry of a JSON
+                file, so their pin types are known before the table is read
+    types       u8 per gate; 255 marks a removed gate if FLAG_TOMBSTONES is set
+    xs, ys      f64 per gate
+    wire_src    i64 per wire
+    wire_dst    i64 per wire
+
+Gates are numbered as in Netlist.serialize, so converting JSON to binary and
+back gives the same document. Loading maps the file and copies each array
+into the netlist with a single frombytes, without parsing anything per gate.
+"""
+import argparse
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from engine.json_stream import load_circuit
+from engine.netlist import Netlist, REMOVED, TYPE_NAMES, UNKNOWN, find_type
+from engine.subcircuit import define_all, used_definitions
+
+MAGIC = b'LCSB'
+VERSION = 2
+
+# Header flags
+FLAG_TOMBSTONES = 1  # removed gates kept in place, so gate ids match the netlist's
+
+_HEADER = struct.Struct('<4sHHIQQ')
+_LENGTH = struct.Struct('<H')
+_SECTION = struct.Struct('<I')
+
+# Netlist keeps wires in native longs; the file always uses 64 bits
+_NATIVE_WIRES = array('l').itemsize == 8 and sys.byteorder == 'little'
+
+
+def _pad(n: int) -> int:
+    return -n % 8
+
+
+def is_binary(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _compacted(netlist: Netlist):
+    # Drop removed gates and renumber the rest, as serialize() does
+    if REMOVED not in netlist.types:
+        return netlist.types, netlist.xs, netlist.ys, netlist.wire_src, netlist.wire_dst
+
+    ids = list(netlist.gate_ids())
+    remap = array('l', [-1]) * netlist.n_gates
+    for i, gid in enumerate(ids):
+        remap[gid] = i
+
+    types = array('B', (netlist.types[gid] for gid in ids))
+    xs = array('d', (netlist.xs[gid] for gid in ids))
+    ys = array('d', (netlist.ys[gid] for gid in ids))
+    wire_src = array('l', (remap[s] for s in netlist.wire_src))
+    wire_dst = array('l', (remap[d] for d in netlist.wire_dst))
+    return types, xs, ys, wire_src, wire_dst
+
+
+def save_binary(netlist: Netlist, path: str, compact: bool = True):
+    """Write the netlist; with compact=False removed gates are kept so ids stay as they are."""
+    if compact:
+        types, xs, ys, wire_src, wire_dst = _compacted(netlist)
+        flags = 0
+    else:
+        types, xs, ys, wire_src, wire_dst = netlist.types, netlist.xs, netlist.ys, netlist.wire_src, netlist.wire_dst
+        flags = FLAG_TOMBSTONES
+
+    # Only the types in use go into the table, numbered in code order
+    used = sorted(set(types) - {REMOVED})
+    types = types.tobytes()
+    if used != list(range(len(used))):
+        table = bytearray(256)
+        for i, code in enumerate(used):
+            table[code] = i
+        table[REMOVED] = REMOVED
+        types = types.translate(table)
+
+    parts = [_HEADER.pack(MAGIC, VERSION, flags, len(used), len(xs), len(wire_src))]
+    for code in used:
+        name = TYPE_NAMES[code].encode('utf-8')
+        parts.append(_LENGTH.pack(len(name)) + name)
+
+    definitions = json.dumps(used_definitions(netlist), separators=(',', ':')).encode('utf-8')
+    parts.append(_SECTION.pack(len(definitions)) + definitions)
+
+    offset = sum(map(len, parts))
+    parts.append(bytes(_pad(offset)))
+
+    blocks = [types, xs, ys]
+    for column in (wire_src, wire_dst):
+        if not _NATIVE_WIRES:
+            column = array('q', column)
+        blocks.append(column)
+
+    with open(path, 'wb') as f:
+        f.write(b''.join(parts))
+        for block in blocks:
+            data = block if isinstance(block, bytes) else _little_endian(block)
+            f.write(data)
+            f.write(bytes(_pad(len(data))))
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == 'big':
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def load_binary(path: str) -> Netlist:
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with memoryview(mapped) as view:
+            return _read(view)
+
+
+def _read(view: memoryview) -> Netlist:
+    if len(view) < _HEADER.size:
+        raise ValueError('Not a binary circuit file')
+    magic, version, flags, n_types, n_gates, n_wires = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError('Not a binary circuit file')
+    if version > VERSION:
+        raise ValueError(f'Unsupported binary circuit version {version}')
+
+    offset = _HEADER.size
+    names = []
+    for _ in range(n_types):
+        (length,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        names.append(bytes(view[offset:offset + length]).decode('utf-8'))
+        offset += length
+
+    if version >= 2:
+        (length,) = _SECTION.unpack_from(view, offset)
+        offset += _SECTION.size
+        define_all(json.loads(bytes(view[offset:offset + length]).decode('utf-8')))
+        offset += length
+
+    codes = bytearray(256)
+    codes[REMOVED] = REMOVED
+    for i, name in enumerate(names):
+        code = find_type(name)
+        if code is None:
+            raise RuntimeError(f'Unknown gate: {name}')
+        codes[i] = code
+    offset += _pad(offset)
+
+    def block(itemsize, count):
+        nonlocal offset
+        size = itemsize * count
+        if offset + size > len(view):
+            raise ValueError('Truncated binary circuit file')
+        data = view[offset:offset + size]
+        offset += size + _pad(size)
+        return data
+
+    netlist = Netlist()
+    types = block(1, n_gates)
+    valid = bytes(range(n_types)) + (bytes([REMOVED]) if flags & FLAG_TOMBSTONES else b'')
+    if bytes(types).translate(None, valid):
+        raise ValueError('Gate refers to a type that is not in the type table')
+    if any(codes[i] != i for i in range(n_types)):
+        netlist.types.frombytes(bytes(types).translate(codes))
+    else:
+        netlist.types.frombytes(types)
+
+    for column in (netlist.xs, netlist.ys):
+        column.frombytes(block(8, n_gates))
+        if sys.byteorder == 'big':
+            column.byteswap()
+
+    for column in (netlist.wire_src, netlist.wire_dst):
+        data = block(8, n_wires)
+        if _NATIVE_WIRES:
+            column.frombytes(data)
+        else:
+            wide = array('q')
+            wide.frombytes(data)
+            if sys.byteorder == 'big':
+                wide.byteswap()
+            column.extend(wide)
+
+    if n_wires and (max(max(netlist.wire_src), max(netlist.wire_dst)) >= n_gates
+                    or min(min(netlist.wire_src), min(netlist.wire_dst)) < 0):
+        raise ValueError('Wire refers to a gate that does not exist')
+
+    netlist.state.extend(bytes([UNKNOWN]) * n_gates)
+    netlist.version += 1
+    return netlist
+
+
+def load_any(path: str) -> Netlist:
+    return load_binary(path) if is_binary(path) else load_circuit(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert circuits between the JSON and binary formats.')
+    parser.add_argument('source', help='circuit file, JSON or binary')
+    parser.add_argument('target', help='output file; written as binary unless it ends in .json')
+    args = parser.parse_args(argv)
+
+    netlist = load_any(args.source)
+    if args.target.endswith('.json'):
+        netlist.save(args.target)
+    else:
+        save_binary(netlist, args.target)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Bit-parallel evaluation of many input vectors at once.
+
+Every gate holds two Python ints used as arbitrarily wide machine words, one
+bit per stimulus lane, in a dual-rail encoding: ``hi`` has the lanes where the
+gate is True and ``lo`` the lanes where it is False; a lane set in neither is
+unknown (None). AND/OR/NOT then become a handful of bitwise ops per gate for
+the whole batch, following the same three-valued rules as Netlist.evaluate.
+Subcircuit instances are flattened first; gate ids keep their meaning.
+With optimized=True the smallest equivalent circuit from engine.optimize is
+simulated instead, with the stimulated sources as its free inputs. With
+codegen=True the circuit runs as a generated function (engine.codegen), which
+costs a compile up front and pays off when the same circuit runs many times.
+"""
+from engine.levelize import compiled
+from engine.codegen import compile_vector
+from engine.netlist import Netlist, FALSE, TRUE, LED, AND, OR, NOT, TYPE_LIKE
+from engine.optimize import optimize
+from engine.subcircuit import flatten, has_instances
+
+
+class VectorState:
+    __slots__ = ('width', 'mask', 'hi', 'lo', 'oscillating')
+
+    def __init__(self, width: int, hi: list, lo: list, oscillating: int):
+        self.width = width
+        self.mask = (1 << width) - 1
+        self.hi = hi
+        self.lo = lo
+        self.oscillating = oscillating  # lanes in which some feedback loop did not settle
+
+    def value(self, gid: int, lane: int):
+        if self.hi[gid] >> lane & 1:
+            return True
+        if self.lo[gid] >> lane & 1:
+            return False
+        return None
+
+    def lanes(self, gid: int) -> list:
+        return [self.value(gid, lane) for lane in range(self.width)]
+
+    def unknown(self, gid: int) -> int:
+        return self.mask & ~(self.hi[gid] | self.lo[gid])
+
+
+def _program(netlist: Netlist):
+    if has_instances(netlist):
+        netlist = flatten(netlist)
+
+    lev = compiled(netlist)
+    types = netlist.types
+    return netlist.n_gates, [
+        (lev.cyclic[rank], tuple((gid, TYPE_LIKE[types[gid]], tuple(netlist.fanin(gid))) for gid in block))
+        for rank, block in enumerate(lev.blocks)
+    ]
+
+
+def eval_word(t, fanin, hi, lo, mask):
+    if t == FALSE:
+        return 0, mask
+    if t == TRUE:
+        return mask, 0
+    if not fanin:
+        return 0, 0
+
+    if t == LED:
+        src = fanin[0]
+        return hi[src], lo[src]
+    if t == NOT:
+        # Unknown inverts to True, like `not None`
+        src_hi = hi[fanin[0]]
+        return mask & ~src_hi, src_hi
+    if t == AND:
+        all_hi, unknown = mask, 0
+        for src in fanin:
+            all_hi &= hi[src]
+            unknown |= ~(hi[src] | lo[src])
+        known = mask & ~unknown
+        return all_hi & known, known & ~all_hi
+    if t == OR:
+        any_hi, unknown = 0, 0
+        for src in fanin:
+            any_hi |= hi[src]
+            unknown |= ~(hi[src] | lo[src])
+        known = mask & ~unknown
+        return any_hi & known, known & ~any_hi
+
+    return 0, 0
+
+
+class BitSimulator:
+    def __init__(self, netlist: Netlist, max_deltas: int = 1000, optimized: bool = False, codegen: bool = False):
+        self.netlist = netlist
+        self.max_deltas = max_deltas
+        self.optimized = optimized
+        self.codegen = codegen
+
+    def run(self, stimuli: dict, width: int) -> VectorState:
+        """Settle ``width`` independent vectors from an all-unknown state.
+
+        ``stimuli`` maps gate ids to a word of the lanes in which that gate is
+        forced True; it is False in the remaining lanes. Usually the keys are
+        the TrueGate/FalseGate sources acting as primary inputs.
+
+        When optimized, gates dropped as dead logic (reaching no LEDGate) are
+        unknown in every lane.
+        """
+        if self.optimized:
+            free = frozenset(stimuli)
+            optimization = self.netlist.cached(('optimized', free), lambda n: optimize(n, free))
+            gate_map = optimization.gate_map
+            state = self._run(optimization.netlist, {gate_map[gid]: word for gid, word in stimuli.items()}, width)
+            state.hi = [state.hi[m] if m >= 0 else 0 for m in gate_map]
+            state.lo = [state.lo[m] if m >= 0 else 0 for m in gate_map]
+            return state
+
+        return self._run(self.netlist, stimuli, width)
+
+    def _run(self, netlist: Netlist, stimuli: dict, width: int) -> VectorState:
+        mask = (1 << width) - 1
+        if self.codegen:
+            forced = tuple(sorted(stimuli))
+            run = compile_vector(netlist, forced, self.max_deltas)
+            return VectorState(width, *run([stimuli[gid] for gid in forced], mask))
+
+        n, program = netlist.cached('bitsim', _program)
+
+        hi = [0] * n
+        lo = [0] * n
+        oscillating = 0
+
+        for cyclic, ops in program:
+            if not cyclic:
+                gid, t, fanin = ops[0]
+                if gid in stimuli:
+                    word = stimuli[gid] & mask
+                    hi[gid], lo[gid] = word, mask & ~word
+                else:
+                    hi[gid], lo[gid] = eval_word(t, fanin, hi, lo, mask)
+                continue
+
+            # Feedback loop: sweep in place until no lane changes
+            for gid, t, fanin in ops:
+                if gid in stimuli:
+                    word = stimuli[gid] & mask
+                    hi[gid], lo[gid] = word, mask & ~word
+
+            moving = mask
+            for _ in range(self.max_deltas):
+                moving = 0
+                for gid, t, fanin in ops:
+                    if gid in stimuli:
+                        continue
+                    new_hi, new_lo = eval_word(t, fanin, hi, lo, mask)
+                    moving |= (new_hi ^ hi[gid]) | (new_lo ^ lo[gid])
+                    hi[gid], lo[gid] = new_hi, new_lo
+                if not moving:
+                    break
+            oscillating |= moving
+
+        return VectorState(width, hi, lo, oscillating)
+
+
+def pack(values) -> int:
+    """Pack an iterable of booleans into a word, first value in lane 0."""
+    word = 0
+    for lane, value in enumerate(values):
+        if value:
+            word |= 1 << lane
+    return word
@@ -0,0 +1,259 @@
+"""Multi-bit buses.
+
+A bus gate carries an N-bit value on a single gate and a bus is a single
+wire, so an N-bit datapath costs one gate and one wire per operation instead
+of N. Values are kept dual-rail in Netlist.words as (hi, lo) integers, bit i
+set in hi for HIGH and in lo for LOW and in neither for unknown, like a word
+of engine.bitsim with a lane per bit, so a bitwise gate is a few integer
+operations whatever its width. Each bit follows the three-valued rules of
+Netlist.evaluate.
+
+The state of a bus gate is its bit 0, which is also what single-bit gates
+wired to a bus read. A single-bit gate wired into a bus is zero-extended and
+a wider bus is truncated. Evaluating a bus gate only computes its next word;
+like its state, the word changes when a simulator applies the change, so
+under timed simulation it takes the gate's delay.
+
+Types are registered per width on first use of their name, so circuits using
+them load like any other:
+
+- BusAnd{N}, BusOr{N}, BusNot{N}: bitwise gates
+- Split{N}: a bus input pin and N single-bit output pins, bit i on out{i}
+- Merge{N}: N single-bit input pins and a bus output pin, in{i} giving bit i
+
+Splitters and mergers are runs of consecutive pin gates sharing the PINS
+table of subcircuit instances, so owner() and is_internal_wire() cover them.
+Engines that work on whole words see them through flatten(), which turns
+every bus into single-bit gates with blast().
+"""
+import math
+import re
+from array import array
+
+from engine.netlist import Netlist, LED, AND, OR, NOT, FALSE, LOW, HIGH, UNKNOWN, TYPE_CODES, register_type
+from engine.subcircuit import BUFFER, PINS
+
+MAX_WIDTH = 32
+
+# Constant LOW for the bits a narrower input lacks once a bus is blasted; unlike FalseGate it is not an input
+ZERO = register_type('Zero', 0, math.inf, like=FALSE)
+
+WIDTHS = {}  # type code -> width, for the types whose gates carry a bus value
+PARTS = {}   # name -> BusPart
+FAMILIES = []  # names of the bus gate types and parts registered so far
+_GATES = {}  # type code -> (AND/OR/NOT, width)
+
+# Callables receiving the name of every new bus gate type or part, e.g. to give it an item class
+BUS_OBSERVERS = []
+
+_NAME = re.compile(r'(BusAnd|BusOr|BusNot|Split|Merge)([0-9]+)(?:\.(?:in|out)[0-9]*)?')
+_OPS = {'BusAnd': AND, 'BusOr': OR, 'BusNot': NOT}
+
+
+def bus_type(name: str):
+    """Code of a bus type name, registering its width on first use; None if the name is no bus type."""
+    if name in TYPE_CODES:
+        return TYPE_CODES[name]
+
+    match = _NAME.fullmatch(name)
+    if match is None:
+        return None
+    kind, width = match.group(1), int(match.group(2))
+    if not 2 <= width <= MAX_WIDTH:
+        raise RuntimeError(f'Bus width of {name} must be between 2 and {MAX_WIDTH}')
+
+    family = f'{kind}{width}'
+    if family not in TYPE_CODES and family not in PARTS:
+        if kind in _OPS:
+            code = register_type(family, math.inf, math.inf, evaluate=_evaluate_bitwise)
+            WIDTHS[code] = width
+            _GATES[code] = (_OPS[kind], width)
+        else:
+            PARTS[family] = BusPart(family, kind == 'Split', width)
+        FAMILIES.append(family)
+        for observer in BUS_OBSERVERS:
+            observer(family)
+    return TYPE_CODES.get(name)
+
+
+def is_bus(netlist: Netlist, gid: int) -> bool:
+    return netlist.types[gid] in WIDTHS
+
+
+def word(netlist: Netlist, gid: int, width: int):
+    """(hi, lo) of a gate's value seen as a bus of the given width."""
+    mask = (1 << width) - 1
+    own = WIDTHS.get(netlist.types[gid])
+    if own is None:
+        s = netlist.state[gid]
+        return int(s == HIGH), (mask ^ 1) | (s == LOW)
+
+    hi, lo = netlist.words.get(gid, (0, 0))
+    if own < width:
+        lo |= mask ^ ((1 << own) - 1)
+    return hi & mask, lo & mask
+
+
+def _store(netlist: Netlist, gid: int, hi: int, lo: int) -> int:
+    # The new word waits in word_changes until the simulator applies the new state
+    if netlist.words.get(gid) != (hi, lo):
+        netlist.word_changes[gid] = hi, lo
+    else:
+        netlist.word_changes.pop(gid, None)
+    return HIGH if hi & 1 else LOW if lo & 1 else UNKNOWN
+
+
+def _evaluate_bitwise(netlist: Netlist, gid: int) -> int:
+    op, width = _GATES[netlist.types[gid]]
+    fanin = netlist.fanin(gid)
+    if not fanin:
+        return _store(netlist, gid, 0, 0)
+
+    if op == NOT:
+        # An unknown bit has neither rail set, so it comes out HIGH like NotGate
+        hi, _ = word(netlist, fanin[0], width)
+        return _store(netlist, gid, ((1 << width) - 1) & ~hi, hi)
+
+    # Known only in bits where every input is known
+    mask = (1 << width) - 1
+    known, joined = mask, mask if op == AND else 0
+    for src in fanin:
+        hi, lo = word(netlist, src, width)
+        known &= hi | lo
+        joined = joined & hi if op == AND else joined | hi
+    return _store(netlist, gid, joined & known, known & ~joined)
+
+
+class BusPart:
+    """A splitter or merger; has the attributes of a Subcircuit that instances and their items use."""
+
+    __slots__ = ('name', 'width', 'n_inputs', 'n_outputs', 'pin_codes', 'depends')
+
+    def __init__(self, name: str, split: bool, width: int):
+        self.name = name
+        self.width = width
+        if split:
+            self.n_inputs, self.n_outputs = 1, width
+            self.depends = [[0]] * width
+            self.pin_codes = [register_type(f'{name}.in', 1, math.inf, evaluate=self._evaluate_bus_input)]
+            self.pin_codes += [register_type(f'{name}.out{i}', math.inf, math.inf, evaluate=self._evaluate_bit)
+                               for i in range(width)]
+            WIDTHS[self.pin_codes[0]] = width
+        else:
+            self.n_inputs, self.n_outputs = width, 1
+            self.depends = [list(range(width))]
+            self.pin_codes = [register_type(f'{name}.in{i}', 1, math.inf, like=LED) for i in range(width)]
+            self.pin_codes.append(register_type(f'{name}.out', math.inf, math.inf, evaluate=self._evaluate_merge))
+            WIDTHS[self.pin_codes[-1]] = width
+        for index, code in enumerate(self.pin_codes):
+            PINS[code] = (self, index)
+
+    @property
+    def n_pins(self) -> int:
+        return len(self.pin_codes)
+
+    def _evaluate_bus_input(self, netlist: Netlist, gid: int) -> int:
+        fanin = netlist.fanin(gid)
+        if not fanin:
+            return _store(netlist, gid, 0, 0)
+        return _store(netlist, gid, *word(netlist, fanin[0], self.width))
+
+    def _evaluate_bit(self, netlist: Netlist, gid: int) -> int:
+        index = PINS[netlist.types[gid]][1] - 1
+        hi, lo = netlist.words.get(gid - index - 1, (0, 0))
+        return HIGH if hi >> index & 1 else LOW if lo >> index & 1 else UNKNOWN
+
+    def _evaluate_merge(self, netlist: Netlist, gid: int) -> int:
+        hi = lo = 0
+        state = netlist.state
+        base = gid - self.width
+        for i in range(self.width):
+            s = state[base + i]
+            if s == HIGH:
+                hi |= 1 << i
+            elif s == LOW:
+                lo |= 1 << i
+        return _store(netlist, gid, hi, lo)
+
+
+def blast(flat: Netlist) -> dict:
+    """Turn every bus of a flattened copy into single-bit gates, in place.
+
+    Existing gate ids keep their meaning: a bus gate becomes the gate of its
+    bit 0, the gates of its other bits are appended, and splitter and merger
+    pins become buffers. Wires into rewritten gates are replaced by one wire
+    per bit. Returns the ids of the bit gates of every bus gate, lowest first.
+    """
+    types = flat.types
+    n = flat.n_gates
+    rewired = [gid for gid in range(n) if types[gid] in _GATES or types[gid] in PINS and
+               isinstance(PINS[types[gid]][0], BusPart)]
+    if not rewired:
+        return {}
+
+    fanin = {gid: list(flat.fanin(gid)) for gid in rewired}
+    keep = [i for i, d in enumerate(flat.wire_dst) if d not in fanin]
+    wire_src = [flat.wire_src[i] for i in keep]
+    wire_dst = [flat.wire_dst[i] for i in keep]
+
+    def add_gate(t, x, y):
+        types.append(t)
+        flat.xs.append(x)
+        flat.ys.append(y)
+        flat.state.append(UNKNOWN)
+        return len(types) - 1
+
+    bits = {}
+    for gid in rewired:
+        width = WIDTHS.get(types[gid])
+        if width is not None:
+            bits[gid] = [gid] + [add_gate(BUFFER, flat.xs[gid], flat.ys[gid]) for _ in range(width - 1)]
+
+    zero = []
+
+    def bit(src, i):
+        b = bits.get(src)
+        if b is None and i == 0:
+            return src
+        if b is not None and i < len(b):
+            return b[i]
+        if not zero:
+            zero.append(add_gate(ZERO, flat.xs[src], flat.ys[src]))
+        return zero[0]
+
+    for gid in rewired:
+        code = types[gid]
+        if code in _GATES:
+            op, width = _GATES[code]
+            for i, g in enumerate(bits[gid]):
+                types[g] = op
+                for src in fanin[gid]:
+                    wire_src.append(bit(src, i))
+                    wire_dst.append(g)
+            continue
+
+        part, index = PINS[code]
+        base = gid - index
+        types[gid] = BUFFER
+        if part.n_inputs == 1:
+            if index == 0:
+                for i, g in enumerate(bits[gid]):
+                    for src in fanin[gid][:1]:
+                        wire_src.append(bit(src, i))
+                        wire_dst.append(g)
+            else:
+                wire_src.append(bits[base][index - 1])
+                wire_dst.append(gid)
+        elif index == part.n_inputs:
+            for i, g in enumerate(bits[gid]):
+                wire_src.append(base + i)
+                wire_dst.append(g)
+        else:
+            for src in fanin[gid]:
+                wire_src.append(src)
+                wire_dst.append(gid)
+
+    flat.wire_src[:] = array('l', wire_src)
+    flat.wire_dst[:] = array('l', wire_dst)
+    flat.version += 1
+    return bits
@@ -0,0 +1,209 @@
+"""Compilation of a netlist into generated Python functions.
+
+The levelized netlist is turned into the source of one straight-line
+function with a local per gate and every AND/OR/NOT written out inline, so a
+settle costs a run of bytecode instead of a call and a fan-in walk per gate.
+Feedback loops become a sweep loop over their gates, as in the engines.
+
+Two forms are generated, both following the three-valued rules of
+Netlist.evaluate:
+
+- scalar: settle(state) updates a state bytearray in place, with unknown as 2.
+  For two-valued inputs unknown is the only value with bit 1 set, so AND is
+  ``a & b`` and OR ``a | b`` unless ``(a | b) & 2`` flags an unknown, and NOT
+  is ``1 ^ (a & 1)``, which also maps unknown to True.
+- vector: the dual-rail words of engine.bitsim, one hi/lo local pair per gate.
+
+Functions are cached by a structural hash of the circuit, so the same
+circuit is compiled once per process however often it is rebuilt or loaded,
+and an edit only recompiles when it changes the topology.
+"""
+import hashlib
+from collections import OrderedDict
+
+from engine.levelize import compiled
+from engine.netlist import Netlist, FALSE, TRUE, LED, AND, NOT, TYPE_LIKE
+from engine.subcircuit import flatten, has_instances
+
+CACHE_SIZE = 32
+_cache = OrderedDict()  # (kind, structural hash, options) -> function
+
+# Most operands per generated expression; CPython's compiler recurses once per operator
+CHUNK = 256
+
+
+def _program(netlist: Netlist):
+    # Blocks in topological order as (cyclic, [(gate id, built-in type, fan-in)])
+    if has_instances(netlist):
+        netlist = flatten(netlist)
+
+    lev = compiled(netlist)
+    types = netlist.types
+    return netlist.n_gates, [
+        (lev.cyclic[rank], [(gid, TYPE_LIKE[types[gid]], tuple(netlist.fanin(gid))) for gid in block])
+        for rank, block in enumerate(lev.blocks)
+    ]
+
+
+def structural_hash(netlist: Netlist) -> str:
+    """Digest of the gate types and wires; positions and state don't count."""
+    def build(netlist):
+        digest = hashlib.sha1()
+        n, program = _program(netlist)
+        digest.update(n.to_bytes(8, 'little'))
+        for cyclic, ops in program:
+            digest.update(b'L' if cyclic else b'G')
+            for gid, t, fanin in ops:
+                digest.update(repr((gid, t, fanin)).encode())
+        return digest.hexdigest()
+
+    return netlist.cached('structural_hash', build)
+
+
+def _cached(key, generate):
+    function = _cache.get(key)
+    if function is None:
+        function = _cache[key] = generate()
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+    return function
+
+
+def _fold(name: str, op: str, terms: list) -> list:
+    # Lines that set name to the terms joined by op, a chunk per statement
+    lines = [f'{name} = {f" {op} ".join(terms[:CHUNK])}']
+    lines += [f'{name} {op}= {f" {op} ".join(terms[i:i + CHUNK])}' for i in range(CHUNK, len(terms), CHUNK)]
+    return lines
+
+
+def _define(name: str, lines: list):
+    namespace = {}
+    exec(compile('\n'.join(lines) + '\n', f'<generated {name}>', 'exec'), namespace)
+    return namespace[name]
+
+
+# Scalar
+
+def _scalar_assign(target: str, t: int, fanin: tuple) -> list:
+    # Lines that set target to the gate's new value
+    if t == FALSE:
+        return [f'{target} = 0']
+    if t == TRUE:
+        return [f'{target} = 1']
+    if not fanin:
+        return [f'{target} = 2']
+    if t == LED:
+        return [f'{target} = g{fanin[0]}']
+    if t == NOT:
+        return [f'{target} = 1 ^ (g{fanin[0]} & 1)']
+
+    srcs = [f'g{src}' for src in fanin]
+    if len(srcs) > CHUNK:
+        lines = _fold('e', '|', srcs)
+        if t == AND:
+            return lines + _fold('a', '&', srcs) + [f'{target} = 2 if e & 2 else a']
+        return lines + [f'{target} = 2 if e & 2 else e']
+
+    either = ' | '.join(srcs)
+    if len(srcs) == 1:
+        return [f'{target} = 2 if {either} & 2 else {either}']
+    if t == AND:
+        return [f'{target} = 2 if ({either}) & 2 else {" & ".join(srcs)}']
+    return [f'{target} = 2 if ({either}) & 2 else {either}']
+
+
+def _generate_scalar(netlist: Netlist, max_deltas: int):
+    _, program = _program(netlist)
+    n = netlist.n_gates  # gates past it come from flattened subcircuits and are not stored
+    lines = ['def settle(s):', '    oscillating = False']
+
+    # Loop gates are read before the sweep assigns them, so they start from the stored state
+    for cyclic, ops in program:
+        if cyclic:
+            lines += [f'    g{gid} = s[{gid}]' if gid < n else f'    g{gid} = 2' for gid, _, _ in ops]
+
+    for cyclic, ops in program:
+        if not cyclic:
+            gid, t, fanin = ops[0]
+            lines += ['    ' + line for line in _scalar_assign(f'g{gid}', t, fanin)]
+            continue
+
+        lines += [f'    for _ in range({max_deltas}):', '        stable = True']
+        for gid, t, fanin in ops:
+            lines += ['        ' + line for line in _scalar_assign('v', t, fanin)]
+            lines += [f'        if v != g{gid}:',
+                      f'            g{gid} = v',
+                      '            stable = False']
+        lines += ['        if stable:', '            break', '    else:', '        oscillating = True']
+
+    lines += [f'    s[{gid}] = g{gid}' for _, ops in program for gid, _, _ in ops if gid < n]
+    lines.append('    return oscillating')
+    return _define('settle', lines)
+
+
+def compile_scalar(netlist: Netlist, max_deltas: int = 1000):
+    """settle(state) -> True if some loop did not settle; fully re-evaluates the netlist into the state bytearray."""
+    key = ('scalar', structural_hash(netlist), max_deltas)
+    return netlist.cached(key, lambda n: _cached(key, lambda: _generate_scalar(n, max_deltas)))
+
+
+# Vector
+
+def _vector_assign(gid: int, t: int, fanin: tuple, h: str, lo: str) -> list:
+    # Lines that set h and lo to the gate's new words
+    if t == FALSE:
+        return [f'{h} = 0', f'{lo} = m']
+    if t == TRUE:
+        return [f'{h} = m', f'{lo} = 0']
+    if not fanin:
+        return [f'{h} = 0', f'{lo} = 0']
+    if t == LED:
+        return [f'{h} = h{fanin[0]}', f'{lo} = l{fanin[0]}']
+    if t == NOT:
+        return [f'{h} = m & ~h{fanin[0]}', f'{lo} = h{fanin[0]}']
+
+    # Known only in lanes where every input is known
+    known = _fold('k', '&', ['m'] + [f'(h{src} | l{src})' for src in fanin])
+    joined = _fold('a', '&' if t == AND else '|', [f'h{src}' for src in fanin])
+    return known + joined + [f'{h} = a & k', f'{lo} = k & ~a']
+
+
+def _generate_vector(netlist: Netlist, forced: tuple, max_deltas: int):
+    n, program = _program(netlist)
+    slot = {gid: i for i, gid in enumerate(forced)}
+    lines = ['def run(words, m):', '    oscillating = 0']
+
+    def force(gid, indent):
+        return [f'{indent}w = words[{slot[gid]}] & m', f'{indent}h{gid} = w', f'{indent}l{gid} = m & ~w']
+
+    for cyclic, ops in program:
+        if not cyclic:
+            gid, t, fanin = ops[0]
+            lines += force(gid, '    ') if gid in slot else \
+                ['    ' + line for line in _vector_assign(gid, t, fanin, f'h{gid}', f'l{gid}')]
+            continue
+
+        # Loop gates start unknown, forced ones hold their words throughout
+        for gid, _, _ in ops:
+            lines += force(gid, '    ') if gid in slot else [f'    h{gid} = 0', f'    l{gid} = 0']
+
+        lines += [f'    for _ in range({max_deltas}):', '        moving = 0']
+        for gid, t, fanin in ops:
+            if gid in slot:
+                continue
+            lines += ['        ' + line for line in _vector_assign(gid, t, fanin, 'nh', 'nl')]
+            lines += [f'        moving |= (nh ^ h{gid}) | (nl ^ l{gid})', f'        h{gid} = nh', f'        l{gid} = nl']
+        lines += ['        if not moving:', '            break', '    oscillating |= moving']
+
+    present = {gid for _, ops in program for gid, _, _ in ops}
+    lines.append(f'    return [{", ".join(f"h{gid}" if gid in present else "0" for gid in range(n))}], '
+                 f'[{", ".join(f"l{gid}" if gid in present else "0" for gid in range(n))}], oscillating')
+    return _define('run', lines)
+
+
+def compile_vector(netlist: Netlist, forced: tuple, max_deltas: int = 1000):
+    """run(words, mask) -> (hi, lo, oscillating lanes) for BitSimulator; words[i] forces gate forced[i]."""
+    key = ('vector', structural_hash(netlist), tuple(forced), max_deltas)
+    return netlist.cached(key, lambda n: _cached(key, lambda: _generate_vector(n, tuple(forced), max_deltas)))
@@ -0,0 +1,197 @@
+"""Event-driven simulation over a Netlist.
+
+Only gates whose inputs changed are re-evaluated. The worklist is ordered by
+the levelized block rank, so acyclic regions settle in a single ordered pass
+and each feedback loop is iterated locally to a fixed point. A loop that has
+not settled after ``max_deltas`` sweeps is reported as oscillating instead of
+being chased forever.
+
+Edits don't start the settle over: the simulator keeps its own levelization
+up to date from Netlist.edits_since and schedules only the gates whose inputs
+an edit changed, so only their fan-out cone is re-evaluated.
+"""
+import time
+from heapq import heapify, heappop, heappush
+
+from engine.levelize import levelize
+from engine.netlist import Netlist
+from engine.profiler import TickStats
+
+
+class EventSimulator:
+    def __init__(self, netlist: Netlist, max_deltas: int = 1000):
+        self.netlist = netlist
+        self.max_deltas = max_deltas
+
+        self.pending = set()
+        self.oscillating = []
+
+        # Stats for the last step
+        self.deltas = 0
+        self.evaluations = 0
+        self.iterations = 0
+
+        # Optional SimulationProfiler
+        self.profiler = None
+
+        # Interrupted settle: block ranks still to visit, and which ranks are queued
+        self._heap = []
+        self._queued = bytearray()
+
+        self._version = -1
+        self._lev = None
+
+    def schedule(self, gid: int):
+        self.pending.add(gid)
+
+    def schedule_all(self):
+        self.pending = set(self.netlist.gate_ids())
+
+    @property
+    def busy(self) -> bool:
+        """Whether there is work left, either an unfinished settle or oscillating loops."""
+        return bool(self._heap or self.pending or self._version != self.netlist.version)
+
+    @property
+    def settling(self) -> bool:
+        """Whether a settle was interrupted by its time budget."""
+        return bool(self._heap)
+
+    def step(self, budget: float = None) -> set:
+        """Settle the circuit, returning the ids of gates that changed state.
+
+        With a budget (in seconds) the settle stops once it is used up and
+        resumes from the same point on the next call.
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return self._step(self.netlist.evaluate, budget)
+
+        start = time.perf_counter()
+        counted = profiler.counting(self.netlist)
+        changed = self._step(counted, budget)
+        profiler.record_tick(TickStats(self.evaluations, len(changed), self.iterations, self.deltas,
+                                       time.perf_counter() - start), counted)
+        return changed
+
+    def _step(self, evaluate, budget) -> set:
+        netlist = self.netlist
+        if self._version != netlist.version:
+            self._topology_changed()
+
+        self.deltas = 0
+        self.evaluations = 0
+        self.iterations = 0
+        self.oscillating = []
+
+        if not self.pending and not self._heap:
+            return set()
+
+        lev = self._lev
+        blocks, cyclic, block_of = lev.blocks, lev.cyclic, lev.block_of
+        csr = netlist.csr
+        fanout_ptr, fanout_idx = csr.fanout_ptr, csr.fanout_idx
+        state = netlist.state
+        words, word_changes = netlist.words, netlist.word_changes
+
+        heap = self._heap
+        queued = self._queued
+
+        for gid in self.pending:
+            rank = block_of[gid]
+            if rank >= 0 and not queued[rank]:
+                queued[rank] = 1
+                heap.append(rank)
+        heapify(heap)
+        self.pending = set()
+
+        deadline = time.perf_counter() + budget if budget is not None else None
+        changed = set()
+        retry = set()
+
+        while heap:
+            if deadline is not None and not self.iterations & 63 and time.perf_counter() > deadline:
+                break
+
+            rank = heappop(heap)
+            queued[rank] = 0
+            block = blocks[rank]
+            self.iterations += 1
+
+            if not cyclic[rank]:
+                gid = block[0]
+                self.evaluations += 1
+                value = evaluate(gid)
+                # A bus gate also changed if its word did
+                if state[gid] == value and gid not in word_changes:
+                    continue
+                if gid in word_changes:
+                    words[gid] = word_changes.pop(gid)
+                state[gid] = value
+                changed.add(gid)
+                touched = block
+            else:
+                touched = self._settle_loop(block, changed, evaluate)
+                if touched is None:
+                    self.oscillating.extend(block)
+                    retry.update(block)
+                    touched = block
+
+            # Fan-out only ever points to later blocks (or back into this loop)
+            for gid in touched:
+                for i in range(fanout_ptr[gid], fanout_ptr[gid + 1]):
+                    dst_rank = block_of[fanout_idx[i]]
+                    if dst_rank != rank and not queued[dst_rank]:
+                        queued[dst_rank] = 1
+                        heappush(heap, dst_rank)
+
+        self.pending = retry
+        return changed
+
+    def _topology_changed(self):
+        netlist = self.netlist
+        lev = self._lev
+        edits = netlist.edits_since(self._version) if lev is not None else None
+
+        # Ranks may move, so an interrupted settle carries on from its gates
+        for rank in self._heap:
+            self.pending.update(lev.blocks[rank])
+        self._heap = []
+        self._version = netlist.version
+
+        if edits is not None and lev.update(netlist, edits):
+            for name, *args in edits:
+                if name in ('add_gate', 'restore_gate'):
+                    self.pending.add(args[0])
+                elif name in ('add_wire', 'remove_wire'):
+                    self.pending.add(args[1])
+        else:
+            self._lev = lev = levelize(netlist)
+            self.schedule_all()
+        self._queued = bytearray(lev.n_blocks)
+
+    def _settle_loop(self, block, changed, evaluate):
+        # Sweep a feedback loop until it stops changing; None if it never does
+        state = self.netlist.state
+        words, word_changes = self.netlist.words, self.netlist.word_changes
+        touched = set()
+
+        for _ in range(self.max_deltas):
+            self.deltas += 1
+            self.evaluations += len(block)
+
+            stable = True
+            for gid in block:
+                value = evaluate(gid)
+                if state[gid] != value or gid in word_changes:
+                    if gid in word_changes:
+                        words[gid] = word_changes.pop(gid)
+                    state[gid] = value
+                    changed.add(gid)
+                    touched.add(gid)
+                    stable = False
+
+            if stable:
+                return touched
+
+        return None
@@ -0,0 +1,334 @@
+"""Stuck-at fault simulation and test-vector coverage.
+
+Every AndGate/OrGate/NotGate output is a fault site, stuck at 0 and stuck at
+1. The good circuit is simulated once per chunk of vectors with the
+BitSimulator, one lane per vector. Each faulty machine then only re-evaluates
+the fan-out cone of its site, rank by rank and only past gates whose words
+differ from the good ones, so a fault that is masked early costs a few
+gates. A fault is detected at an LEDGate in the lanes where the good and the
+faulty output are known and differ, and it is dropped once it has been seen
+at every LED it can reach, so later chunks skip it.
+
+Faults are split across a process pool and chunks are handed out one after
+the other, so a worker only keeps the good machine of the current chunk.
+Coverage is reported per LED, out of the faults in its fan-in cone, and
+overall.
+
+    python -m engine.faults circuit.json --stimuli vectors.csv -j 8 -o report.json
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+from engine.batch import read_stimuli
+from engine.bitsim import BitSimulator, eval_word, pack
+from engine.levelize import compiled
+from engine.netlist import Netlist, AND, OR, NOT, TYPE_LIKE
+from engine.subcircuit import flatten, has_instances
+from engine.truth_table import primary_inputs, primary_outputs
+
+FAULT_TYPES = (AND, OR, NOT)
+EXHAUSTIVE_LIMIT = 16  # most inputs tried exhaustively when no stimuli are given
+
+
+class FaultCoverage(NamedTuple):
+    vectors: int
+    faults: list    # (gate id, stuck value, {LED id: first detecting vector})
+    outputs: dict   # LED id -> (faults detected there, faults that can reach it)
+
+    @property
+    def detected(self) -> int:
+        return sum(1 for _, _, seen in self.faults if seen)
+
+    @property
+    def coverage(self) -> float:
+        return self.detected / len(self.faults) if self.faults else 1.0
+
+    def undetected(self) -> list:
+        return [(gid, value) for gid, value, seen in self.faults if not seen]
+
+
+def fault_sites(netlist: Netlist) -> list:
+    return [gid for gid in netlist.gate_ids() if netlist.types[gid] in FAULT_TYPES]
+
+
+class FaultSimulator:
+    def __init__(self, netlist: Netlist, max_deltas: int = 1000):
+        self.netlist = netlist
+        self.max_deltas = max_deltas
+        self.flat = flatten(netlist) if has_instances(netlist) else netlist
+        self.lev = compiled(self.flat)
+        self.outputs = primary_outputs(netlist)
+        self._is_output = {gid: i for i, gid in enumerate(self.outputs)}
+        self._fanout_ranks = {}
+        self._reach = None
+        self._good = None  # (key, state) of the last chunk
+
+    def fanout_ranks(self, gid: int) -> tuple:
+        ranks = self._fanout_ranks.get(gid)
+        if ranks is None:
+            block_of = self.lev.block_of
+            ranks = self._fanout_ranks[gid] = tuple({block_of[dst] for dst in self.flat.fanout(gid)})
+        return ranks
+
+    @property
+    def reach_masks(self) -> list:
+        """Per gate, a bit per output (in output order) that the gate can influence."""
+        if self._reach is None:
+            flat, lev = self.flat, self.lev
+            masks = [0] * flat.n_gates
+            for i, led in enumerate(self.outputs):
+                masks[led] = 1 << i
+            for rank in range(lev.n_blocks - 1, -1, -1):
+                block = lev.blocks[rank]
+                mask = 0
+                for gid in block:
+                    mask |= masks[gid]
+                    for dst in flat.fanout(gid):
+                        mask |= masks[dst]
+                for gid in block:
+                    masks[gid] = mask
+            self._reach = masks
+        return self._reach
+
+    def reach(self, gid: int) -> list:
+        """LEDs the site can influence, in output order."""
+        mask = self.reach_masks[gid]
+        return [led for i, led in enumerate(self.outputs) if mask >> i & 1]
+
+    def good(self, stimuli: dict, width: int):
+        # Fault groups share the chunk being run, so each worker simulates its good machine once
+        key = (width, tuple(sorted(stimuli.items())))
+        if self._good is None or self._good[0] != key:
+            self._good = key, BitSimulator(self.netlist, self.max_deltas, codegen=True).run(stimuli, width)
+        return self._good[1]
+
+    def _propagate(self, site: int, value: bool, hi: list, lo: list, mask: int) -> list:
+        # Evaluates the faulty machine in place over the good words; returns the gates it touched
+        lev, flat, max_deltas = self.lev, self.flat, self.max_deltas
+        types = flat.types
+        blocks, cyclic, block_of = lev.blocks, lev.cyclic, lev.block_of
+        stuck_hi, stuck_lo = (mask, 0) if value else (0, mask)
+        touched = []
+        queue = []
+        queued = set()
+
+        def changed(gid):
+            for rank in self.fanout_ranks(gid):
+                if rank not in queued:
+                    queued.add(rank)
+                    heapq.heappush(queue, rank)
+
+        start = block_of[site]
+        if not cyclic[start]:
+            if hi[site] != stuck_hi or lo[site] != stuck_lo:
+                touched.append((site, hi[site], lo[site]))
+                hi[site], lo[site] = stuck_hi, stuck_lo
+                changed(site)
+        else:
+            queued.add(start)
+            queue.append(start)
+
+        while queue:
+            rank = heapq.heappop(queue)
+            block = blocks[rank]
+            if not cyclic[rank]:
+                gid = block[0]
+                new_hi, new_lo = eval_word(TYPE_LIKE[types[gid]], flat.fanin(gid), hi, lo, mask)
+                if new_hi != hi[gid] or new_lo != lo[gid]:
+                    touched.append((gid, hi[gid], lo[gid]))
+                    hi[gid], lo[gid] = new_hi, new_lo
+                    changed(gid)
+                continue
+
+            # Loops settle again from unknown, as in BitSimulator.run
+            old = [(gid, hi[gid], lo[gid]) for gid in block]
+            for gid in block:
+                hi[gid], lo[gid] = (stuck_hi, stuck_lo) if gid == site else (0, 0)
+            for _ in range(max_deltas):
+                moving = 0
+                for gid in block:
+                    if gid == site:
+                        continue
+                    new_hi, new_lo = eval_word(TYPE_LIKE[types[gid]], flat.fanin(gid), hi, lo, mask)
+                    moving |= (new_hi ^ hi[gid]) | (new_lo ^ lo[gid])
+                    hi[gid], lo[gid] = new_hi, new_lo
+                if not moving:
+                    break
+            for gid, old_hi, old_lo in old:
+                if hi[gid] != old_hi or lo[gid] != old_lo:
+                    touched.append((gid, old_hi, old_lo))
+                    changed(gid)
+
+        return touched
+
+    def run(self, faults: list, chunks, base: int = 0) -> list:
+        """Detections for (site, stuck value) faults over chunks of (stimuli, width).
+
+        Returns per fault a {LED id: first detecting vector} dict; vectors are
+        numbered across chunks in order, starting at base.
+        """
+        reach = self.reach_masks
+        detected = [{} for _ in faults]
+        live = [i for i, (site, _) in enumerate(faults) if reach[site]]
+        is_output = self._is_output
+
+        for stimuli, width in chunks:
+            if not live:
+                break
+            good = self.good(stimuli, width)
+            hi, lo, mask = list(good.hi), list(good.lo), good.mask
+
+            still_live = []
+            for i in live:
+                site, value = faults[i]
+                touched = self._propagate(site, value, hi, lo, mask)
+                seen = detected[i]
+                for gid, good_hi, good_lo in reversed(touched):
+                    if gid in is_output and gid not in seen:
+                        lanes = (good_hi & lo[gid]) | (good_lo & hi[gid])
+                        if lanes:
+                            seen[gid] = base + (lanes & -lanes).bit_length() - 1
+                    hi[gid], lo[gid] = good_hi, good_lo
+                if len(seen) < reach[site].bit_count():
+                    still_live.append(i)
+
+            live = still_live
+            base += width
+
+        return detected
+
+
+# Circuit of the pool a worker belongs to, set up once by its initializer
+_simulator = None
+
+
+def _init_worker(data: dict, max_deltas: int):
+    global _simulator
+    _simulator = FaultSimulator(Netlist.deserialize(data), max_deltas)
+
+
+def _run_faults(faults: list, stimuli: dict, width: int, base: int):
+    return faults, _simulator.run(faults, [(stimuli, width)], base)
+
+
+def _pack_vectors(vectors: list, n_inputs: int, chunk_size: int):
+    for start in range(0, len(vectors), chunk_size):
+        rows = vectors[start:start + chunk_size]
+        if min(len(row) for row in rows) < n_inputs:
+            raise ValueError(f'Stimuli have {min(len(row) for row in rows)} inputs, circuit has {n_inputs}')
+        yield [pack(row[i] for row in rows) for i in range(n_inputs)], len(rows)
+
+
+def exhaustive_vectors(n_inputs: int) -> list:
+    if n_inputs > EXHAUSTIVE_LIMIT:
+        raise ValueError(f'{n_inputs} inputs are too many to try exhaustively, give stimuli instead')
+    return [[bool(index >> i & 1) for i in range(n_inputs)] for index in range(1 << n_inputs)]
+
+
+def fault_coverage(netlist: Netlist, vectors: list = None, jobs: int = None, chunk_size: int = 1024,
+                   faults_per_task: int = 256, max_deltas: int = 1000, progress=None) -> FaultCoverage:
+    """Stuck-at coverage of the vectors (rows of input values; all combinations if None).
+
+    progress(done, total) is called as fault groups complete; when it returns
+    False the run is abandoned and None returned.
+    """
+    inputs = primary_inputs(netlist)
+    if vectors is None:
+        vectors = exhaustive_vectors(len(inputs))
+
+    # Workers get the serialized circuit, where gates are numbered densely in gate id order
+    ids = list(netlist.gate_ids())
+    index = {gid: i for i, gid in enumerate(ids)}
+    data = netlist.serialize()
+    # In the order they were added, since LEDs and NOTs read their first input
+    data["wires"] = [{"src": index[src], "dst": index[dst]} for src, dst in zip(netlist.wire_src, netlist.wire_dst)]
+
+    chunks = [({index[gid]: word for gid, word in zip(inputs, words)}, width)
+              for words, width in _pack_vectors(vectors, len(inputs), chunk_size)]
+
+    sites = fault_sites(netlist)
+    faults = [(index[gid], value) for gid in sites for value in (False, True)]
+    groups = [faults[i:i + faults_per_task] for i in range(0, len(faults), faults_per_task)]
+
+    simulator = FaultSimulator(netlist, max_deltas)
+    reach = simulator.reach_masks
+    detections = {fault: {} for fault in faults}
+    total, done, base = len(groups) * len(chunks), 0, 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(data, max_deltas)) as pool:
+        for stimuli, width in chunks:
+            # Faults seen at every LED they reach are dropped, as FaultSimulator.run does within a call
+            futures = []
+            for group in groups:
+                live = [fault for fault in group if len(detections[fault]) < reach[ids[fault[0]]].bit_count()]
+                if live:
+                    futures.append(pool.submit(_run_faults, live, stimuli, width, base))
+                else:
+                    done += 1
+
+            for future in as_completed(futures):
+                group, detected = future.result()
+                for fault, seen in zip(group, detected):
+                    for led, vector in seen.items():
+                        detections[fault].setdefault(led, vector)
+                done += 1
+                if progress is not None and progress(done, total) is False:
+                    pool.shutdown(cancel_futures=True)
+                    return None
+            base += width
+
+    outputs = {led: [0, 0] for led in simulator.outputs}
+    results = []
+    for gid in sites:
+        reach = simulator.reach(gid)
+        for value in (False, True):
+            seen = {ids[led]: vector for led, vector in detections[(index[gid], value)].items()}
+            results.append((gid, int(value), seen))
+            for led in reach:
+                outputs[led][1] += 1
+                if led in seen:
+                    outputs[led][0] += 1
+
+    return FaultCoverage(len(vectors), results, {led: tuple(counts) for led, counts in outputs.items()})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stuck-at fault coverage of test vectors')
+    parser.add_argument('circuit')
+    parser.add_argument('--stimuli', help='CSV of input vectors (default: every input combination)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=1024, help='vectors simulated together')
+    parser.add_argument('--max-deltas', type=int, default=1000)
+    parser.add_argument('-o', '--output', help='report file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    netlist = Netlist.load(args.circuit)
+    vectors = read_stimuli(args.stimuli) if args.stimuli else None
+    result = fault_coverage(netlist, vectors, args.jobs, args.chunk_size, max_deltas=args.max_deltas)
+
+    report = {
+        "vectors": result.vectors,
+        "faults": len(result.faults),
+        "detected": result.detected,
+        "coverage": result.coverage,
+        "outputs": [
+            {"gate": led, "detected": detected, "reachable": reachable}
+            for led, (detected, reachable) in result.outputs.items()
+        ],
+        "undetected": [{"gate": gid, "stuck_at": value} for gid, value in result.undetected()]
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Synthetic circuits built from the stock gate types and buses, for benchmarks and tests.
+
+Every generator returns a Netlist whose primary inputs are FalseGate sources
+and whose outputs are LEDGates, laid out on a simple grid so the result is
+also usable in the editor.
+"""
+import random
+
+from engine.bus import PARTS, bus_type
+from engine.netlist import Netlist
+from engine.subcircuit import instantiate
+
+COLUMN_HEIGHT = 50
+
+
+class _Builder:
+    def __init__(self):
+        self.netlist = Netlist()
+
+    def gate(self, gate_type: str, *inputs) -> int:
+        n = self.netlist.n_gates
+        gid = self.netlist.add_gate(gate_type, (n // COLUMN_HEIGHT) * 120.0, (n % COLUMN_HEIGHT) * 70.0)
+        for src in inputs:
+            self.netlist.add_wire(src, gid)
+        return gid
+
+    def xor(self, a: int, b: int) -> int:
+        either = self.gate('OrGate', a, b)
+        both = self.gate('AndGate', a, b)
+        return self.gate('AndGate', either, self.gate('NotGate', both))
+
+
+def ripple_carry_adder(bits: int) -> Netlist:
+    b = _Builder()
+    xs = [b.gate('FalseGate') for _ in range(bits)]
+    ys = [b.gate('FalseGate') for _ in range(bits)]
+    carry = b.gate('FalseGate')
+
+    for x, y in zip(xs, ys):
+        half = b.xor(x, y)
+        b.gate('LEDGate', b.xor(half, carry))
+        carry = b.gate('OrGate', b.gate('AndGate', x, y), b.gate('AndGate', half, carry))
+
+    b.gate('LEDGate', carry)
+    return b.netlist
+
+
+def inverter_chain(length: int) -> Netlist:
+    b = _Builder()
+    node = b.gate('FalseGate')
+    for _ in range(length):
+        node = b.gate('NotGate', node)
+    b.gate('LEDGate', node)
+    return b.netlist
+
+
+def gate_tree(width: int, gate_type: str = 'AndGate', fanin: int = 2) -> Netlist:
+    b = _Builder()
+    level = [b.gate('FalseGate') for _ in range(width)]
+    while len(level) > 1:
+        level = [b.gate(gate_type, *level[i:i + fanin]) for i in range(0, len(level), fanin)]
+    b.gate('LEDGate', level[0])
+    return b.netlist
+
+
+def random_dag(n_gates: int, n_inputs: int = 16, fanin: int = 2, seed: int = 0) -> Netlist:
+    rng = random.Random(seed)
+    b = _Builder()
+    nodes = [b.gate('FalseGate') for _ in range(n_inputs)]
+
+    for _ in range(n_gates):
+        gate_type = rng.choice(('AndGate', 'OrGate', 'NotGate'))
+        n = 1 if gate_type == 'NotGate' else fanin
+        nodes.append(b.gate(gate_type, *rng.sample(nodes, min(n, len(nodes)))))
+
+    for node in nodes[-min(16, n_gates):]:
+        b.gate('LEDGate', node)
+    return b.netlist
+
+
+def ring_oscillator(stages: int) -> Netlist:
+    if stages % 2 == 0:
+        raise ValueError('A ring oscillator needs an odd number of stages')
+
+    b = _Builder()
+    first = node = b.gate('NotGate')
+    for _ in range(stages - 1):
+        node = b.gate('NotGate', node)
+    b.netlist.add_wire(node, first)
+    b.gate('LEDGate', node)
+    return b.netlist
+
+
+def bus_pipeline(stages: int, width: int = 32) -> Netlist:
+    """Bitwise AND/OR/NOT stages over two merged buses, split back into LEDs at the end."""
+    b = _Builder()
+    for kind in ('Merge', 'Split'):
+        bus_type(f'{kind}{width}.out')
+
+    buses = []
+    for _ in range(2):
+        sources = [b.gate('FalseGate') for _ in range(width)]
+        merge = instantiate(b.netlist, PARTS[f'Merge{width}'])
+        for i, src in enumerate(sources):
+            b.netlist.add_wire(src, merge + i)
+        buses.append(merge + width)
+
+    x, y = buses
+    for stage in range(stages):
+        if stage % 3 == 0:
+            x = b.gate(f'BusAnd{width}', x, y)
+        elif stage % 3 == 1:
+            y = b.gate(f'BusOr{width}', x, y)
+        else:
+            x = b.gate(f'BusNot{width}', x)
+
+    split = instantiate(b.netlist, PARTS[f'Split{width}'])
+    b.netlist.add_wire(x, split)
+    for i in range(width):
+        b.gate('LEDGate', split + 1 + i)
+    return b.netlist
+
+
+GENERATORS = {
+    'adder': ripple_carry_adder,
+    'chain': inverter_chain,
+    'and_tree': lambda n: gate_tree(n, 'AndGate'),
+    'or_tree': lambda n: gate_tree(n, 'OrGate'),
+    'wide_and': lambda n: gate_tree(n, 'AndGate', n),
+    'random_dag': random_dag,
+    'ring': ring_oscillator,
+    'bus_pipeline': bus_pipeline,
+}
@@ -0,0 +1,300 @@
+"""Edit journal: undo/redo and incremental autosave.
+
+The journal observes a Netlist and records every edit command together with
+the command that reverts it. Commands issued inside action() form a single
+undo step; consecutive gate moves are merged until checkpoint(), so dragging
+any number of gates is one step.
+
+With autosave enabled, each action is also appended to a log next to a
+snapshot of the netlist, so saving costs the size of the edits. Once the log
+outgrows the snapshot, or an edit uses a subcircuit the snapshot does not
+define, a new snapshot is written and the log starts over.
+Files are numbered by snapshot generation, so a crash while compacting leaves
+the previous pair intact:
+
+    snapshot-<generation>.lcb   netlist with gate ids preserved
+    journal-<generation>.log    one JSON list of commands per autosave
+"""
+import json
+import os
+from collections import deque
+from contextlib import contextmanager
+
+from engine.binary_format import load_binary, save_binary
+from engine.netlist import Netlist, REMOVED, TYPE_NAMES
+from engine.subcircuit import PINS, Subcircuit, used_definitions
+
+
+class Journal:
+    def __init__(self, netlist: Netlist, limit: int = 1000):
+        self.netlist = netlist
+        self.undo_stack = deque(maxlen=limit)  # (commands, inverse commands)
+        self.redo_stack = []
+
+        # True while undo()/redo() replay commands; observers can use it to tell replays from user edits
+        self.replaying = False
+
+        self._current = None  # open action: ([commands], [inverses])
+        self._depth = 0
+        self._moving = None   # gate id -> index in the last step, for moves still being merged into it
+
+        # Shadow of the gate attributes an edit overwrites, needed to build inverses
+        self._types = netlist.types[:]
+        self._xs = netlist.xs[:]
+        self._ys = netlist.ys[:]
+
+        # Autosave
+        self.directory = None
+        self.generation = 0
+        self.min_compact_bytes = 1 << 20
+        self._pending = []
+        self._needs_snapshot = True
+        self._snapshot_bytes = 0
+        self._log_bytes = 0
+        self._snapshot_definitions = set()  # subcircuits the snapshot defines; the log can't define more
+
+        netlist.observers.append(self.on_edit)
+
+    def detach(self):
+        self.netlist.observers.remove(self.on_edit)
+
+    # Recording
+
+    @contextmanager
+    def action(self):
+        """Group every edit made inside the block into one undo step."""
+        if self._depth == 0:
+            self._current = ([], [])
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                commands, inverses = self._current
+                self._current = None
+                if commands:
+                    self._push(commands, inverses)
+
+    def checkpoint(self):
+        """Stop merging gate moves into the last undo step, e.g. at the end of a drag."""
+        self._moving = None
+
+    def on_edit(self, command: tuple):
+        name = command[0]
+        if name in ('clear', 'extend'):
+            # A different circuit: nothing before it can be undone, and the log can't hold it
+            self._types = self.netlist.types[:]
+            self._xs = self.netlist.xs[:]
+            self._ys = self.netlist.ys[:]
+            self.undo_stack.clear()
+            self.redo_stack.clear()
+            self._moving = None
+            self._pending.clear()
+            self._needs_snapshot = True
+            return
+
+        inverse = self._inverse(command)
+        if self.directory is not None:
+            # Without autosave nothing would ever clear the log; enabling it starts from a snapshot anyway
+            self._pending.append(command)
+        if self.replaying:
+            return
+
+        if name == 'add_gate':
+            # Redo has to bring back the same id rather than append another gate
+            command = ('restore_gate', inverse[1], *command[1:])
+
+        self.redo_stack.clear()
+        if self._current is not None:
+            self._current[0].append(command)
+            self._current[1].append(inverse)
+        elif name == 'move_gate' and self._moving is not None and self.undo_stack:
+            commands, inverses = self.undo_stack[-1]
+            index = self._moving.get(command[1])
+            if index is None:
+                self._moving[command[1]] = len(commands)
+                commands.append(command)
+                inverses.append(inverse)
+            else:
+                # Keep the first inverse so undo returns to where the drag started
+                commands[index] = command
+        else:
+            self._push([command], [inverse])
+            if name == 'move_gate':
+                self._moving = {command[1]: 0}
+
+    def _push(self, commands: list, inverses: list):
+        self.undo_stack.append((commands, inverses))
+        self._moving = None
+
+    def _inverse(self, command: tuple) -> tuple:
+        name = command[0]
+        if name == 'add_gate':
+            _, code, x, y = command
+            gid = len(self._types)
+            self._types.append(code)
+            self._xs.append(x)
+            self._ys.append(y)
+            return 'remove_gate', gid
+        if name == 'move_gate':
+            _, gid, x, y = command
+            inverse = 'move_gate', gid, self._xs[gid], self._ys[gid]
+            self._xs[gid] = x
+            self._ys[gid] = y
+            return inverse
+        if name == 'remove_gate':
+            gid = command[1]
+            inverse = 'restore_gate', gid, self._types[gid], self._xs[gid], self._ys[gid]
+            self._types[gid] = REMOVED
+            return inverse
+        if name == 'restore_gate':
+            _, gid, code, x, y = command
+            self._types[gid] = code
+            self._xs[gid] = x
+            self._ys[gid] = y
+            return 'remove_gate', gid
+        if name == 'add_wire':
+            return 'remove_wire', command[1], command[2]
+        if name == 'remove_wire':
+            return 'add_wire', command[1], command[2]
+        raise ValueError(f'Unknown command: {name}')
+
+    # Undo / redo
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self.undo_stack)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self.redo_stack)
+
+    def undo(self) -> bool:
+        if not self.undo_stack:
+            return False
+
+        commands, inverses = self.undo_stack.pop()
+        self._moving = None
+        self._replay(reversed(inverses))
+        self.redo_stack.append((commands, inverses))
+        return True
+
+    def redo(self) -> bool:
+        if not self.redo_stack:
+            return False
+
+        commands, inverses = self.redo_stack.pop()
+        self._replay(commands)
+        self.undo_stack.append((commands, inverses))
+        return True
+
+    def _replay(self, commands):
+        self._moving = None
+        self.replaying = True
+        try:
+            for command in commands:
+                self.netlist.apply(command)
+        finally:
+            self.replaying = False
+
+    # Autosave
+
+    def enable_autosave(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.generation = latest_generation(directory)
+        self._needs_snapshot = True
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending) or self._needs_snapshot
+
+    def autosave(self):
+        """Append the edits made since the last call, compacting into a new snapshot when due."""
+        if self.directory is None or not self.dirty:
+            return
+
+        if (self._needs_snapshot or self._log_bytes > max(self.min_compact_bytes, self._snapshot_bytes)
+                or self._defines_new_subcircuit()):
+            self._write_snapshot()
+        else:
+            line = json.dumps([_encode(command) for command in self._pending]) + '\n'
+            with open(self._path('journal', self.generation), 'a') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._log_bytes += len(line)
+
+        self._pending.clear()
+
+    def _defines_new_subcircuit(self) -> bool:
+        for command in self._pending:
+            if command[0] in ('add_gate', 'restore_gate'):
+                pin = PINS.get(command[-3])
+                if pin is not None and isinstance(pin[0], Subcircuit) and pin[0].name not in self._snapshot_definitions:
+                    return True
+        return False
+
+    def _write_snapshot(self):
+        generation = self.generation + 1
+        path = self._path('snapshot', generation)
+        save_binary(self.netlist, path + '.tmp', compact=False)
+        self._snapshot_definitions = set(used_definitions(self.netlist))
+        os.replace(path + '.tmp', path)
+
+        for name in os.listdir(self.directory):
+            if _generation_of(name) not in (None, generation):
+                os.remove(os.path.join(self.directory, name))
+
+        self.generation = generation
+        self._snapshot_bytes = os.path.getsize(path)
+        self._log_bytes = 0
+        self._needs_snapshot = False
+
+    def _path(self, kind: str, generation: int) -> str:
+        return os.path.join(self.directory, f'{kind}-{generation}.{"lcb" if kind == "snapshot" else "log"}')
+
+
+def _encode(command: tuple) -> list:
+    # Type codes are per process, names are not
+    if command[0] in ('add_gate', 'restore_gate'):
+        command = list(command)
+        command[-3] = TYPE_NAMES[command[-3]]
+    return list(command)
+
+
+def _generation_of(name: str):
+    stem, _, ext = name.partition('.')
+    kind, _, number = stem.partition('-')
+    if kind not in ('snapshot', 'journal') or ext not in ('lcb', 'log') or not number.isdigit():
+        return None
+    return int(number)
+
+
+def latest_generation(directory: str) -> int:
+    """Generation of the newest complete snapshot in directory, or 0 if there is none."""
+    if not os.path.isdir(directory):
+        return 0
+    snapshots = [_generation_of(name) for name in os.listdir(directory) if name.endswith('.lcb')]
+    return max((g for g in snapshots if g is not None), default=0)
+
+
+def recover(directory: str):
+    """Netlist rebuilt from the newest snapshot and its log, or None if there is nothing to recover."""
+    generation = latest_generation(directory)
+    if not generation:
+        return None
+
+    netlist = load_binary(os.path.join(directory, f'snapshot-{generation}.lcb'))
+    log = os.path.join(directory, f'journal-{generation}.log')
+    if os.path.exists(log):
+        with open(log) as f:
+            for line in f:
+                try:
+                    commands = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn write at the end of the log
+                for command in commands:
+                    netlist.apply(tuple(command))
+    return netlist
@@ -0,0 +1,168 @@
+"""Incremental reader for the circuit JSON format.
+
+The file is decoded a chunk at a time and each element of the top-level
+"gates" and "wires" arrays is parsed on its own, so the whole document is
+never held in memory as text or as Python objects. Gates go straight into the
+arrays of a new Netlist and wires are resolved once every gate id is known.
+"""
+import codecs
+import json
+import os
+import re
+from array import array
+
+from engine.netlist import Netlist, UNKNOWN, find_type
+from engine.subcircuit import define_all
+
+_skip_whitespace = re.compile(r'[ \t\n\r]*').match
+_separator = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*').match
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class _Reader:
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.bytes_read = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+
+        raw = self.f.read(self.chunk_size)
+        self.bytes_read += len(raw)
+        if not raw:
+            self.eof = True
+        # Drop what was consumed so the buffer stays around one chunk long
+        self.buf = self.buf[self.pos:] + self.decoder.decode(raw, final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            buf = self.buf
+            pos = self.pos = _skip_whitespace(buf, self.pos).end()
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of file')
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f'Expected {char!r} near byte {self.bytes_read}')
+        self.pos += 1
+
+    def more(self) -> bool:
+        """Step past the separator after an array element; False at the end of the array."""
+        match = _separator(self.buf, self.pos)
+        if match is not None and match.end() < len(self.buf):
+            self.pos = match.end()
+            return match.group(1) == ','
+
+        # Separator split across chunks
+        if self.peek() == ']':
+            self.pos += 1
+            return False
+        self.expect(',')
+        return True
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A number running into the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_document(f, chunk_size: int = 1 << 20):
+    """Yield (key, value, bytes read so far) for the top-level object, array members one element at a time."""
+    reader = _Reader(f, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(':')
+
+        if reader.peek() == '[':
+            reader.pos += 1
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                more = True
+                while more:
+                    yield key, reader.value(), reader.bytes_read
+                    more = reader.more()
+        else:
+            yield key, reader.value(), reader.bytes_read
+
+        if reader.peek() == '}':
+            return
+        reader.expect(',')
+
+
+def load_circuit(path: str, progress=None, chunk_size: int = 1 << 20, report_every: int = 4096) -> Netlist:
+    """Read a circuit JSON file into a new Netlist.
+
+    progress(bytes_read, total_bytes) is called periodically; returning False
+    raises LoadCancelled.
+    """
+    netlist = Netlist()
+    types, xs, ys = netlist.types, netlist.xs, netlist.ys
+    gate_map = {}
+    wire_src, wire_dst = array('l'), array('l')
+
+    with open(path, 'rb') as f:
+        total = os.fstat(f.fileno()).st_size
+        for count, (key, item, done) in enumerate(iter_document(f, chunk_size)):
+            if key == 'gates':
+                code = find_type(item['type'])
+                if code is None:
+                    raise RuntimeError(f"Unknown gate: {item['type']}")
+                gate_map[item['id']] = len(types)
+                types.append(code)
+                xs.append(item['x'])
+                ys.append(item['y'])
+            elif key == 'wires':
+                wire_src.append(item['src'])
+                wire_dst.append(item['dst'])
+            elif key == 'subcircuits':
+                define_all(item)
+
+            if progress is not None and not count % report_every and progress(done, total) is False:
+                raise LoadCancelled(path)
+
+    netlist.state.extend(bytes([UNKNOWN]) * len(types))
+
+    # Wires may refer to gates listed after them; ones to unknown gates are dropped like in merge()
+    for src, dst in zip(wire_src, wire_dst):
+        src = gate_map.get(src)
+        dst = gate_map.get(dst)
+        if src is not None and dst is not None:
+            netlist.wire_src.append(src)
+            netlist.wire_dst.append(dst)
+
+    netlist.version += 1
+    if progress is not None:
+        progress(total, total)
+    return netlist
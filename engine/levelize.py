@@ -0,0 +1,237 @@
+"""Levelized compilation of a Netlist.
+
+The gate graph is split into strongly connected components. Acyclic gates end
+up as singleton blocks, feedback loops as multi-gate (or self-looped) blocks,
+and the blocks are ranked in topological order so a single ordered pass
+settles every acyclic region.
+
+A Levelization can also be kept up to date through edits with update(),
+which only reorders the blocks an edit affects.
+"""
+from array import array
+
+from engine.netlist import Netlist
+
+
+class Levelization:
+    __slots__ = ('version', 'blocks', 'cyclic', 'block_of', 'holes')
+
+    def __init__(self, version, blocks, cyclic, block_of):
+        self.version = version
+        self.blocks = blocks      # gate id tuples, in topological order
+        self.cyclic = cyclic      # per block: 1 if it is a feedback loop
+        self.block_of = block_of  # per gate: rank of its block, -1 for removed gates
+        self.holes = 0            # empty blocks left behind by update()
+
+    @property
+    def n_blocks(self) -> int:
+        return len(self.blocks)
+
+    @property
+    def is_acyclic(self) -> bool:
+        return not any(self.cyclic)
+
+    def gate_order(self) -> list:
+        return [gid for block in self.blocks for gid in block]
+
+    def update(self, netlist: Netlist, commands) -> bool:
+        """Apply the edits listed by Netlist.edits_since in place.
+
+        New gates are ranked last, and a wire against the order only moves the
+        blocks ranked between its ends (Pearce-Kelly), merging them into one
+        loop when it closes a cycle. Removed gates leave empty blocks behind.
+        Returns False, leaving the levelization unusable, for edits it does
+        not handle (cutting into a feedback loop, bulk edits); levelize()
+        again then.
+        """
+        blocks, cyclic, block_of = self.blocks, self.cyclic, self.block_of
+        added = []
+        self_loops = set()
+
+        for name, *args in commands:
+            if name in ('add_gate', 'restore_gate'):
+                gid = args[0]
+                if gid >= len(block_of):
+                    block_of.extend(array('l', [-1]) * (gid + 1 - len(block_of)))
+                block_of[gid] = len(blocks)
+                blocks.append((gid,))
+                cyclic.append(0)
+            elif name == 'remove_gate':
+                gid = args[0]
+                rank = block_of[gid]
+                if len(blocks[rank]) > 1:
+                    return False
+                blocks[rank] = ()
+                cyclic[rank] = 0
+                block_of[gid] = -1
+                self.holes += 1
+            elif name == 'add_wire':
+                added.append(args)
+            elif name == 'remove_wire':
+                src, dst = args
+                rank = block_of[src]
+                if rank >= 0 and rank == block_of[dst]:
+                    if len(blocks[rank]) > 1:
+                        return False
+                    self_loops.add(src)
+            else:
+                return False
+
+        if self.holes * 2 > len(blocks):
+            return False
+
+        for gid in self_loops:
+            if block_of[gid] >= 0:
+                cyclic[block_of[gid]] = gid in netlist.fanout(gid)
+
+        # Wires last, over the final graph; ones removed again in the same batch are skipped
+        for src, dst in added:
+            rank_src, rank_dst = block_of[src], block_of[dst]
+            if rank_src < 0 or rank_dst < 0 or dst not in netlist.fanout(src):
+                continue
+            if rank_src == rank_dst:
+                cyclic[rank_src] = 1
+            elif rank_src > rank_dst:
+                self._reorder(netlist, rank_dst, rank_src)
+
+        self.version = netlist.version
+        return True
+
+    def _reorder(self, netlist: Netlist, low: int, high: int):
+        # A wire from block high back to block low
+        blocks, cyclic, block_of = self.blocks, self.cyclic, self.block_of
+        csr = netlist.csr
+
+        def reach(start, ptr, idx, inside, limit=None):
+            found = {start}
+            stack = [start]
+            while stack:
+                for gid in blocks[stack.pop()]:
+                    for i in range(ptr[gid], ptr[gid + 1]):
+                        rank = block_of[idx[i]]
+                        if inside(rank) and rank not in found:
+                            found.add(rank)
+                            stack.append(rank)
+                if limit is not None and len(found) > limit:
+                    return None
+            return found
+
+        backward = reach(high, csr.fanin_ptr, csr.fanin_idx, lambda rank: low <= rank < high)
+        loop = set()
+        if low in backward:
+            # Everything on a path from low to high is now one loop
+            loop = reach(low, csr.fanout_ptr, csr.fanout_idx, lambda rank: rank in backward)
+        # Past a sixteenth of the window, shifting the whole window is cheaper than finding what low reaches
+        forward = reach(low, csr.fanout_ptr, csr.fanout_idx, lambda rank: low < rank <= high, (high - low) // 16)
+
+        if forward is not None:
+            # Pearce-Kelly: blocks reaching high only move down and blocks low reaches only up
+            slots = sorted(forward | backward)
+            front, back = sorted(backward - loop), sorted(forward - loop)
+        else:
+            # What reaches high first, then the rest of the window in its order
+            slots = range(low, high + 1)
+            front = sorted(backward - loop)
+            back = [rank for rank in slots if rank not in backward]
+
+        order = [(blocks[rank], cyclic[rank]) for rank in front]
+        if loop:
+            # The slots the merged blocks free are left empty
+            order.append((tuple(gid for rank in sorted(loop) for gid in blocks[rank]), 1))
+            order += [((), 0)] * (len(loop) - 1)
+            self.holes += len(loop) - 1
+        order += [(blocks[rank], cyclic[rank]) for rank in back]
+
+        for rank, (block, is_cyclic) in zip(slots, order):
+            blocks[rank] = block
+            cyclic[rank] = is_cyclic
+            for gid in block:
+                block_of[gid] = rank
+
+
+def _strongly_connected(netlist: Netlist) -> list:
+    # Iterative Tarjan; components come out sinks first
+    csr = netlist.csr
+    fanout_ptr, fanout_idx = csr.fanout_ptr, csr.fanout_idx
+    n = netlist.n_gates
+
+    index = array('l', [-1]) * n
+    low = array('l', [0]) * n
+    on_stack = bytearray(n)
+    stack = []
+    components = []
+    counter = 0
+
+    for root in netlist.gate_ids():
+        if index[root] != -1:
+            continue
+
+        work = [(root, fanout_ptr[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+
+        while work:
+            gid, i = work[-1]
+            if i < fanout_ptr[gid + 1]:
+                work[-1] = (gid, i + 1)
+                nxt = fanout_idx[i]
+                if index[nxt] == -1:
+                    index[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = 1
+                    work.append((nxt, fanout_ptr[nxt]))
+                elif on_stack[nxt] and index[nxt] < low[gid]:
+                    low[gid] = index[nxt]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[gid] < low[parent]:
+                    low[parent] = low[gid]
+
+            if low[gid] == index[gid]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component.append(member)
+                    if member == gid:
+                        break
+                component.reverse()
+                components.append(tuple(component))
+
+    return components
+
+
+def levelize(netlist: Netlist) -> Levelization:
+    csr = netlist.csr
+    fanout_ptr, fanout_idx = csr.fanout_ptr, csr.fanout_idx
+
+    blocks = _strongly_connected(netlist)
+    blocks.reverse()
+
+    block_of = array('l', [-1]) * netlist.n_gates
+    for rank, block in enumerate(blocks):
+        for gid in block:
+            block_of[gid] = rank
+
+    cyclic = bytearray(len(blocks))
+    for rank, block in enumerate(blocks):
+        if len(block) > 1:
+            cyclic[rank] = 1
+            continue
+        gid = block[0]
+        for i in range(fanout_ptr[gid], fanout_ptr[gid + 1]):
+            if fanout_idx[i] == gid:
+                cyclic[rank] = 1
+
+    return Levelization(netlist.version, blocks, cyclic, block_of)
+
+
+def compiled(netlist: Netlist) -> Levelization:
+    """Levelization of the netlist, recomputed only after a topology change."""
+    return netlist.cached('levelization', levelize)
@@ -0,0 +1,517 @@
+"""Headless netlist model.
+
+Gates are rows in a set of parallel arrays indexed by an integer gate id, wires
+are a flat (src, dst) edge list, and fan-in/fan-out are derived as CSR index
+arrays on demand and then patched in place by single edits. Nothing here imports Qt, so circuits can be built, simulated
+and serialized without a GUI.
+"""
+import json
+import math
+from array import array
+from typing import NamedTuple
+
+# Gate type codes
+FALSE, TRUE, LED, AND, OR, NOT = range(6)
+REMOVED = 255
+
+# Signal values stored in Netlist.state
+LOW, HIGH, UNKNOWN = 0, 1, 2
+
+# Topology changes remembered for incremental consumers, see Netlist.edits_since
+EDIT_LOG_SIZE = 256
+
+# Indexed by type code; names match the GateItem class names used in the JSON format
+TYPE_NAMES = ['FalseGate', 'TrueGate', 'LEDGate', 'AndGate', 'OrGate', 'NotGate']
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+TYPE_INPUTS = [0, 0, 1, math.inf, math.inf, math.inf]
+TYPE_OUTPUTS = [math.inf, math.inf, 0, math.inf, math.inf, math.inf]
+
+# Registered types either behave like a built-in type or have an evaluate(netlist, gid) function
+TYPE_LIKE = [FALSE, TRUE, LED, AND, OR, NOT]
+TYPE_EVALUATORS = [None] * 6
+
+
+def register_type(name: str, n_inputs: float, n_outputs: float, like: int = None, evaluate=None) -> int:
+    if name in TYPE_CODES:
+        return TYPE_CODES[name]
+
+    code = len(TYPE_NAMES)
+    if code >= REMOVED:
+        raise RuntimeError('Too many gate types')
+
+    TYPE_NAMES.append(name)
+    TYPE_CODES[name] = code
+    TYPE_INPUTS.append(n_inputs)
+    TYPE_OUTPUTS.append(n_outputs)
+    TYPE_LIKE.append(like)
+    TYPE_EVALUATORS.append(evaluate)
+    return code
+
+
+def to_bool(value: int):
+    return (False, True, None)[value]
+
+
+def from_bool(value) -> int:
+    if value is None:
+        return UNKNOWN
+    return HIGH if value else LOW
+
+
+def find_type(name: str):
+    """Code of a type name, or None if it is unknown."""
+    if name in TYPE_CODES:
+        return TYPE_CODES[name]
+    # Bus types are registered per width on first use
+    from engine.bus import bus_type
+    return bus_type(name)
+
+
+def _type_code(gate_type) -> int:
+    if isinstance(gate_type, str):
+        code = find_type(gate_type)
+        if code is None:
+            raise RuntimeError(f'Unknown gate: {gate_type}')
+        return code
+    return gate_type
+
+
+class CSR(NamedTuple):
+    fanin_ptr: array
+    fanin_idx: array
+    fanout_ptr: array
+    fanout_idx: array
+
+
+def _group(n: int, keys: array, values: array):
+    # Stable counting sort of values by key, so per-gate order follows wire insertion order
+    ptr = array('l', [0]) * (n + 1)
+    for k in keys:
+        ptr[k + 1] += 1
+    for i in range(n):
+        ptr[i + 1] += ptr[i]
+
+    idx = array('l', [0]) * len(keys)
+    cursor = ptr[:-1]
+    for k, v in zip(keys, values):
+        idx[cursor[k]] = v
+        cursor[k] += 1
+
+    return ptr, idx
+
+
+def _shift(ptr: array, start: int, delta: int):
+    ptr[start:] = array('l', [p + delta for p in ptr[start:]])
+
+
+def _positions(column: array, value: int) -> set:
+    # Indices holding value, found with C-level scans
+    found = set()
+    i = -1
+    try:
+        while True:
+            i = column.index(value, i + 1)
+            found.add(i)
+    except ValueError:
+        return found
+
+
+def _group_insert(ptr: array, idx: array, key: int, value: int):
+    # Last in the key's group, where _group puts the most recently added wire
+    idx.insert(ptr[key + 1], value)
+    _shift(ptr, key + 1, 1)
+
+
+def _group_delete(ptr: array, idx: array, key: int, value: int):
+    # First occurrence, matching remove_wire dropping the first matching wire
+    del idx[idx.index(value, ptr[key], ptr[key + 1])]
+    _shift(ptr, key + 1, -1)
+
+
+class Netlist:
+    __slots__ = ('types', 'xs', 'ys', 'state', 'words', 'word_changes', 'wire_src', 'wire_dst', 'version', 'observers',
+                 '_csr', '_csr_version', '_views', '_views_version', '_edits')
+
+    def __init__(self):
+        self.types = array('B')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.state = bytearray()
+        self.wire_src = array('l')
+        self.wire_dst = array('l')
+
+        # Values of bus gates as (hi, lo) bit masks, see engine.bus; their state is bit 0.
+        # evaluate() leaves a word that differs from the current one in word_changes, and
+        # simulators move it into words when they apply the gate's new state, as bit 0 may not change
+        self.words = {}
+        self.word_changes = {}
+
+        # Bumped on every topology change; compiled views compare against it
+        self.version = 0
+
+        # Callables receiving every edit as a command tuple, see apply()
+        self.observers = []
+
+        self._csr = None
+        self._csr_version = -1
+        self._views = {}
+        self._views_version = -1
+
+        # (version, commands) per topology change, oldest first
+        self._edits = []
+
+    def clear(self):
+        del self.types[:], self.xs[:], self.ys[:], self.state[:]
+        del self.wire_src[:], self.wire_dst[:]
+        self.words.clear()
+        self.word_changes.clear()
+        self.version += 1
+        self._log(('clear',))
+        if self.observers:
+            self._notify(('clear',))
+
+    def copy(self) -> 'Netlist':
+        netlist = Netlist()
+        netlist.types.extend(self.types)
+        netlist.xs.extend(self.xs)
+        netlist.ys.extend(self.ys)
+        netlist.state.extend(self.state)
+        netlist.words.update(self.words)
+        netlist.wire_src.extend(self.wire_src)
+        netlist.wire_dst.extend(self.wire_dst)
+        return netlist
+
+    @property
+    def n_gates(self) -> int:
+        return len(self.types)
+
+    @property
+    def n_wires(self) -> int:
+        return len(self.wire_src)
+
+    def gate_ids(self):
+        return (gid for gid, t in enumerate(self.types) if t != REMOVED)
+
+    def type_name(self, gid: int) -> str:
+        return TYPE_NAMES[self.types[gid]]
+
+    def get_state(self, gid: int):
+        return to_bool(self.state[gid])
+
+    # Editing
+
+    def add_gate(self, gate_type, x: float = 0.0, y: float = 0.0) -> int:
+        gate_type = _type_code(gate_type)
+        gid = len(self.types)
+        csr = self._current_csr()
+        self.types.append(gate_type)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.state.append(UNKNOWN)
+        self.version += 1
+        if csr is not None:
+            csr.fanin_ptr.append(csr.fanin_ptr[-1])
+            csr.fanout_ptr.append(csr.fanout_ptr[-1])
+            self._csr_version = self.version
+        self._log(('add_gate', gid))
+        if self.observers:
+            self._notify(('add_gate', gate_type, x, y))
+        return gid
+
+    def move_gate(self, gid: int, x: float, y: float):
+        self.xs[gid] = x
+        self.ys[gid] = y
+        if self.observers:
+            self._notify(('move_gate', gid, x, y))
+
+    def remove_gate(self, gid: int):
+        indices = sorted(_positions(self.wire_src, gid) | _positions(self.wire_dst, gid))
+        removed = [('remove_wire', self.wire_src[i], self.wire_dst[i]) for i in indices]
+        if removed:
+            if self.observers:
+                # Observers see the wires go first, so they never hold a wire to a removed gate
+                for command in removed:
+                    self._notify(command)
+            if len(indices) <= 16:
+                for i in reversed(indices):
+                    del self.wire_src[i]
+                    del self.wire_dst[i]
+            else:
+                keep = [i for i, (s, d) in enumerate(zip(self.wire_src, self.wire_dst)) if s != gid and d != gid]
+                self.wire_src[:] = array('l', (self.wire_src[i] for i in keep))
+                self.wire_dst[:] = array('l', (self.wire_dst[i] for i in keep))
+
+        # Patching costs a pass over the pointers per wire, so busy gates rebuild instead
+        csr = self._current_csr() if len(removed) <= 16 else None
+        if csr is not None:
+            for _, s, d in removed:
+                _group_delete(csr.fanout_ptr, csr.fanout_idx, s, d)
+                _group_delete(csr.fanin_ptr, csr.fanin_idx, d, s)
+
+        self.types[gid] = REMOVED
+        self.state[gid] = UNKNOWN
+        self.words.pop(gid, None)
+        self.word_changes.pop(gid, None)
+        self.version += 1
+        if csr is not None:
+            self._csr_version = self.version
+        self._log(*removed, ('remove_gate', gid))
+        if self.observers:
+            self._notify(('remove_gate', gid))
+
+    def restore_gate(self, gid: int, gate_type, x: float, y: float):
+        """Bring a removed gate back under its old id, without its wires."""
+        if self.types[gid] != REMOVED:
+            raise ValueError(f'Gate {gid} was not removed')
+
+        gate_type = _type_code(gate_type)
+        csr = self._current_csr()
+        self.types[gid] = gate_type
+        self.xs[gid] = x
+        self.ys[gid] = y
+        self.state[gid] = UNKNOWN
+        self.words.pop(gid, None)
+        self.word_changes.pop(gid, None)
+        self.version += 1
+        if csr is not None:
+            self._csr_version = self.version
+        self._log(('restore_gate', gid))
+        if self.observers:
+            self._notify(('restore_gate', gid, gate_type, x, y))
+
+    def add_wire(self, src: int, dst: int):
+        csr = self._current_csr()
+        self.wire_src.append(src)
+        self.wire_dst.append(dst)
+        self.version += 1
+        if csr is not None:
+            _group_insert(csr.fanout_ptr, csr.fanout_idx, src, dst)
+            _group_insert(csr.fanin_ptr, csr.fanin_idx, dst, src)
+            self._csr_version = self.version
+        self._log(('add_wire', src, dst))
+        if self.observers:
+            self._notify(('add_wire', src, dst))
+
+    def remove_wire(self, src: int, dst: int):
+        for i in sorted(_positions(self.wire_dst, dst)):
+            if self.wire_src[i] == src:
+                csr = self._current_csr()
+                del self.wire_src[i]
+                del self.wire_dst[i]
+                self.version += 1
+                if csr is not None:
+                    _group_delete(csr.fanout_ptr, csr.fanout_idx, src, dst)
+                    _group_delete(csr.fanin_ptr, csr.fanin_idx, dst, src)
+                    self._csr_version = self.version
+                self._log(('remove_wire', src, dst))
+                if self.observers:
+                    self._notify(('remove_wire', src, dst))
+                return
+
+        raise ValueError(f'No wire from {src} to {dst}')
+
+    def extend(self, other: 'Netlist') -> int:
+        """Append all gates and wires of another netlist as one edit, returning the id of its first gate."""
+        offset = len(self.types)
+        self.types.extend(other.types)
+        self.xs.extend(other.xs)
+        self.ys.extend(other.ys)
+        self.state.extend(other.state)
+        self.words.update((gid + offset, value) for gid, value in other.words.items())
+        if offset:
+            self.wire_src.extend(array('l', (s + offset for s in other.wire_src)))
+            self.wire_dst.extend(array('l', (d + offset for d in other.wire_dst)))
+        else:
+            self.wire_src.extend(other.wire_src)
+            self.wire_dst.extend(other.wire_dst)
+        self.version += 1
+        self._log(('extend', offset, len(self.types)))
+        if self.observers:
+            self._notify(('extend', other))
+        return offset
+
+    def apply(self, command: tuple):
+        """Replay an edit command as passed to observers."""
+        name, *args = command
+        if name not in ('clear', 'add_gate', 'move_gate', 'remove_gate', 'restore_gate', 'add_wire', 'remove_wire',
+                        'extend'):
+            raise ValueError(f'Unknown command: {name}')
+        return getattr(self, name)(*args)
+
+    def _notify(self, command: tuple):
+        for observer in self.observers:
+            observer(command)
+
+    def _log(self, *commands):
+        # After the version bump of a topology change
+        edits = self._edits
+        edits.append((self.version, commands))
+        if len(edits) > EDIT_LOG_SIZE:
+            del edits[:EDIT_LOG_SIZE // 2]
+
+    def edits_since(self, version: int):
+        """Topology changes made after the given version, or None if they are not all known.
+
+        The commands are like the ones passed to observers, except that gates
+        are named by id: ('add_gate', gid), ('remove_gate', gid) after
+        ('remove_wire', src, dst) for each of its wires, ('restore_gate', gid),
+        ('add_wire', src, dst), ('remove_wire', src, dst), ('extend', first
+        gid, end gid) and ('clear',). Changes that bypass the editing methods,
+        such as the bulk loaders bumping the version, make earlier versions
+        unknown.
+        """
+        count = self.version - version
+        edits = self._edits
+        if count < 0 or count > len(edits) or (count and (edits[-1][0] != self.version or
+                                                          edits[-count][0] != version + 1)):
+            return None
+        return [command for _, commands in edits[len(edits) - count:] for command in commands]
+
+    # Connectivity
+
+    def _current_csr(self):
+        # The CSR if it is up to date, so an edit can patch it instead of leaving it to be rebuilt
+        return self._csr if self._csr_version == self.version else None
+
+    @property
+    def csr(self) -> CSR:
+        if self._csr_version != self.version:
+            n = len(self.types)
+            fanin_ptr, fanin_idx = _group(n, self.wire_dst, self.wire_src)
+            fanout_ptr, fanout_idx = _group(n, self.wire_src, self.wire_dst)
+            self._csr = CSR(fanin_ptr, fanin_idx, fanout_ptr, fanout_idx)
+            self._csr_version = self.version
+        return self._csr
+
+    def cached(self, key, build):
+        """Derived view of the netlist, rebuilt with build(netlist) after a topology change."""
+        if self._views_version != self.version:
+            self._views.clear()
+            self._views_version = self.version
+
+        view = self._views.get(key)
+        if view is None:
+            view = self._views[key] = build(self)
+        return view
+
+    def fanin(self, gid: int) -> array:
+        csr = self.csr
+        return csr.fanin_idx[csr.fanin_ptr[gid]:csr.fanin_ptr[gid + 1]]
+
+    def fanout(self, gid: int) -> array:
+        csr = self.csr
+        return csr.fanout_idx[csr.fanout_ptr[gid]:csr.fanout_ptr[gid + 1]]
+
+    # Evaluation
+
+    def evaluate(self, gid: int) -> int:
+        """Next state of a gate given the current state of its inputs."""
+        t = self.types[gid]
+        if t > NOT:
+            if t == REMOVED:
+                return UNKNOWN
+            if TYPE_LIKE[t] is None:
+                return TYPE_EVALUATORS[t](self, gid)
+            t = TYPE_LIKE[t]
+
+        if t == FALSE:
+            return LOW
+        if t == TRUE:
+            return HIGH
+
+        csr = self.csr
+        start, end = csr.fanin_ptr[gid], csr.fanin_ptr[gid + 1]
+        if start == end:  # not enough info yet
+            return UNKNOWN
+
+        state = self.state
+        fanin_idx = csr.fanin_idx
+
+        if t == LED:
+            return state[fanin_idx[start]]
+        if t == NOT:
+            # `not None` is True, as it always was for NotGate
+            return LOW if state[fanin_idx[start]] == HIGH else HIGH
+        if t == AND or t == OR:
+            # AND is decided by any LOW input, OR by any HIGH one
+            decisive = LOW if t == AND else HIGH
+            result = HIGH - decisive
+            for i in range(start, end):
+                s = state[fanin_idx[i]]
+                if s == UNKNOWN:
+                    return UNKNOWN
+                if s == decisive:
+                    result = decisive
+            return result
+
+        return UNKNOWN
+
+    # Serialization, same schema as LogicCircuitEditor.serialize
+
+    def serialize(self) -> dict:
+        ids = list(self.gate_ids())
+        remap = {gid: i for i, gid in enumerate(ids)}
+
+        gates_data = [{
+            "id": i,
+            "type": TYPE_NAMES[self.types[gid]],
+            "x": self.xs[gid],
+            "y": self.ys[gid]
+        } for i, gid in enumerate(ids)]
+
+        csr = self.csr
+        wires_data = []
+        for gid in ids:
+            for j in range(csr.fanout_ptr[gid], csr.fanout_ptr[gid + 1]):
+                wires_data.append({
+                    "src": remap[gid],
+                    "dst": remap[csr.fanout_idx[j]]
+                })
+
+        data = {
+            "gates": gates_data,
+            "wires": wires_data
+        }
+
+        if len(TYPE_NAMES) > NOT + 1:
+            # Definitions of the subcircuits used go first, so readers know the types before the gates
+            from engine.subcircuit import used_definitions
+            definitions = used_definitions(self)
+            if definitions:
+                data = {"subcircuits": definitions, **data}
+
+        return data
+
+    def merge(self, data) -> dict:
+        """Add the gates and wires of a serialized circuit, returning its ids mapped to gate ids."""
+        gate_map = {}
+
+        if "subcircuits" in data:
+            from engine.subcircuit import define_all
+            define_all(data["subcircuits"])
+
+        for g in data.get("gates", []):
+            gate_map[g["id"]] = self.add_gate(g["type"], g["x"], g["y"])
+
+        for w in data.get("wires", []):
+            src = gate_map.get(w["src"])
+            dst = gate_map.get(w["dst"])
+            if src is not None and dst is not None:
+                self.add_wire(src, dst)
+
+        return gate_map
+
+    @classmethod
+    def deserialize(cls, data) -> 'Netlist':
+        netlist = cls()
+        netlist.merge(data)
+        return netlist
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.serialize(), f, indent=4)
+
+    @classmethod
+    def load(cls, path: str) -> 'Netlist':
+        with open(path, "r") as f:
+            return cls.deserialize(json.load(f))
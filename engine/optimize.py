@@ -0,0 +1,274 @@
+"""Logic optimization of a Netlist.
+
+optimize() builds the smallest equivalent circuit it can find together with a
+map from every original gate to the optimized gate carrying the same value:
+
+- constant folding: sources that are not free inputs are constants, gates
+  without inputs are unknown constants, and they are propagated through
+  AND/OR/NOT/LED following the three-valued rules of Netlist.evaluate
+- inverter pairs: NOT(NOT(x)) becomes x where x can never be unknown (a NOT
+  of unknown is True, so the pair is not an identity on unknown signals)
+- structural hashing: AND/OR gates over the same set of inputs and NOT gates
+  of the same input are merged, single-input AND/OR gates become wires
+- dead logic: gates that reach no LEDGate (or kept gate) are dropped
+
+Feedback loops are copied as they are, with their inputs optimized. The
+engines settle loops only after their inputs, so the loops see the same
+values as in the original circuit. Subcircuit instances are flattened first.
+"""
+import time
+from array import array
+from typing import NamedTuple
+
+from engine.event_sim import EventSimulator
+from engine.levelize import compiled
+from engine.netlist import Netlist, FALSE, TRUE, LED, AND, OR, NOT, LOW, HIGH, UNKNOWN, TYPE_LIKE
+from engine.subcircuit import flatten, has_instances
+
+
+class Optimization(NamedTuple):
+    netlist: Netlist
+    gate_map: array  # original gate id -> optimized gate id, -1 for dropped gates
+
+    def expand(self, values, default: int = UNKNOWN) -> bytearray:
+        """Per-gate values of the optimized netlist (e.g. its state) mapped back onto the original gate ids."""
+        return bytearray(values[m] if m >= 0 else default for m in self.gate_map)
+
+
+class _Builder:
+    def __init__(self, source: Netlist):
+        self.source = source
+        self.out = Netlist()
+        self.constant = {}  # optimized id -> LOW/HIGH/UNKNOWN for constant gates
+        self.binary = []    # per optimized id: its settled value can never be unknown
+        self.fanin = []     # per optimized id: input ids
+        self.hashed = {}    # (type, inputs) -> optimized id
+        self._constants = {}
+
+    def gate(self, gid: int, t: int, inputs=(), binary: bool = False) -> int:
+        new = self.out.add_gate(t, self.source.xs[gid], self.source.ys[gid])
+        for src in inputs:
+            self.out.add_wire(src, new)
+        self.binary.append(binary)
+        self.fanin.append(tuple(inputs))
+        return new
+
+    def const(self, value: int) -> int:
+        new = self._constants.get(value)
+        if new is None:
+            # An OR without inputs stays unknown, like any unconnected gate
+            t = (FALSE, TRUE, OR)[value]
+            new = self._constants[value] = self.gate(0, t, binary=value != UNKNOWN)
+            self.constant[new] = value
+        return new
+
+    def hashed_gate(self, gid: int, t: int, inputs: tuple, binary: bool) -> int:
+        key = (t, inputs)
+        new = self.hashed.get(key)
+        if new is None:
+            new = self.hashed[key] = self.gate(gid, t, inputs, binary)
+        return new
+
+    def fold(self, gid: int, t: int, inputs: list) -> int:
+        """Optimized id for an acyclic gate of (built-in) type t over optimized inputs."""
+        constant, binary = self.constant, self.binary
+        if not inputs:
+            return self.const(UNKNOWN)
+
+        if t == NOT:
+            x = inputs[0]
+            if x in constant:
+                return self.const(LOW if constant[x] == HIGH else HIGH)
+            if self.out.types[x] == NOT and binary[self.fanin[x][0]]:
+                return self.fanin[x][0]
+            return self.hashed_gate(gid, NOT, (x,), True)
+
+        if t == LED:
+            return inputs[0]
+
+        # AND/OR: any unknown input gives unknown, otherwise a decisive input decides
+        decisive = LOW if t == AND else HIGH
+        if any(constant.get(x) == UNKNOWN for x in inputs):
+            return self.const(UNKNOWN)
+        decided = any(constant.get(x) == decisive for x in inputs)
+        rest = sorted({x for x in inputs if x not in constant})
+        all_binary = all(binary[x] for x in rest)
+
+        if decided:
+            if all_binary:
+                return self.const(decisive)
+            # Still unknown while any other input is
+            return self.hashed_gate(gid, t, tuple(sorted(rest + [self.const(decisive)])), False)
+        if not rest:
+            return self.const(HIGH - decisive)
+        if len(rest) == 1:
+            return rest[0]
+        return self.hashed_gate(gid, t, tuple(rest), all_binary)
+
+
+def optimize(netlist: Netlist, free=(), keep=()) -> Optimization:
+    """Smallest equivalent circuit found for the given netlist.
+
+    Sources in ``free`` are treated as inputs whose value may change (e.g.
+    the stimuli of a BitSimulator run) rather than as constants. Gates in
+    ``keep`` are guaranteed an entry in the gate map; LEDGates always are.
+    """
+    source = flatten(netlist) if has_instances(netlist) else netlist
+    free = set(free)
+    b = _Builder(source)
+    rep = array('l', [-1]) * source.n_gates
+    outputs = []
+
+    lev = compiled(source)
+    for rank, block in enumerate(lev.blocks):
+        if lev.cyclic[rank]:
+            # Loops as drawn; only their inputs from outside change
+            for gid in block:
+                t = TYPE_LIKE[source.types[gid]]
+                rep[gid] = b.gate(gid, t, binary=t == NOT)
+            for gid in block:
+                inputs = tuple(rep[src] for src in source.fanin(gid))
+                for src in inputs:
+                    b.out.add_wire(src, rep[gid])
+                b.fanin[rep[gid]] = inputs
+                if source.types[gid] == LED:
+                    outputs.append(gid)
+            continue
+
+        gid = block[0]
+        code = source.types[gid]
+        t = TYPE_LIKE[code]
+        if t in (FALSE, TRUE):
+            rep[gid] = b.gate(gid, t, binary=True) if gid in free else b.const(LOW if t == FALSE else HIGH)
+            continue
+
+        inputs = [rep[src] for src in source.fanin(gid)]
+        if code == LED:
+            # Outputs stay gates of their own, whatever drives them
+            rep[gid] = b.gate(gid, LED, inputs[:1], bool(inputs) and b.binary[inputs[0]])
+            outputs.append(gid)
+        else:
+            rep[gid] = b.fold(gid, t, inputs)
+
+    # Drop what no output or kept gate depends on
+    out = b.out
+    live = bytearray(out.n_gates)
+    stack = [rep[gid] for gid in outputs] + [rep[gid] for gid in keep if 0 <= gid < len(rep) and rep[gid] >= 0]
+    stack += [rep[gid] for gid in free if 0 <= gid < len(rep) and rep[gid] >= 0]
+    while stack:
+        new = stack.pop()
+        if not live[new]:
+            live[new] = 1
+            stack.extend(b.fanin[new])
+
+    final = Netlist()
+    renumber = array('l', [-1]) * out.n_gates
+    for new in range(out.n_gates):
+        if live[new]:
+            renumber[new] = final.add_gate(out.types[new], out.xs[new], out.ys[new])
+    for src, dst in zip(out.wire_src, out.wire_dst):
+        if live[dst]:
+            final.add_wire(renumber[src], renumber[dst])
+
+    gate_map = array('l', [-1]) * netlist.n_gates
+    for gid in range(netlist.n_gates):
+        if rep[gid] >= 0:
+            gate_map[gid] = renumber[rep[gid]]
+    return Optimization(final, gate_map)
+
+
+class OptimizedSimulator:
+    """EventSimulator run on the optimized circuit, with results written back to every original gate.
+
+    The circuit is optimized again after each topology change, keeping every
+    gate so all of them still get a value. The bit gates of buses are kept
+    too, and bus words are put back together from them.
+    """
+
+    def __init__(self, netlist: Netlist, max_deltas: int = 1000):
+        self.netlist = netlist
+        self.max_deltas = max_deltas
+        self.optimization = None
+        self.inner = None
+        self.oscillating = []
+        self._profiler = None
+        self._members = {}   # optimized id -> original ids
+        self._bits = {}      # bus gate -> optimized ids of its bits, lowest first
+        self._version = -1
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    @profiler.setter
+    def profiler(self, profiler):
+        self._profiler = profiler
+        if self.inner is not None:
+            self.inner.profiler = profiler
+
+    def schedule_all(self):
+        self._version = -1
+
+    @property
+    def busy(self) -> bool:
+        return self._version != self.netlist.version or self.inner is None or self.inner.busy
+
+    @property
+    def settling(self) -> bool:
+        return self.inner is not None and self.inner.settling
+
+    def _rebuild(self):
+        netlist = self.netlist
+        self._version = netlist.version
+        bits = {}
+        source = flatten(netlist, bits) if has_instances(netlist) else netlist
+        keep = [*range(netlist.n_gates), *(gid for ids in bits.values() for gid in ids)]
+        self.optimization = optimize(source, keep=keep)
+        self.inner = EventSimulator(self.optimization.netlist, self.max_deltas)
+        self.inner.profiler = self._profiler
+
+        members = self._members = {}
+        for gid in netlist.gate_ids():
+            members.setdefault(self.optimization.gate_map[gid], []).append(gid)
+
+        gate_map = self.optimization.gate_map
+        self._bits = {gid: [gate_map[b] for b in ids] for gid, ids in bits.items() if gid < netlist.n_gates}
+
+    def step(self, budget: float = None) -> set:
+        rebuilt = self._version != self.netlist.version
+        if rebuilt:
+            start = time.perf_counter()
+            self._rebuild()
+            if budget is not None:
+                budget = max(0.0, budget - (time.perf_counter() - start))
+
+        inner = self.inner
+        inner_changed = inner.step(budget)
+        members = self._members
+        inner_state, state = inner.netlist.state, self.netlist.state
+
+        # After a rebuild every gate may be stale, not only the ones the inner simulator changed
+        changed = set()
+        for new in (members if rebuilt else inner_changed):
+            value = inner_state[new]
+            for gid in members.get(new, ()):
+                if state[gid] != value:
+                    state[gid] = value
+                    changed.add(gid)
+
+        if self._bits and (rebuilt or inner_changed):
+            words = self.netlist.words
+            for gid, bits in self._bits.items():
+                hi = lo = 0
+                for i, new in enumerate(bits):
+                    value = inner_state[new]
+                    if value == HIGH:
+                        hi |= 1 << i
+                    elif value == LOW:
+                        lo |= 1 << i
+                if words.get(gid) != (hi, lo):
+                    words[gid] = hi, lo
+                    changed.add(gid)
+
+        self.oscillating = [gid for new in inner.oscillating for gid in members.get(new, ())]
+        return changed
@@ -0,0 +1,96 @@
+"""Instrumentation for the simulation engines and the editor.
+
+A SimulationProfiler is attached by setting ``simulator.profiler``; when it is
+None the engines take their uninstrumented path, so profiling costs nothing
+while disabled.
+"""
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from engine.netlist import Netlist, TYPE_NAMES
+
+
+class TickStats(NamedTuple):
+    evaluated: int    # gate evaluations
+    changed: int      # gates whose state changed
+    iterations: int   # worklist blocks settled
+    loop_sweeps: int  # extra sweeps spent inside feedback loops
+    wall_time: float  # seconds
+
+
+class SimulationProfiler:
+    def __init__(self, track_hot_gates: bool = False, history: int = 100):
+        self.track_hot_gates = track_hot_gates
+        self.history = history
+        self.callbacks = []  # called with every TickStats
+        self.reset()
+
+    def reset(self):
+        self.ticks = 0
+        self.recent = []
+        self.totals = Counter()
+        self.type_histogram = Counter()      # gate type name -> evaluations
+        self.hot = Counter()                 # gate id -> evaluations, if tracked
+        self.sections = defaultdict(float)   # section name -> seconds
+
+    def counting(self, netlist: Netlist):
+        """Wrap netlist.evaluate so every call lands in the histograms."""
+        evaluate = netlist.evaluate
+        types = netlist.types
+        by_type = Counter()
+        hot = self.hot if self.track_hot_gates else None
+
+        def counted(gid):
+            by_type[types[gid]] += 1
+            if hot is not None:
+                hot[gid] += 1
+            return evaluate(gid)
+
+        counted.by_type = by_type
+        return counted
+
+    def record_tick(self, stats: TickStats, counted=None):
+        self.ticks += 1
+        self.totals.update(stats._asdict())
+        self.recent.append(stats)
+        if len(self.recent) > self.history:
+            del self.recent[0]
+
+        if counted is not None:
+            for code, count in counted.by_type.items():
+                self.type_histogram[TYPE_NAMES[code]] += count
+
+        for callback in self.callbacks:
+            callback(stats)
+
+    @contextmanager
+    def section(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] += time.perf_counter() - start
+
+    @property
+    def last(self) -> TickStats:
+        return self.recent[-1] if self.recent else TickStats(0, 0, 0, 0, 0.0)
+
+    def hot_gates(self, n: int = 10) -> list:
+        return self.hot.most_common(n)
+
+    def export(self) -> dict:
+        return {
+            "ticks": self.ticks,
+            "totals": dict(self.totals),
+            "recent": [stats._asdict() for stats in self.recent],
+            "type_histogram": dict(self.type_histogram),
+            "hot_gates": self.hot_gates() if self.track_hot_gates else [],
+            "sections": dict(self.sections),
+        }
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.export(), f, indent=4)
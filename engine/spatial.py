@@ -0,0 +1,95 @@
+"""Uniform grid spatial index.
+
+Keys are stored in every grid cell their geometry touches: one cell for a
+point, the cells along the line for a segment. Queries only visit the cells
+overlapping the query rectangle, so their cost follows what is in that region
+rather than the size of the whole design.
+"""
+import math
+from collections import defaultdict
+
+
+class GridIndex:
+    def __init__(self, cell_size: float = 256.0):
+        self.cell_size = cell_size
+        self._cells = defaultdict(set)
+        self._where = {}   # key -> cells it was stored in
+        self._points = {}  # key -> (x, y) for point entries
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def clear(self):
+        self._cells.clear()
+        self._where.clear()
+        self._points.clear()
+
+    def _cell(self, x: float, y: float):
+        size = self.cell_size
+        return int(x // size), int(y // size)
+
+    def insert_point(self, key, x: float, y: float):
+        self.remove(key)
+        cell = self._cell(x, y)
+        self._cells[cell].add(key)
+        self._where[key] = (cell,)
+        self._points[key] = (x, y)
+
+    def insert_segment(self, key, x1: float, y1: float, x2: float, y2: float):
+        self.remove(key)
+
+        # Sample the line at quarter-cell steps; queries add their own margin
+        steps = int(max(abs(x2 - x1), abs(y2 - y1)) / (self.cell_size / 4)) + 1
+        cells = {self._cell(x1 + (x2 - x1) * i / steps, y1 + (y2 - y1) * i / steps) for i in range(steps + 1)}
+        for cell in cells:
+            self._cells[cell].add(key)
+        self._where[key] = tuple(cells)
+
+    def remove(self, key):
+        self._points.pop(key, None)
+        for cell in self._where.pop(key, ()):
+            keys = self._cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self._cells[cell]
+
+    def point(self, key):
+        return self._points.get(key)
+
+    def query(self, x0: float, y0: float, x1: float, y1: float) -> set:
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        found = set()
+
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # Zoomed out past the populated area: walking the occupied cells is cheaper
+            for (cx, cy), keys in self._cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    found |= keys
+            return found
+
+        cells = self._cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                keys = cells.get((cx, cy))
+                if keys:
+                    found |= keys
+        return found
+
+    def nearest(self, x: float, y: float, radius: float, distance=None):
+        """Closest key within radius, by point distance or a distance(key, x, y) callable; None if there is none."""
+        best, best_distance = None, radius
+        for key in self.query(x - radius, y - radius, x + radius, y + radius):
+            if distance is not None:
+                d = distance(key, x, y)
+            elif key in self._points:
+                px, py = self._points[key]
+                d = math.hypot(px - x, py - y)
+            else:
+                continue
+            if d <= best_distance:
+                best, best_distance = key, d
+        return best
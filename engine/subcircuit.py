@@ -0,0 +1,234 @@
+"""Subcircuits: saved circuits reused as a single part.
+
+A definition is a circuit whose TrueGate/FalseGate sources are its input
+pins and whose LEDGates are its output pins, both in gate id order, as in
+engine.truth_table. Each pin gets its own gate type, so an instance is just a
+run of consecutive pin gates, inputs first: input pins buffer the wire
+driving them and output pins compute their value from the definition.
+
+The definition is compiled once into a flat, levelized netlist and every
+instance shares it, together with a table of results per input combination.
+Inside the netlist an instance only holds its pins plus one wire from every
+input pin to each output pin it can affect, which tells the schedulers what
+an output depends on. Engines that work on whole words rather than single
+gates use flatten() instead.
+"""
+import math
+from array import array
+
+from engine.levelize import compiled
+from engine.netlist import Netlist, FALSE, TRUE, LED, REMOVED, TYPE_CODES, TYPE_LIKE, UNKNOWN, find_type, register_type
+
+# Plain buffer, used for output pins once an instance is flattened
+BUFFER = register_type('Buffer', 1, math.inf, like=LED)
+
+DEFINITIONS = {}  # name -> Subcircuit
+PINS = {}         # pin type code -> (Subcircuit or engine.bus.BusPart, pin index)
+
+# Callables receiving every new Subcircuit, e.g. to give it an item class and a toolbar entry
+DEFINITION_OBSERVERS = []
+
+
+class Subcircuit:
+    __slots__ = ('name', 'data', 'netlist', 'inputs', 'outputs', 'pin_codes', 'depends', 'order', 'results')
+
+    def __init__(self, name: str, data: dict):
+        self.name = name
+        self.data = data
+
+        # Nested subcircuits are expanded here once, so evaluation never recurses
+        self.netlist = flatten(Netlist.deserialize(data))
+        types = self.netlist.types
+        self.inputs = [gid for gid in self.netlist.gate_ids() if types[gid] in (TRUE, FALSE)]
+        self.outputs = [gid for gid in self.netlist.gate_ids() if types[gid] == LED]
+        if not self.inputs and not self.outputs:
+            raise RuntimeError(f'Subcircuit {name} has no TrueGate/FalseGate inputs or LEDGate outputs')
+
+        lev = compiled(self.netlist)
+        if not lev.is_acyclic:
+            raise RuntimeError(f'Subcircuit {name} contains a feedback loop')
+        inputs = set(self.inputs)
+        self.order = [gid for gid in lev.gate_order() if gid not in inputs]
+
+        # Input pins that can reach each output pin
+        reach = {gid: {i} for i, gid in enumerate(self.inputs)}
+        for gid in self.order:
+            reach[gid] = set().union(*(reach.get(src, ()) for src in self.netlist.fanin(gid)))
+        self.depends = [sorted(reach[gid]) for gid in self.outputs]
+
+        self.pin_codes = []
+        for i in range(len(self.inputs)):
+            self.pin_codes.append(register_type(f'{name}.in{i}', 1, math.inf, like=LED))
+        for j in range(len(self.outputs)):
+            self.pin_codes.append(register_type(f'{name}.out{j}', math.inf, math.inf, evaluate=self._evaluate_output))
+        for index, code in enumerate(self.pin_codes):
+            PINS[code] = (self, index)
+
+        # Input states (as bytes) -> output states, shared by every instance
+        self.results = {}
+
+    @property
+    def n_inputs(self) -> int:
+        return len(self.inputs)
+
+    @property
+    def n_outputs(self) -> int:
+        return len(self.outputs)
+
+    @property
+    def n_pins(self) -> int:
+        return len(self.pin_codes)
+
+    def evaluate(self, inputs: bytes) -> bytes:
+        """Output pin states for the given input pin states."""
+        outputs = self.results.get(inputs)
+        if outputs is not None:
+            return outputs
+
+        netlist = self.netlist
+        state = netlist.state
+        for gid, value in zip(self.inputs, inputs):
+            state[gid] = value
+        for gid in self.order:
+            state[gid] = netlist.evaluate(gid)
+
+        outputs = bytes(state[gid] for gid in self.outputs)
+        if len(self.results) >= 1 << 16:
+            self.results.clear()
+        self.results[inputs] = outputs
+        return outputs
+
+    def _evaluate_output(self, netlist: Netlist, gid: int) -> int:
+        index = PINS[netlist.types[gid]][1]
+        base = gid - index
+        return self.evaluate(bytes(netlist.state[base:base + self.n_inputs]))[index - self.n_inputs]
+
+
+def define(name: str, circuit) -> Subcircuit:
+    """Register a circuit (a Netlist or serialized data) as a subcircuit."""
+    data = circuit.serialize() if isinstance(circuit, Netlist) else circuit
+
+    definition = DEFINITIONS.get(name)
+    if definition is not None:
+        if definition.data != data:
+            raise RuntimeError(f'A different subcircuit named {name} is already defined')
+        return definition
+    if name in TYPE_CODES or '.' in name or find_type(name) is not None:
+        raise RuntimeError(f'Invalid subcircuit name: {name}')
+
+    definition = DEFINITIONS[name] = Subcircuit(name, data)
+    for observer in DEFINITION_OBSERVERS:
+        observer(definition)
+    return definition
+
+
+def define_all(definitions: dict):
+    for name, data in definitions.items():
+        define(name, data)
+
+
+def used_definitions(netlist: Netlist) -> dict:
+    used = {}
+    for code in set(netlist.types):
+        pin = PINS.get(code)
+        if pin is not None and isinstance(pin[0], Subcircuit):
+            used[pin[0].name] = pin[0].data
+    return used
+
+
+def instantiate(netlist: Netlist, definition: Subcircuit, x: float = 0.0, y: float = 0.0) -> int:
+    """Add an instance, returning the id of its first pin."""
+    base = netlist.n_gates
+    for code in definition.pin_codes:
+        netlist.add_gate(code, x, y)
+
+    n = definition.n_inputs
+    for j, depends in enumerate(definition.depends):
+        for i in depends:
+            netlist.add_wire(base + i, base + n + j)
+    return base
+
+
+def pin(netlist: Netlist, gid: int):
+    """(definition, pin index) if the gate is a subcircuit pin, else None."""
+    return PINS.get(netlist.types[gid])
+
+
+def owner(netlist: Netlist, gid: int) -> int:
+    """Id of the first pin of the instance a pin belongs to; other gates are their own owner."""
+    info = PINS.get(netlist.types[gid])
+    return gid if info is None else gid - info[1]
+
+
+def is_internal_wire(netlist: Netlist, src: int, dst: int) -> bool:
+    """Whether a wire is one of the dependency wires inside an instance."""
+    src_pin = PINS.get(netlist.types[src])
+    dst_pin = PINS.get(netlist.types[dst])
+    return (src_pin is not None and dst_pin is not None and src_pin[0] is dst_pin[0]
+            and src_pin[1] < src_pin[0].n_inputs <= dst_pin[1] and src - src_pin[1] == dst - dst_pin[1])
+
+
+def has_instances(netlist: Netlist) -> bool:
+    """Whether flatten() has work to do: instances, buses or other gates without a built-in type to follow."""
+    return netlist.cached('has_instances', lambda n: any(_expanded(code) for code in set(n.types)))
+
+
+def _expanded(code: int) -> bool:
+    return code in PINS or (code != REMOVED and TYPE_LIKE[code] is None)
+
+
+def flatten(netlist: Netlist, bits: dict = None) -> Netlist:
+    """Copy with every instance expanded into its gates and every bus into single bits.
+
+    Existing gate ids keep their meaning: input pins stay buffers, output pins
+    become buffers driven by the expanded logic, and the gates of each
+    definition are appended after them. Buses are left to engine.bus.blast(),
+    whose bit gates per bus gate are added to ``bits`` if given.
+    """
+    flat = netlist.copy()
+    if not any(_expanded(code) for code in set(flat.types)):
+        return flat
+
+    # Drop the dependency wires; the expanded logic replaces them
+    keep = [i for i, (s, d) in enumerate(zip(netlist.wire_src, netlist.wire_dst))
+            if not is_internal_wire(netlist, s, d)]
+    flat.wire_src[:] = array('l', (netlist.wire_src[i] for i in keep))
+    flat.wire_dst[:] = array('l', (netlist.wire_dst[i] for i in keep))
+
+    for gid in range(netlist.n_gates):
+        info = PINS.get(netlist.types[gid])
+        if info is None or info[1] != 0 or not isinstance(info[0], Subcircuit):
+            continue
+
+        definition = info[0]
+        template = definition.netlist
+        n = definition.n_inputs
+        x, y = netlist.xs[gid], netlist.ys[gid]
+
+        # Template inputs map onto the input pins, template outputs onto the output pins
+        remap = {src: gid + i for i, src in enumerate(definition.inputs)}
+        outputs = {led: gid + n + j for j, led in enumerate(definition.outputs)}
+        for j in range(definition.n_outputs):
+            flat.types[gid + n + j] = BUFFER
+
+        for t_gid in template.gate_ids():
+            if t_gid not in remap and t_gid not in outputs:
+                remap[t_gid] = len(flat.types)
+                flat.types.append(template.types[t_gid])
+                flat.xs.append(x)
+                flat.ys.append(y)
+                flat.state.append(UNKNOWN)
+
+        inputs = set(definition.inputs)
+        for src, dst in zip(template.wire_src, template.wire_dst):
+            if src in outputs or dst in inputs:
+                continue  # LEDs drive nothing and sources read nothing
+            flat.wire_src.append(remap[src])
+            flat.wire_dst.append(outputs[dst] if dst in outputs else remap[dst])
+
+    from engine.bus import blast
+    blasted = blast(flat)
+    if bits is not None:
+        bits.update(blasted)
+    flat.version += 1
+    return flat
@@ -0,0 +1,413 @@
+"""Timed simulation with per-gate-type propagation delays.
+
+Unlike EventSimulator, which settles everything in zero time, every output
+change here takes the rise or fall delay of its gate type, so glitches and
+races between paths of different length play out as they would in hardware.
+Delays are integer time units. Gates have inertial delay: a pending output
+change is dropped if the inputs change back before it happens, so pulses
+shorter than a gate's delay do not get through it. A bus gate's word travels
+with its pending change and is only applied with it.
+
+Pending changes live on a timing wheel, one bucket per time unit, sized past
+the longest delay so scheduling and popping never search. Driven inputs can
+be scheduled any time ahead and wait on a heap until they come up.
+
+Each change remembers the change that caused it, which gives the critical
+path of the last settle. static_timing() computes worst-case arrival times
+from the topology alone.
+"""
+import time
+from array import array
+from heapq import heappop, heappush
+
+from engine.levelize import compiled
+from engine.netlist import (Netlist, FALSE, TRUE, LED, AND, OR, NOT, LOW, HIGH, UNKNOWN, TYPE_CODES,
+                            TYPE_LIKE, TYPE_NAMES)
+from engine.profiler import TickStats
+
+# (rise, fall) per gate type; sources and LEDs switch instantly
+DEFAULT_DELAYS = {
+    'FalseGate': (0, 0),
+    'TrueGate': (0, 0),
+    'LEDGate': (0, 0),
+    'AndGate': (2, 2),
+    'OrGate': (2, 2),
+    'NotGate': (1, 1),
+}
+
+# Registered types without a built-in type to borrow the delay from
+CUSTOM_DELAY = (1, 1)
+
+
+def delay_table(delays: dict = None):
+    """(rise, fall) arrays indexed by type code, from a dict keyed by type name or code."""
+    table = {TYPE_CODES[name]: value for name, value in DEFAULT_DELAYS.items()}
+    for key, value in (delays or {}).items():
+        table[TYPE_CODES[key] if isinstance(key, str) else key] = value
+
+    rise, fall = array('l', [0]) * 256, array('l', [0]) * 256
+    for code in range(len(TYPE_NAMES)):
+        like = TYPE_LIKE[code]
+        r, f = table.get(code, table[like] if like is not None else CUSTOM_DELAY)
+        if r < 0 or f < 0 or r != int(r) or f != int(f):
+            raise ValueError(f'Delays of {TYPE_NAMES[code]} must be whole, non-negative time units')
+        rise[code], fall[code] = r, f
+    return rise, fall
+
+
+class TimedSimulator:
+    def __init__(self, netlist: Netlist, delays: dict = None, max_deltas: int = 1000):
+        self.netlist = netlist
+        self.max_deltas = max_deltas
+        self.set_delays(delays)
+
+        # Simulated time, and how far step() may advance it per call (None: until settled)
+        self.now = 0
+        self.time_slice = None
+
+        # Results of the last settle
+        self.settle_start = 0
+        self.settle_time = 0
+        self.last_changed = -1
+
+        self.oscillating = []
+        self.events = 0
+        self.evaluations = 0
+
+        # Optional SimulationProfiler
+        self.profiler = None
+
+        self._wheel = []
+        self._queued = 0       # wheel entries, including cancelled ones
+        self._stimuli = []     # (time, sequence, gate id, value) heap
+        self._sequence = 0
+        self._interrupted = False
+        self._initialized = []
+        self._version = -1
+
+    def set_delays(self, delays: dict = None):
+        self.delays = dict(delays or {})
+        self.rise, self.fall = delay_table(self.delays)
+        # Indexed by the new value, then type code; unknown takes the slower of the two
+        self._delay = (self.fall, self.rise, array('l', map(max, self.rise, self.fall)))
+        self._version = -1
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._queued or self._stimuli or self._version != self.netlist.version)
+
+    @property
+    def settling(self) -> bool:
+        return self._interrupted
+
+    def schedule_all(self):
+        self._version = -1
+
+    def _reset(self):
+        netlist = self.netlist
+        n = netlist.n_gates
+        self._version = netlist.version
+
+        # Every change can be stored at now + delay without wrapping onto a pending one
+        longest = max(max(self.rise), max(self.fall))
+        self._mask = (1 << max(6, longest.bit_length() + 1)) - 1
+        self._wheel = [[] for _ in range(self._mask + 1)]
+        self._queued = 0
+
+        self._pending_time = array('q', [-1]) * n
+        self._pending_value = bytearray(n)
+        self._pending_words = {}                  # bus gate -> word that comes with its pending change
+        self._cause = array('l', [-1]) * n        # gate whose change scheduled the pending one
+        self._changed_at = array('q', [-1]) * n
+        self._changed_by = array('l', [-1]) * n   # cause of the last change
+        self._trigger = array('l', [-1]) * n      # input change that led to the current evaluation
+        self._mark = bytearray(n)
+
+        # Gates without a value yet (a new circuit or gate) get one in zero time, in levelized order;
+        # timing them would mean waves of unknown-to-known changes that no circuit shows after power-up
+        state, words, word_changes = netlist.state, netlist.words, netlist.word_changes
+        self._initialized = []
+        for gid in compiled(netlist).gate_order():
+            if state[gid] == UNKNOWN and gid not in words:
+                value = netlist.evaluate(gid)
+                word = word_changes.pop(gid, None)
+                if value != UNKNOWN or word is not None:
+                    state[gid] = value
+                    if word is not None:
+                        words[gid] = word
+                    self._initialized.append(gid)
+
+        # Re-evaluate everything against the current state
+        self.settle_start = self.now
+        self.last_changed = -1
+        for gid in netlist.gate_ids():
+            self._schedule(gid, netlist.evaluate(gid), -1)
+
+    def _schedule(self, gid: int, value: int, cause: int):
+        # value comes from the evaluate() just before, which left any new word of a bus gate in word_changes
+        state = self.netlist.state
+        pending_time, pending_words = self._pending_time, self._pending_words
+        word = self.netlist.word_changes.pop(gid, None)
+
+        if pending_time[gid] >= 0:
+            if self._pending_value[gid] == value and pending_words.get(gid) == word:
+                return
+            pending_time[gid] = -1  # inputs changed back in time: the pulse is swallowed
+            pending_words.pop(gid, None)
+        if state[gid] == value and word is None:
+            return
+
+        at = self.now + self._delay[value][self.netlist.types[gid]]
+        pending_time[gid] = at
+        self._pending_value[gid] = value
+        if word is not None:
+            pending_words[gid] = word
+        self._cause[gid] = cause
+        self._wheel[at & self._mask].append(gid)
+        self._queued += 1
+
+    def drive(self, gid: int, value, at: int = None):
+        """Force a source gate to a value at a given time (now by default), until the circuit is edited."""
+        if self._version != self.netlist.version:
+            self._reset()
+        if at is None:
+            at = self.now
+        if at < self.now:
+            raise ValueError(f'Cannot drive gate {gid} in the past ({at} < {self.now})')
+        if self.netlist.types[gid] not in (FALSE, TRUE):
+            raise ValueError(f'Gate {gid} is not a source')
+
+        if not self._queued and not self._stimuli:
+            self.settle_start = at
+            self.last_changed = -1
+        value = value if isinstance(value, int) and not isinstance(value, bool) else (LOW, HIGH)[bool(value)]
+        heappush(self._stimuli, (at, self._sequence, gid, value))
+        self._sequence += 1
+
+    def step(self, budget: float = None, until: int = None) -> set:
+        """Advance simulated time, returning the ids of gates that changed state.
+
+        Stops once the circuit settles, at time ``until`` (default: now plus
+        time_slice), or when the wall-clock budget in seconds runs out.
+        """
+        if until is None and self.time_slice is not None:
+            until = self.now + self.time_slice
+
+        profiler = self.profiler
+        if profiler is None:
+            return self._step(self.netlist.evaluate, True, budget, until)
+
+        start = time.perf_counter()
+        counted = profiler.counting(self.netlist)
+        changed = self._step(counted, False, budget, until)
+        profiler.record_tick(TickStats(self.evaluations, len(changed), self.events, 0,
+                                       time.perf_counter() - start), counted)
+        return changed
+
+    def run(self, until: int = None) -> bool:
+        """Simulate without a wall-clock budget; True if the circuit settled."""
+        self.step(until=until)
+        return not self._queued and not self._stimuli
+
+    def _step(self, evaluate, inline, budget, until) -> set:
+        netlist = self.netlist
+        if self._version != netlist.version:
+            self._reset()
+
+        self.oscillating = []
+        self._interrupted = False
+        changed = set(self._initialized)
+        self._initialized = []
+
+        types, state = netlist.types, netlist.state
+        words, word_changes = netlist.words, netlist.word_changes
+        csr = netlist.csr
+        fanin_ptr, fanin_idx = csr.fanin_ptr, csr.fanin_idx
+        fanout_ptr, fanout_idx = csr.fanout_ptr, csr.fanout_idx
+        delay = self._delay
+        wheel, mask = self._wheel, self._mask
+        pending_time, pending_value, pending_words = self._pending_time, self._pending_value, self._pending_words
+        cause, trigger, mark = self._cause, self._trigger, self._mark
+        changed_at, changed_by = self._changed_at, self._changed_by
+        stimuli = self._stimuli
+
+        # Hot counters stay local until the end
+        queued = self._queued
+        last_changed = self.last_changed
+        events = evaluations = 0
+
+        deadline = time.perf_counter() + budget if budget is not None else None
+        now = self.now
+        steps = 0
+
+        while queued or stimuli:
+            if not queued and stimuli[0][0] > now:
+                now = stimuli[0][0]  # nothing in flight: skip ahead to the next driven input
+            if until is not None and now > until:
+                self._interrupted = True
+                break
+            if deadline is not None and not steps & 63 and time.perf_counter() > deadline:
+                self._interrupted = True
+                break
+            steps += 1
+
+            slot = now & mask
+            while stimuli and stimuli[0][0] == now:
+                _, _, gid, value = heappop(stimuli)
+                pending_time[gid] = now
+                pending_value[gid] = value
+                cause[gid] = -1
+                wheel[slot].append(gid)
+                queued += 1
+
+            # Zero-delay changes land in the bucket being processed, so keep going until it stays empty
+            deltas = 0
+            while wheel[slot]:
+                bucket = wheel[slot]
+                wheel[slot] = []
+                queued -= len(bucket)
+
+                deltas += 1
+                if deltas > self.max_deltas:
+                    # A zero-delay loop: push it one time unit on so time keeps moving
+                    self.oscillating.extend(bucket)
+                    for gid in bucket:
+                        if pending_time[gid] == now:
+                            pending_time[gid] = now + 1
+                    wheel[(now + 1) & mask].extend(bucket)
+                    queued += len(bucket)
+                    break
+
+                touched = []
+                for gid in bucket:
+                    if pending_time[gid] != now:
+                        continue  # cancelled or rescheduled
+                    pending_time[gid] = -1
+                    value = pending_value[gid]
+                    word = pending_words.pop(gid, None) if pending_words else None
+                    if state[gid] == value and word is None:
+                        continue
+                    if word is not None:
+                        words[gid] = word
+
+                    state[gid] = value
+                    changed.add(gid)
+                    changed_at[gid] = now
+                    changed_by[gid] = cause[gid]
+                    last_changed = gid
+                    events += 1
+
+                    for dst in fanout_idx[fanout_ptr[gid]:fanout_ptr[gid + 1]]:
+                        if not mark[dst]:
+                            mark[dst] = 1
+                            trigger[dst] = gid
+                            touched.append(dst)
+
+                evaluations += len(touched)
+                for dst in touched:
+                    mark[dst] = 0
+
+                    # Built-in types inline unless profiling, the rest through the netlist
+                    t = types[dst]
+                    start = fanin_ptr[dst]
+                    end = fanin_ptr[dst + 1]
+                    if not inline or t > NOT or start == end:
+                        value = evaluate(dst)
+                    elif t == NOT:
+                        value = LOW if state[fanin_idx[start]] == HIGH else HIGH
+                    elif t == AND or t == OR:
+                        decisive = LOW if t == AND else HIGH
+                        value = HIGH - decisive
+                        for s in fanin_idx[start:end]:
+                            s = state[s]
+                            if s == UNKNOWN:
+                                value = UNKNOWN
+                                break
+                            if s == decisive:
+                                value = decisive
+                    elif t == LED:
+                        value = state[fanin_idx[start]]
+                    else:
+                        value = evaluate(dst)
+
+                    # Inline version of _schedule
+                    word = word_changes.pop(dst, None) if word_changes else None
+                    if pending_time[dst] >= 0:
+                        if pending_value[dst] == value and pending_words.get(dst) == word:
+                            continue
+                        pending_time[dst] = -1
+                        pending_words.pop(dst, None)
+                    if state[dst] == value and word is None:
+                        continue
+
+                    at = now + delay[value][t]
+                    pending_time[dst] = at
+                    pending_value[dst] = value
+                    if word is not None:
+                        pending_words[dst] = word
+                    cause[dst] = trigger[dst]
+                    wheel[at & mask].append(dst)
+                    queued += 1
+
+            if queued or stimuli:
+                now += 1
+
+        self.now = now
+        self._queued = queued
+        self.last_changed = last_changed
+        self.events = events
+        self.evaluations = evaluations
+        self.settle_time = changed_at[last_changed] - self.settle_start if last_changed >= 0 else 0
+        return changed
+
+    def critical_path(self) -> list:
+        """(gate id, time) for the chain of changes leading to the last one, earliest first."""
+        path = []
+        gid = self.last_changed
+        seen = set()
+        if gid >= 0 and self._version != self.netlist.version:
+            return path
+
+        while gid >= 0 and gid not in seen and self._changed_at[gid] >= self.settle_start:
+            seen.add(gid)
+            path.append((gid, self._changed_at[gid]))
+            gid = self._changed_by[gid]
+        path.reverse()
+        return path
+
+
+def static_timing(netlist: Netlist, delays: dict = None):
+    """Worst-case settle time and critical path (gate ids) over all input changes.
+
+    Arrival times are taken along the levelized order, assuming the slower of
+    rise and fall at every gate. Wires inside feedback loops are not
+    followed, since a loop has no fixed arrival time.
+    """
+    rise, fall = delay_table(delays)
+    lev = compiled(netlist)
+    block_of = lev.block_of
+    types = netlist.types
+
+    arrival = array('q', [0]) * netlist.n_gates
+    through = array('l', [-1]) * netlist.n_gates
+    worst, worst_gid = 0, -1
+
+    for rank, block in enumerate(lev.blocks):
+        for gid in block:
+            latest = 0
+            for src in netlist.fanin(gid):
+                if block_of[src] != rank and (through[gid] < 0 or arrival[src] > latest):
+                    latest = arrival[src]
+                    through[gid] = src
+            t = types[gid]
+            arrival[gid] = latest + max(rise[t], fall[t])
+            if arrival[gid] > worst or worst_gid < 0:
+                worst, worst_gid = arrival[gid], gid
+
+    path = []
+    gid = worst_gid
+    while gid >= 0:
+        path.append(gid)
+        gid = through[gid]
+    path.reverse()
+    return worst, path
@@ -0,0 +1,160 @@
+"""Exhaustive truth tables and equivalence checks.
+
+TrueGate/FalseGate sources are the primary inputs and LEDGates the outputs,
+both in gate id order. All 2^n input combinations are evaluated in blocks of
+2^block_bits lanes with the BitSimulator, and results are streamed block by
+block so the table is never held in memory.
+
+    python -m engine.truth_table circuit.json -o table.csv
+    python -m engine.truth_table circuit.json --equiv other.json
+"""
+import argparse
+import sys
+from typing import NamedTuple
+
+from engine.bitsim import BitSimulator
+from engine.netlist import Netlist, FALSE, TRUE, LED
+
+
+class Counterexample(NamedTuple):
+    index: int           # input combination, bit i is input i
+    inputs: list
+    outputs_a: list
+    outputs_b: list
+
+
+def primary_inputs(netlist: Netlist) -> list:
+    return [gid for gid in netlist.gate_ids() if netlist.types[gid] in (TRUE, FALSE)]
+
+
+def primary_outputs(netlist: Netlist) -> list:
+    return [gid for gid in netlist.gate_ids() if netlist.types[gid] == LED]
+
+
+def _as_netlist(circuit) -> Netlist:
+    return circuit if isinstance(circuit, Netlist) else Netlist.load(circuit)
+
+
+def _lane_patterns(n_inputs: int, block_bits: int) -> list:
+    # Word for input i when lane l holds combination l: runs of 2^i zeros then 2^i ones
+    width = 1 << block_bits
+    patterns = []
+    for i in range(min(n_inputs, block_bits)):
+        run = 1 << i
+        word = ((1 << run) - 1) << run
+        period = run * 2
+        while period < width:
+            word |= word << period
+            period *= 2
+        patterns.append(word)
+    return patterns
+
+
+def blocks(netlist: Netlist, block_bits: int = 16):
+    """Yield (base, width, [(hi, lo) per output]) for every block of input combinations."""
+    inputs = primary_inputs(netlist)
+    outputs = primary_outputs(netlist)
+    n = len(inputs)
+
+    block_bits = min(block_bits, n)
+    width = 1 << block_bits
+    mask = (1 << width) - 1
+    patterns = _lane_patterns(n, block_bits)
+    simulator = BitSimulator(netlist, optimized=True, codegen=n > block_bits)
+
+    for block in range(1 << (n - block_bits)):
+        stimuli = dict(zip(inputs, patterns))
+        for i in range(block_bits, n):
+            stimuli[inputs[i]] = mask if block >> (i - block_bits) & 1 else 0
+
+        state = simulator.run(stimuli, width)
+        yield block << block_bits, width, [(state.hi[gid], state.lo[gid]) for gid in outputs]
+
+
+def _lane_chars(hi: int, lo: int, width: int) -> str:
+    # One '1'/'0'/'X' per lane, lane 0 first
+    hi_bits = format(hi, f'0{width}b')[::-1]
+    lo_bits = format(lo, f'0{width}b')[::-1]
+    return ''.join('1' if h == '1' else '0' if l == '1' else 'X' for h, l in zip(hi_bits, lo_bits))
+
+
+def write_truth_table(circuit, out, block_bits: int = 16):
+    """Stream the truth table as CSV rows: one column per input, then one per output."""
+    netlist = _as_netlist(circuit)
+    n_inputs = len(primary_inputs(netlist))
+    n_outputs = len(primary_outputs(netlist))
+
+    header = [f'in{i}' for i in range(n_inputs)] + [f'out{i}' for i in range(n_outputs)]
+    out.write(','.join(header) + '\n')
+
+    # The low input bits repeat in every block, so their cells are formatted once
+    low_bits = min(block_bits, n_inputs)
+    low_cells = [','.join(str(lane >> i & 1) for i in range(low_bits)) for lane in range(1 << low_bits)]
+
+    for base, width, words in blocks(netlist, block_bits):
+        high_cells = ''.join(f',{base >> i & 1}' for i in range(low_bits, n_inputs))
+        if not low_bits:
+            high_cells = high_cells[1:]
+
+        columns = [_lane_chars(hi, lo, width) for hi, lo in words]
+        outputs = [','.join(cells) for cells in zip(*columns)] if columns else [''] * width
+        sep = ',' if n_inputs and n_outputs else ''
+        out.write(''.join(f'{low}{high_cells}{sep}{cells}\n' for low, cells in zip(low_cells, outputs)))
+
+
+def check_equivalence(circuit_a, circuit_b, block_bits: int = 16):
+    """First input combination on which the two circuits' outputs differ, or None if they are equivalent."""
+    a = _as_netlist(circuit_a)
+    b = _as_netlist(circuit_b)
+
+    n_inputs = len(primary_inputs(a))
+    if n_inputs != len(primary_inputs(b)):
+        raise ValueError(f'Input count differs: {n_inputs} vs {len(primary_inputs(b))}')
+    if len(primary_outputs(a)) != len(primary_outputs(b)):
+        raise ValueError(f'Output count differs: {len(primary_outputs(a))} vs {len(primary_outputs(b))}')
+
+    for (base, width, words_a), (_, _, words_b) in zip(blocks(a, block_bits), blocks(b, block_bits)):
+        diff = 0
+        for (hi_a, lo_a), (hi_b, lo_b) in zip(words_a, words_b):
+            diff |= (hi_a ^ hi_b) | (lo_a ^ lo_b)
+        if not diff:
+            continue
+
+        lane = (diff & -diff).bit_length() - 1
+        index = base + lane
+
+        def values(words):
+            return [True if hi >> lane & 1 else False if lo >> lane & 1 else None for hi, lo in words]
+
+        return Counterexample(index, [bool(index >> i & 1) for i in range(n_inputs)], values(words_a),
+                              values(words_b))
+
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Truth table and equivalence checking for circuit files')
+    parser.add_argument('circuit')
+    parser.add_argument('-o', '--output', help='CSV file for the truth table (default: stdout)')
+    parser.add_argument('--equiv', metavar='OTHER', help='check equivalence against another circuit instead')
+    parser.add_argument('--block-bits', type=int, default=16, help='log2 of the input combinations per block')
+    args = parser.parse_args(argv)
+
+    if args.equiv:
+        counterexample = check_equivalence(args.circuit, args.equiv, args.block_bits)
+        if counterexample is None:
+            print('Equivalent')
+            return 0
+        print(f'Not equivalent: {counterexample}')
+        return 1
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            write_truth_table(args.circuit, f, args.block_bits)
+    else:
+        write_truth_table(args.circuit, sys.stdout, args.block_bits)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
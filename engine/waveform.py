@@ -0,0 +1,176 @@
+"""Waveform capture and VCD export.
+
+Recording keeps only state changes. WaveformRecorder holds them in a fixed
+size ring buffer of parallel arrays, so a long run costs a bounded amount of
+memory: once full, the oldest changes are folded into a baseline of values at
+the start of the window. VCDWriter streams changes straight to a file
+instead, for runs that should be kept whole.
+
+Both take record(gate_ids, time) with the gates that changed on a step; time
+is the simulated time of a TimedSimulator, or a tick count for simulators that
+settle in zero time.
+"""
+from array import array
+
+from engine.netlist import Netlist, TYPE_NAMES
+
+_VCD_VALUES = '01x'
+
+
+def vcd_identifier(index: int) -> str:
+    # Shortest printable identifiers first, as VCD writers usually do
+    chars = []
+    while True:
+        index, digit = divmod(index, 94)
+        chars.append(chr(33 + digit))
+        if not index:
+            return ''.join(chars)
+        index -= 1
+
+
+def signal_name(netlist: Netlist, gid: int) -> str:
+    return f'{TYPE_NAMES[netlist.types[gid]].replace(".", "_")}_{gid}'
+
+
+class _Selection:
+    # Gates are fixed when recording starts; ones added later are not recorded
+    def __init__(self, netlist: Netlist, gates=None):
+        self.gates = list(netlist.gate_ids()) if gates is None else sorted(set(gates))
+        self.mask = bytearray(netlist.n_gates)
+        for gid in self.gates:
+            self.mask[gid] = 1
+
+    def filter(self, gate_ids) -> list:
+        mask = self.mask
+        n = len(mask)
+        return [gid for gid in gate_ids if gid < n and mask[gid]]
+
+
+class WaveformRecorder:
+    def __init__(self, netlist: Netlist, gates=None, capacity: int = 1 << 20, time: int = 0):
+        """Record the given gate ids (every gate if None), keeping at most capacity changes."""
+        self.netlist = netlist
+        self.selection = _Selection(netlist, gates)
+        self.capacity = capacity
+
+        self.times = array('q', [0]) * capacity
+        self.gids = array('l', [0]) * capacity
+        self.values = bytearray(capacity)
+        self.total = 0  # changes recorded so far; change i sits at i % capacity while i >= total - capacity
+
+        # Values at the start of the window, i.e. before the oldest change still held
+        self.start_time = time
+        self.baseline = bytearray(netlist.state)
+        self.time = time
+
+    @property
+    def gates(self) -> list:
+        return self.selection.gates
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    @property
+    def first(self) -> int:
+        """Sequence number of the oldest change still held."""
+        return max(0, self.total - self.capacity)
+
+    def record(self, gate_ids, time: int = None):
+        if time is None:
+            time = self.time + 1
+        elif time < self.time:
+            time = self.time  # never back in time, e.g. after switching simulators
+        self.time = time
+
+        gate_ids = self.selection.filter(gate_ids)
+        if not gate_ids:
+            return
+
+        state = self.netlist.state
+        times, gids, values, baseline = self.times, self.gids, self.values, self.baseline
+        capacity = self.capacity
+
+        # Written in runs up to the end of the buffer, one slice assignment per array
+        while gate_ids:
+            slot = self.total % capacity
+            end = min(capacity, slot + len(gate_ids))
+            run, gate_ids = gate_ids[:end - slot], gate_ids[end - slot:]
+            if self.total >= capacity:
+                # Fold the changes about to be overwritten into the baseline
+                for gid, value in zip(gids[slot:end], values[slot:end]):
+                    baseline[gid] = value
+                self.start_time = times[end - 1]
+
+            times[slot:end] = array('q', [time]) * len(run)
+            gids[slot:end] = array('l', run)
+            values[slot:end] = bytes(map(state.__getitem__, run))
+            self.total += len(run)
+
+    def read(self, since: int = 0):
+        """Changes from sequence number since on, as (next sequence number, [(time, gate id, value)])."""
+        since = max(since, self.first)
+        capacity = self.capacity
+        slots = (i % capacity for i in range(since, self.total))
+        return self.total, [(self.times[s], self.gids[s], self.values[s]) for s in slots]
+
+    def export_vcd(self, path: str, timescale: str = '1 ns'):
+        with open(path, 'w') as f:
+            writer = VCDWriter(f, self.netlist, self.gates, timescale, self.start_time, self.baseline)
+            for time, gid, value in self.read()[1]:
+                writer.change(time, gid, value)
+            writer.close()
+
+
+class VCDWriter:
+    def __init__(self, f, netlist: Netlist, gates=None, timescale: str = '1 ns', time: int = 0, initial=None):
+        """Write the header and the initial values of the given gates (every gate if None) to a text file."""
+        self.f = f
+        self.netlist = netlist
+        self.selection = _Selection(netlist, gates)
+        self.time = time
+        self._written_time = None
+
+        ids = self.ids = {}
+        for index, gid in enumerate(self.selection.gates):
+            ids[gid] = vcd_identifier(index)
+
+        initial = netlist.state if initial is None else initial
+        lines = ['$timescale ' + timescale + ' $end', '$scope module circuit $end']
+        lines += [f'$var wire 1 {ids[gid]} {signal_name(netlist, gid)} $end' for gid in self.selection.gates]
+        lines += ['$upscope $end', '$enddefinitions $end', f'#{time}', '$dumpvars']
+        lines += [_VCD_VALUES[initial[gid]] + ids[gid] for gid in self.selection.gates]
+        lines.append('$end')
+        f.write('\n'.join(lines) + '\n')
+        self._written_time = time
+
+    @property
+    def gates(self) -> list:
+        return self.selection.gates
+
+    def change(self, time: int, gid: int, value: int):
+        if time != self._written_time:
+            self.f.write(f'#{time}\n')
+            self._written_time = time
+        self.f.write(_VCD_VALUES[value] + self.ids[gid] + '\n')
+
+    def record(self, gate_ids, time: int = None):
+        if time is None:
+            time = self.time + 1
+        elif time < self.time:
+            time = self.time  # never back in time, e.g. after switching simulators
+        self.time = time
+
+        gate_ids = self.selection.filter(gate_ids)
+        if not gate_ids:
+            return
+
+        state, ids = self.netlist.state, self.ids
+        lines = [_VCD_VALUES[state[gid]] + ids[gid] for gid in gate_ids]
+        if time != self._written_time:
+            lines.insert(0, f'#{time}')
+            self._written_time = time
+        self.f.write('\n'.join(lines) + '\n')
+
+    def close(self):
+        self.f.flush()
+
@@ -0,0 +1,93 @@
+"""Simulation on a background thread.
+
+The worker owns its own copy of the netlist. Edits reach it as command tuples
+(the ones Netlist passes to its observers) through a queue, and settles run in
+short time slices so commands are picked up promptly and the GIL is handed
+back between slices. State changes are coalesced into a diff that the GUI
+collects with take_diff() and applies in one batch.
+"""
+import queue
+import threading
+
+from engine.event_sim import EventSimulator
+from engine.netlist import Netlist
+
+
+class SimulationWorker(threading.Thread):
+    def __init__(self, netlist: Netlist, slice_budget: float = 0.004, oscillation_interval: float = 0.05,
+                 max_deltas: int = 1000):
+        super().__init__(name='SimulationWorker', daemon=True)
+
+        self.netlist = netlist.copy()
+        self.simulator = EventSimulator(self.netlist, max_deltas)
+        self.slice_budget = slice_budget
+        self.oscillation_interval = oscillation_interval
+
+        self.commands = queue.SimpleQueue()
+        self.oscillating = []
+
+        # Bumped on every 'clear', so diffs computed for a discarded circuit can be told apart
+        self.epoch = 0
+        self._diff = {}
+        self._diff_epoch = 0
+        self._diff_lock = threading.Lock()
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def submit(self, command: tuple):
+        self.commands.put(command)
+        self._wake.set()
+
+    def take_diff(self):
+        """(epoch, {gate id: state}) for every gate that changed since the last call."""
+        with self._diff_lock:
+            diff, self._diff = self._diff, {}
+            return self._diff_epoch, diff
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        self.join()
+
+        # Leave the copy in step with every edit that was submitted
+        self._apply_commands()
+
+    def run(self):
+        simulator = self.simulator
+        state = self.netlist.state
+
+        while not self._stopping.is_set():
+            self._apply_commands()
+
+            if not simulator.busy:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            changed = simulator.step(self.slice_budget)
+            self.oscillating = simulator.oscillating
+
+            if changed:
+                with self._diff_lock:
+                    if self._diff_epoch != self.epoch:
+                        self._diff = {}
+                        self._diff_epoch = self.epoch
+                    for gid in changed:
+                        self._diff[gid] = state[gid]
+
+            if not simulator.settling:
+                # Only oscillating loops left: tick them at a relaxed pace
+                self._wake.wait(self.oscillation_interval)
+                self._wake.clear()
+
+    def _apply_commands(self):
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                return
+
+            if command[0] == 'clear':
+                self.epoch += 1
+            self.netlist.apply(command)
@@ -5,22 +5,43 @@ if TYPE_CHECKING:
 
 from itertools import chain
 
-from PySide6.QtGui import Qt
-from PySide6.QtWidgets import QGraphicsRectItem, QGraphicsEllipseItem
+from PySide6.QtGui import Qt, QPainterPath, QPen, QBrush
+from PySide6.QtWidgets import QGraphicsRectItem, QGraphicsEllipseItem, QGraphicsItem, QGraphicsTextItem
+
+from engine.netlist import TYPE_INPUTS, TYPE_OUTPUTS, to_bool
+
+# Below this zoom level gates are drawn as plain rectangles and labels are hidden
+LOD_THRESHOLD = 0.4
+
+GATE_PEN = QPen(Qt.GlobalColor.black, 2)
+GATE_BRUSH = QBrush(Qt.GlobalColor.lightGray)
+SELECTION_PEN = QPen(Qt.GlobalColor.blue, 1, Qt.PenStyle.DashLine)
 
 
 class GateItem(QGraphicsRectItem):
     registry = {}
+    _paths = {}    # (gate class, rect) -> QPainterPath shared by every gate of that shape
+    _offsets = {}  # (gate class, gate type, width) -> port centres, see cached_pin_offsets
 
     def __init__(self, x: int, y: int, n_inputs: float, n_outputs: float, editor: 'LogicCircuitEditor', w: int = 80,
-                 h: int = 50):
+                 h: int = 50, gate_id: int = None):
         super().__init__(0, 0, w, h)
         self.editor = editor
+        # The netlist owns the logic; this item only mirrors it for display.
+        # Passing gate_id mirrors a gate that is already in the netlist
+        if gate_id is None:
+            gate_id = editor.netlist.add_gate(type(self).__name__, x, y)
+        self.gate_id = gate_id
+        editor.gate_items[self.gate_id] = self
         self.setPos(x, y)
         self.setBrush(Qt.GlobalColor.lightGray)
         self.setFlag(QGraphicsRectItem.GraphicsItemFlag.ItemIsMovable)
+        self.setFlag(QGraphicsRectItem.GraphicsItemFlag.ItemIsSelectable)
         self.setFlag(QGraphicsRectItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
 
+        self.label = None
+        self.selection_box = None
         self.n_inputs = n_inputs
         self.n_outputs = n_outputs
 
@@ -33,12 +54,60 @@ class GateItem(QGraphicsRectItem):
         # Keep track of connected wires
         self.connected_inputs = []
         self.connected_outputs = []
-        self.state = None
+        self.state = editor.netlist.get_state(gate_id)
+        self.update_graphics()
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         GateItem.registry[cls.__name__] = cls
 
+    @classmethod
+    def port_offsets(cls, w: float = 80, h: float = 50):
+        """Input and output port centres relative to the gate position."""
+        return (0, h / 2), (w, h / 2)
+
+    @classmethod
+    def pin_offsets(cls, gate_type: int, w: float = 80):
+        """Port centres of one of the item's gates, for items that stand for several."""
+        return cls.port_offsets(w)
+
+    @classmethod
+    def pin_ports(cls, gate_type: int) -> tuple:
+        """Kinds of port shown for one of the item's gates."""
+        return (("input",) if TYPE_INPUTS[gate_type] > 0 else ()) + (("output",) if TYPE_OUTPUTS[gate_type] > 0 else ())
+
+    @classmethod
+    def cached_pin_offsets(cls, gate_type: int, w: float = 80):
+        key = (cls, gate_type, w)
+        offsets = GateItem._offsets.get(key)
+        if offsets is None:
+            offsets = GateItem._offsets[key] = cls.pin_offsets(gate_type, w)
+        return offsets
+
+    def port_pos(self, gid: int, kind: str):
+        """Scene position of a port centre, without asking the port item for its bounding rect."""
+        (in_x, in_y), (out_x, out_y) = self.cached_pin_offsets(self.editor.netlist.types[gid], self.rect().width())
+        pos = self.pos()
+        if kind == "output":
+            return pos.x() + out_x, pos.y() + out_y
+        return pos.x() + in_x, pos.y() + in_y
+
+    def pin_ids(self) -> range:
+        """Netlist gates this item stands for, starting with gate_id."""
+        return range(self.gate_id, self.gate_id + 1)
+
+    def port_point(self, gid: int, kind: str) -> QGraphicsEllipseItem:
+        return self.output_point if kind == "output" else self.input_point
+
+    def bind(self, gate_id: int):
+        """Point a recycled item at another gate of the same type."""
+        netlist = self.editor.netlist
+        self.gate_id = gate_id
+        self.editor.gate_items[gate_id] = self
+        self.setPos(netlist.xs[gate_id], netlist.ys[gate_id])
+        self.state = netlist.get_state(gate_id)
+        self.update_graphics()
+
     def add_input_point(self, h, w):
         if self.n_inputs <= 0:
             return
@@ -59,22 +128,66 @@ class GateItem(QGraphicsRectItem):
         self.output_point.setData(0, "output")
         self.output_point.parent_gate = self
 
+    def add_label(self, text: str) -> QGraphicsTextItem:
+        label = QGraphicsTextItem(text, parent=self)
+        label.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        label.setVisible(self.editor.show_detail)
+        return label
+
+    def build_path(self, rect) -> QPainterPath:
+        path = QPainterPath()
+        path.addRect(rect)
+        return path
+
+    def cached_path(self) -> QPainterPath:
+        r = self.rect()
+        key = (type(self), r.x(), r.y(), r.width(), r.height())
+        path = GateItem._paths.get(key)
+        if path is None:
+            path = GateItem._paths[key] = self.build_path(r)
+        return path
+
+    def paint_simplified(self, painter, option) -> bool:
+        # Zoomed out far enough that the shape would be a few pixels: draw a plain box
+        if option.levelOfDetailFromTransform(painter.worldTransform()) >= LOD_THRESHOLD:
+            return False
+
+        painter.fillRect(self.rect(), self.brush())
+        return True
+
+    def compute_output(self):
+        return to_bool(self.editor.netlist.evaluate(self.gate_id))
+
     def update_graphics(self):
         return
 
+    def wires(self):
+        return chain(self.connected_inputs, self.connected_outputs)
+
     def itemChange(self, change, value):
-        if change == QGraphicsRectItem.GraphicsItemChange.ItemPositionChange:
-            for wire in chain(self.connected_inputs, self.connected_outputs):
-                wire.update_position()
+        if change == QGraphicsRectItem.GraphicsItemChange.ItemPositionHasChanged:
+            # Wires and the netlist catch up once per frame, however many gates moved
+            self.editor.gate_moved(self)
+        elif change == QGraphicsRectItem.GraphicsItemChange.ItemSelectedHasChanged:
+            if self.selection_box is None:
+                self.selection_box = QGraphicsRectItem(self.rect().adjusted(-4, -4, 4, 4), self)
+                self.selection_box.setPen(SELECTION_PEN)
+                self.selection_box.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+            self.selection_box.setVisible(bool(value))
         return super().itemChange(change, value)
 
     def remove(self):
-        for wire in list(self.connected_inputs + self.connected_outputs):
-            wire.remove()
+        with self.editor.journal.action():
+            for wire in list(self.connected_inputs + self.connected_outputs):
+                wire.remove()
 
-        self.editor.gates.remove(self)
+            self.editor.gates.remove(self)
+            del self.editor.gate_items[self.gate_id]
+            for gid in reversed(self.pin_ids()):
+                self.editor.netlist.remove_gate(gid)
 
         self.scene().removeItem(self)
+        self.editor.wake_simulation()
 
     def mousePressEvent(self, event, /):
         if self.editor.current_tool == "Remove Gate":
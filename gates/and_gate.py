@@ -1,38 +1,33 @@
 import math
 
-from PySide6.QtGui import QPainter, QPen, QBrush, QPainterPath, Qt
-from PySide6.QtWidgets import QGraphicsTextItem
+from PySide6.QtGui import QPainter, QPainterPath
 
-from gate_item import GateItem
+from gate_item import GateItem, GATE_PEN, GATE_BRUSH
 
 
 class AndGate(GateItem):
-    def __init__(self, x, y, editor, w=80, h=50):
-        super().__init__(x, y, math.inf, math.inf, editor, w, h)
+    def __init__(self, x, y, editor, w=80, h=50, gate_id=None):
+        super().__init__(x, y, math.inf, math.inf, editor, w, h, gate_id)
 
-        self.label = QGraphicsTextItem('AND', parent=self)
-        
-    def compute_output(self):
-        inputs = [t.src_gate.state for t in self.connected_inputs]
+        self.label = self.add_label('AND')
 
-        if None in inputs or len(inputs) == 0:  # not enough info yet
-            return None
+    def build_path(self, rect):
+        w = rect.width()
+        h = rect.height()
 
-        return all(inputs)
-
-    def paint(self, painter: QPainter, option, widget=None):
-        painter.setPen(QPen(Qt.GlobalColor.black, 2))
-        painter.setBrush(QBrush(Qt.GlobalColor.lightGray))
-
-        w = self.rect().width()
-        h = self.rect().height()
-
-        # Draw AND gate shape:
+        # AND gate shape:
         path = QPainterPath()
         path.moveTo(0, 0)          # top-left
         path.lineTo(w/2, 0)        # top mid
         path.arcTo(w/2, 0, w/2, h, 90, -180)  # semicircle on the right
         path.lineTo(0, h)          # bottom-left
         path.closeSubpath()
+        return path
+
+    def paint(self, painter: QPainter, option, widget=None):
+        if self.paint_simplified(painter, option):
+            return
 
-        painter.drawPath(path)
+        painter.setPen(GATE_PEN)
+        painter.setBrush(GATE_BRUSH)
+        painter.drawPath(self.cached_path())
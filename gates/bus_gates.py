@@ -0,0 +1,46 @@
+import math
+
+from PySide6.QtGui import QPainter, QPen, Qt
+
+from engine.bus import BUS_OBSERVERS, FAMILIES, PARTS
+from gate_item import GateItem, GATE_BRUSH
+from gates.subcircuit_gate import subcircuit_gate_class
+
+# Buses are drawn thicker than single-bit gates and wires
+BUS_PEN = QPen(Qt.GlobalColor.black, 4)
+
+
+class BusGate(GateItem):
+    """A bitwise gate over a bus, e.g. BusAnd8."""
+
+    text = None  # set on the class generated for each type
+
+    def __init__(self, x, y, editor, w=80, h=50, gate_id=None):
+        super().__init__(x, y, math.inf, math.inf, editor, w, h, gate_id)
+
+        self.label = self.add_label(self.text)
+
+    def paint(self, painter: QPainter, option, widget=None):
+        if self.paint_simplified(painter, option):
+            return
+
+        painter.setPen(BUS_PEN)
+        painter.setBrush(GATE_BRUSH)
+        painter.drawPath(self.cached_path())
+
+
+def bus_gate_class(name: str) -> type:
+    # Splitters and mergers are drawn like subcircuit instances, with a port per pin
+    part = PARTS.get(name)
+    if part is not None:
+        return subcircuit_gate_class(part)
+
+    cls = GateItem.registry.get(name)
+    if cls is None:
+        cls = type(name, (BusGate,), {'text': name.removeprefix('Bus').upper()})
+    return cls
+
+
+for _name in FAMILIES:
+    bus_gate_class(_name)
+BUS_OBSERVERS.append(bus_gate_class)
@@ -1,15 +1,10 @@
 import math
 
-from PySide6.QtWidgets import QGraphicsTextItem
-
 from gate_item import GateItem
 
 
 class FalseGate(GateItem):
-    def __init__(self, x, y, editor, w=80, h=50):
-        super().__init__(x, y, 0, math.inf, editor, w, h)
-
-        self.label = QGraphicsTextItem('FALSE', parent=self)
+    def __init__(self, x, y, editor, w=80, h=50, gate_id=None):
+        super().__init__(x, y, 0, math.inf, editor, w, h, gate_id)
 
-    def compute_output(self):
-        return False
\ No newline at end of file
+        self.label = self.add_label('FALSE')
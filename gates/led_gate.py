@@ -4,8 +4,8 @@ from gate_item import GateItem
 
 
 class LEDGate(GateItem):
-    def __init__(self, x, y, editor, w=80, h=50):
-        super().__init__(x, y, 1, 0, editor, w, h)
+    def __init__(self, x, y, editor, w=80, h=50, gate_id=None):
+        super().__init__(x, y, 1, 0, editor, w, h, gate_id)
 
     def update_graphics(self):
         match self.state:
@@ -15,9 +15,3 @@ class LEDGate(GateItem):
                 self.setBrush(QBrush(Qt.GlobalColor.green))
             case False:
                 self.setBrush(QBrush(Qt.GlobalColor.red))
-
-    def compute_output(self):
-        if len(self.connected_inputs) == 0:
-            return None
-
-        return self.connected_inputs[0].src_gate.state
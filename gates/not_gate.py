@@ -1,44 +1,43 @@
 import math
 
-from PySide6.QtGui import QBrush, QColor, QPainterPath, QPainter, QPen, Qt
-from PySide6.QtWidgets import QGraphicsTextItem
+from PySide6.QtGui import QPainterPath, QPainter
 
-from gate_item import GateItem
+from gate_item import GateItem, GATE_PEN, GATE_BRUSH
 
 
 class NotGate(GateItem):
-    def __init__(self, x, y, editor, w=80, h=50):
-        super().__init__(x, y, math.inf, math.inf, editor, w, h)
+    def __init__(self, x, y, editor, w=80, h=50, gate_id=None):
+        super().__init__(x, y, math.inf, math.inf, editor, w, h, gate_id)
 
-        self.label = QGraphicsTextItem('NOT', parent=self)
-
-    def compute_output(self):
-        if len(self.connected_inputs) == 0:
-            return None
-
-        return not self.connected_inputs[0].src_gate.state
+        self.label = self.add_label('NOT')
 
     def boundingRect(self):
         # Add margin for the circle (output bubble) + pen thickness
         margin = 4
         return self.rect().adjusted(-margin, -margin, margin + 10, margin)
 
-    def paint(self, painter: QPainter, option, widget=None):
-        painter.setPen(QPen(Qt.GlobalColor.black, 2))
-        painter.setBrush(QBrush(Qt.GlobalColor.lightGray))
-
-        w = self.rect().width()
-        h = self.rect().height()
+    def build_path(self, rect):
+        w = rect.width()
+        h = rect.height()
 
         path = QPainterPath()
         path.moveTo(0, 0)
         path.lineTo(w - 10, h / 2)  # triangle tip (before bubble)
         path.lineTo(0, h)
         path.closeSubpath()
+        return path
+
+    def paint(self, painter: QPainter, option, widget=None):
+        if self.paint_simplified(painter, option):
+            return
 
-        painter.drawPath(path)
+        painter.setPen(GATE_PEN)
+        painter.setBrush(GATE_BRUSH)
+        painter.drawPath(self.cached_path())
 
         # Draw inversion bubble
+        w = self.rect().width()
+        h = self.rect().height()
         bubble_radius = 10
         center_x = w - 10 + bubble_radius
         center_y = h / 2
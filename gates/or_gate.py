@@ -1,44 +1,33 @@
 import math
 
 from PySide6.QtCore import Qt
-from PySide6.QtGui import QPainter, QPen, QBrush, QPainterPath
-from PySide6.QtWidgets import QGraphicsTextItem
+from PySide6.QtGui import QPainter, QPen, QPainterPath
 
-from gate_item import GateItem
+from gate_item import GateItem, GATE_BRUSH
 
+# nice rounded strokes
+OR_PEN = QPen(Qt.GlobalColor.black, 2)
+OR_PEN.setCapStyle(Qt.PenCapStyle.RoundCap)
+OR_PEN.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
 
-class OrGate(GateItem):
-    def __init__(self, x, y, editor, w=80, h=50):
-        super().__init__(x, y, math.inf, math.inf, editor, w, h)
-
-        self.label = QGraphicsTextItem('OR', parent=self)
 
-    def compute_output(self):
-        inputs = [t.src_gate.state for t in self.connected_inputs]
+class OrGate(GateItem):
+    def __init__(self, x, y, editor, w=80, h=50, gate_id=None):
+        super().__init__(x, y, math.inf, math.inf, editor, w, h, gate_id)
 
-        if None in inputs or len(inputs) == 0:  # not enough info yet
-            return None
+        self.label = self.add_label('OR')
 
-        return any(inputs)
+    @classmethod
+    def port_offsets(cls, w=80, h=50):
+        return (25, h / 2), (w, h / 2)
 
     def add_input_point(self, h, w):
         super().add_input_point(h, w)
 
         self.input_point.setPos(25, self.input_point.pos().y())
 
-
-    def paint(self, painter: QPainter, option, widget=None):
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
-
-        # nice rounded strokes
-        pen = QPen(Qt.GlobalColor.black, 2)
-        pen.setCapStyle(Qt.PenCapStyle.RoundCap)
-        pen.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
-        painter.setPen(pen)
-        painter.setBrush(QBrush(Qt.GlobalColor.lightGray))
-
-        r = self.rect()
-        x0, y0, w, h = r.x(), r.y(), r.width(), r.height()
+    def build_path(self, rect):
+        x0, y0, w, h = rect.x(), rect.y(), rect.width(), rect.height()
 
         # proportion constants (tweak to taste)
         pad_left = w * 0.12     # inset of the left “start” point
@@ -66,18 +55,17 @@ class OrGate(GateItem):
                      x0 + pad_left,    y0)
 
         path.closeSubpath()
-        painter.drawPath(path)
+        return path
+
+    def paint(self, painter: QPainter, option, widget=None):
+        if self.paint_simplified(painter, option):
+            return
+
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+        painter.setPen(OR_PEN)
+        painter.setBrush(GATE_BRUSH)
+        painter.drawPath(self.cached_path())
 
     # Optional: make selection/hit-test match the drawn shape
     def shape(self):
-        r = self.rect()
-        x0, y0, w, h = r.x(), r.y(), r.width(), r.height()
-        pad_left = w * 0.12
-        c1x, c2x, inner_cx = w * 0.85, w * 0.98, w * 0.40
-        p = QPainterPath()
-        p.moveTo(x0 + pad_left, y0)
-        p.cubicTo(x0 + c1x, y0, x0 + c2x, y0 + h * 0.28, x0 + w, y0 + h * 0.5)
-        p.cubicTo(x0 + c2x, y0 + h * 0.72, x0 + c1x, y0 + h, x0 + pad_left, y0 + h)
-        p.cubicTo(x0 + inner_cx, y0 + h * 0.85, x0 + inner_cx, y0 + h * 0.15, x0 + pad_left, y0)
-        p.closeSubpath()
-        return p
+        return self.cached_path()
@@ -0,0 +1,96 @@
+import math
+
+from PySide6.QtGui import QPainter, Qt
+from PySide6.QtWidgets import QGraphicsEllipseItem
+
+from engine.netlist import TYPE_NAMES
+from engine.subcircuit import DEFINITIONS, DEFINITION_OBSERVERS, PINS, Subcircuit, instantiate
+from gate_item import GateItem, GATE_PEN, GATE_BRUSH
+
+PIN_SPACING = 20
+
+
+class SubcircuitGate(GateItem):
+    """An instance of a subcircuit; the item of its first pin, with a port for every pin."""
+
+    definition: Subcircuit = None  # set on the class generated for each definition
+
+    def __init__(self, x, y, editor, w=80, h=None, gate_id=None):
+        if gate_id is None:
+            gate_id = instantiate(editor.netlist, self.definition, x, y)
+        # Limits are per pin: one wire into an input, any number out of an output
+        super().__init__(x, y, 1, math.inf, editor, w, self.height() if h is None else h, gate_id)
+
+        self.label = self.add_label(self.definition.name)
+
+    @classmethod
+    def height(cls) -> float:
+        return PIN_SPACING * (max(cls.definition.n_inputs, cls.definition.n_outputs, 1) + 1)
+
+    @classmethod
+    def pin_offsets(cls, gate_type: int, w: float = 80):
+        index = PINS[gate_type][1]
+        n_inputs = cls.definition.n_inputs
+        if index < n_inputs:
+            y = cls._pin_y(index, n_inputs)
+        else:
+            y = cls._pin_y(index - n_inputs, cls.definition.n_outputs)
+        return (0, y), (w, y)
+
+    @classmethod
+    def pin_ports(cls, gate_type: int) -> tuple:
+        return ("input",) if PINS[gate_type][1] < cls.definition.n_inputs else ("output",)
+
+    @classmethod
+    def _pin_y(cls, index: int, count: int) -> float:
+        return cls.height() * (index + 1) / (count + 1)
+
+    def pin_ids(self) -> range:
+        return range(self.gate_id, self.gate_id + self.definition.n_pins)
+
+    def add_input_point(self, h, w):
+        n = self.definition.n_inputs
+        self.input_points = [self._add_port(i, 0, self._pin_y(i, n), "input") for i in range(n)]
+        self.input_point = self.input_points[0] if self.input_points else None
+
+    def add_output_point(self, h, w):
+        n_inputs, n = self.definition.n_inputs, self.definition.n_outputs
+        self.output_points = [self._add_port(n_inputs + j, w, self._pin_y(j, n), "output") for j in range(n)]
+        self.output_point = self.output_points[0] if self.output_points else None
+
+    def _add_port(self, index, x, y, kind):
+        port = QGraphicsEllipseItem(x - 5, y - 5, 10, 10, self)
+        port.setBrush(Qt.GlobalColor.blue if kind == "input" else Qt.GlobalColor.red)
+        port.setData(0, kind)
+        port.setData(1, index)  # pin index, the port's gate id relative to gate_id
+        port.parent_gate = self
+        return port
+
+    def port_point(self, gid: int, kind: str):
+        index = gid - self.gate_id
+        if index < self.definition.n_inputs:
+            return self.input_points[index]
+        return self.output_points[index - self.definition.n_inputs]
+
+    def paint(self, painter: QPainter, option, widget=None):
+        if self.paint_simplified(painter, option):
+            return
+
+        painter.setPen(GATE_PEN)
+        painter.setBrush(GATE_BRUSH)
+        painter.drawPath(self.cached_path())
+
+
+def subcircuit_gate_class(definition: Subcircuit) -> type:
+    cls = GateItem.registry.get(definition.name)
+    if cls is None:
+        cls = type(definition.name, (SubcircuitGate,), {'definition': definition})
+        # Pin types name their instance's item class, like gate types name theirs
+        for code in definition.pin_codes:
+            GateItem.registry[TYPE_NAMES[code]] = cls
+    return cls
+
+
+for _definition in DEFINITIONS.values():
+    subcircuit_gate_class(_definition)
+DEFINITION_OBSERVERS.append(subcircuit_gate_class)
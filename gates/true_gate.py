@@ -1,16 +1,11 @@
 import math
 
-from PySide6.QtWidgets import QGraphicsTextItem
-
 from gate_item import GateItem
 
 
 class TrueGate(GateItem):
-    def __init__(self, x, y, editor, w=80, h=50):
-        super().__init__(x, y, 0, math.inf, editor, w, h)
-
+    def __init__(self, x, y, editor, w=80, h=50, gate_id=None):
+        super().__init__(x, y, 0, math.inf, editor, w, h, gate_id)
 
-        self.label = QGraphicsTextItem('TRUE', parent=self)
 
-    def compute_output(self):
-        return True
\ No newline at end of file
+        self.label = self.add_label('TRUE')
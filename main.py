@@ -1,12 +1,25 @@
 import json
+import os
 import sys
 
+from PySide6.QtCore import Qt, QStandardPaths
+from PySide6.QtGui import QActionGroup, QKeySequence
 from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QFileDialog, QMessageBox
+    QApplication, QMainWindow, QFileDialog, QMessageBox, QProgressDialog, QDialog, QDialogButtonBox, QFormLayout,
+    QHBoxLayout, QSpinBox, QDockWidget
 )
 
 from editor import LogicCircuitEditor
+from engine.batch import read_stimuli
+from engine.binary_format import load_any
+from engine.faults import fault_coverage
+from engine.journal import recover
+from engine.json_stream import LoadCancelled
+from engine.subcircuit import define
+from engine.timing import DEFAULT_DELAYS
+from engine.truth_table import primary_inputs, primary_outputs
 from toolbar import Toolbar
+from waveform_panel import WaveformPanel
 
 
 class LogicCircuitSimulatorWindow(QMainWindow):
@@ -19,8 +32,19 @@ class LogicCircuitSimulatorWindow(QMainWindow):
         self.setCentralWidget(self.editor)
 
         self.addToolBar(Toolbar(self.editor))
+
+        self.waveform_dock = QDockWidget("Waveforms", self)
+        self.waveform_dock.setWidget(WaveformPanel(self.editor))
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.waveform_dock)
+        self.waveform_dock.hide()
+
         self._create_menu()
 
+        self.editor.oscillation_detected.connect(self._show_oscillation)
+        self.editor.timing_settled.connect(self._show_timing)
+        self._load_library()
+        self._start_autosave()
+
     def _create_menu(self):
         menubar = self.menuBar()
         file_menu = menubar.addMenu("&File")
@@ -31,10 +55,240 @@ class LogicCircuitSimulatorWindow(QMainWindow):
         import_action = file_menu.addAction("Open")
         import_action.triggered.connect(self.import_from_json)
 
+        subcircuit_action = file_menu.addAction("Import Subcircuit")
+        subcircuit_action.triggered.connect(self.import_subcircuit)
+
+        edit_menu = menubar.addMenu("&Edit")
+
+        undo_action = edit_menu.addAction("Undo")
+        undo_action.setShortcut(QKeySequence.StandardKey.Undo)
+        undo_action.triggered.connect(self.editor.undo)
+
+        redo_action = edit_menu.addAction("Redo")
+        redo_action.setShortcut(QKeySequence.StandardKey.Redo)
+        redo_action.triggered.connect(self.editor.redo)
+
+        view_menu = menubar.addMenu("&View")
+
+        hud_action = view_menu.addAction("Performance HUD")
+        hud_action.setCheckable(True)
+        hud_action.toggled.connect(self.editor.set_hud_visible)
+
+        virtual_action = view_menu.addAction("Virtualized Scene")
+        virtual_action.setCheckable(True)
+        virtual_action.toggled.connect(self.editor.set_virtualized)
+
+        threaded_action = view_menu.addAction("Background Simulation")
+        threaded_action.setCheckable(True)
+        threaded_action.toggled.connect(self.editor.set_threaded)
+
+        mode_menu = view_menu.addMenu("Simulation Mode")
+        mode_group = QActionGroup(self)
+        for label, mode in (("Zero Delay", "event"), ("Optimized", "optimized"), ("Timed", "timed")):
+            mode_action = mode_menu.addAction(label)
+            mode_action.setCheckable(True)
+            mode_action.setChecked(mode == "event")
+            mode_action.triggered.connect(lambda checked, m=mode: self.editor.set_simulation_mode(m))
+            mode_group.addAction(mode_action)
+
+        delays_action = view_menu.addAction("Gate Delays")
+        delays_action.triggered.connect(self.edit_gate_delays)
+
+        faults_action = view_menu.addAction("Fault Coverage")
+        faults_action.triggered.connect(self.fault_coverage)
+
+        profile_action = view_menu.addAction("Export Profile")
+        profile_action.triggered.connect(self.export_profile)
+
+        waveform_menu = menubar.addMenu("&Waveforms")
+        waveform_menu.addAction(self.waveform_dock.toggleViewAction())
+
+        record_io_action = waveform_menu.addAction("Record Inputs and Outputs")
+        record_io_action.triggered.connect(self.record_inputs_and_outputs)
+
+        record_all_action = waveform_menu.addAction("Record All Gates")
+        record_all_action.triggered.connect(lambda: self.start_recording(None))
+
+        stop_action = waveform_menu.addAction("Stop Recording")
+        stop_action.triggered.connect(self.editor.stop_recording)
+
+        vcd_action = waveform_menu.addAction("Export VCD")
+        vcd_action.triggered.connect(self.export_vcd)
+
+    @staticmethod
+    def _data_dir(name):
+        return os.path.join(QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation), name)
+
+    def _load_library(self):
+        # Subcircuits imported in earlier sessions, needed before any design that uses them is opened
+        directory = self._data_dir("subcircuits")
+        if not os.path.isdir(directory):
+            return
+
+        for file_name in sorted(os.listdir(directory)):
+            try:
+                define(os.path.splitext(file_name)[0], load_any(os.path.join(directory, file_name)))
+            except Exception as e:
+                QMessageBox.warning(self, "Subcircuits", f"Could not load subcircuit {file_name}:\n{e}")
+
+    def import_subcircuit(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Import Subcircuit",
+            "",
+            "Circuit Files (*.json *.lcb)"
+        )
+        if not path:
+            return
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            definition = define(name, load_any(path))
+
+            directory = self._data_dir("subcircuits")
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{name}.json"), "w") as f:
+                json.dump(definition.data, f, indent=4)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to import subcircuit:\n{e}")
+
+    def _start_autosave(self):
+        directory = self._data_dir("autosave")
+
+        try:
+            recovered = recover(directory)
+        except Exception as e:
+            recovered = None
+            QMessageBox.warning(self, "Autosave", f"Could not read the autosaved circuit:\n{e}")
+
+        if recovered is not None:
+            answer = QMessageBox.question(self, "Autosave", "Restore the circuit from the last session?")
+            if answer == QMessageBox.StandardButton.Yes:
+                self.editor.load_netlist(recovered)
+
+        # Anything not restored is replaced by the first autosave
+        self.editor.enable_autosave(directory)
+
+    def _show_oscillation(self, gate_ids):
+        self.statusBar().showMessage(f"Circuit does not settle: {len(gate_ids)} gate(s) oscillating", 2000)
+
+    def start_recording(self, gate_ids):
+        self.editor.start_recording(gate_ids)
+        self.waveform_dock.show()
+
+    def record_inputs_and_outputs(self):
+        netlist = self.editor.netlist
+        self.start_recording(primary_inputs(netlist) + primary_outputs(netlist))
+
+    def export_vcd(self):
+        if self.editor.recorder is None:
+            QMessageBox.information(self, "Waveforms", "Nothing is being recorded. Start a recording first.")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Waveforms",
+            "",
+            "VCD Files (*.vcd)"
+        )
+        if not path:
+            return
+
+        try:
+            self.editor.recorder.export_vcd(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save file:\n{e}")
+
+    def _show_timing(self, settle_time, path):
+        self.statusBar().showMessage(
+            f"Settled after {settle_time} time unit(s), critical path through {len(path)} gate(s)", 5000
+        )
+
+    def edit_gate_delays(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Gate Delays")
+        layout = QFormLayout(dialog)
+
+        spin_boxes = {}
+        for name, default in DEFAULT_DELAYS.items():
+            row = QHBoxLayout()
+            boxes = []
+            for label, value in zip(("rise", "fall"), self.editor.gate_delays.get(name, default)):
+                box = QSpinBox(minimum=0, maximum=1000, value=value, suffix=f" {label}")
+                row.addWidget(box)
+                boxes.append(box)
+            spin_boxes[name] = boxes
+            layout.addRow(name, row)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addRow(buttons)
+
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.editor.set_gate_delays({name: (rise.value(), fall.value())
+                                         for name, (rise, fall) in spin_boxes.items()})
+
+    def fault_coverage(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Test Vectors (cancel to try every input combination)",
+            "",
+            "CSV Files (*.csv)"
+        )
+
+        dialog = QProgressDialog("Simulating faults...", "Cancel", 0, 1000, self)
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(500)
+
+        def progress(done, total):
+            dialog.setValue(int(done * 1000 / total) if total else 1000)
+            QApplication.processEvents()
+            return not dialog.wasCanceled()
+
+        try:
+            result = fault_coverage(self.editor.netlist, read_stimuli(path) if path else None, progress=progress)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Fault simulation failed:\n{e}")
+            return
+        finally:
+            dialog.close()
+        if result is None:
+            return
+
+        lines = [f"{result.detected} of {len(result.faults)} stuck-at faults detected by {result.vectors} vector(s) "
+                 f"({result.coverage:.1%})", ""]
+        lines += [f"LED {led}: {detected} of {reachable}" for led, (detected, reachable) in result.outputs.items()]
+
+        box = QMessageBox(QMessageBox.Icon.Information, "Fault Coverage", "\n".join(lines), parent=self)
+        undetected = result.undetected()
+        if undetected:
+            box.setDetailedText("\n".join(f"Gate {gid} stuck at {value}" for gid, value in undetected))
+        box.exec()
+
     def export_to_json(self):
         path, _ = QFileDialog.getSaveFileName(
             self,
-            "Save Circuit as JSON",
+            "Save Circuit",
+            "",
+            "JSON Files (*.json);;Binary Circuit Files (*.lcb)"
+        )
+        if not path:
+            return
+
+        try:
+            self.editor.save_file(path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save file:\n{e}")
+
+    def export_profile(self):
+        if self.editor.profiler is None:
+            QMessageBox.information(self, "Profile", "Profiling is not enabled. Turn on the Performance HUD first.")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Profile as JSON",
             "",
             "JSON Files (*.json)"
         )
@@ -42,32 +296,42 @@ class LogicCircuitSimulatorWindow(QMainWindow):
             return
 
         try:
-            data = self.editor.serialize()
-            with open(path, "w") as f:
-                json.dump(data, f, indent=4)
+            self.editor.profiler.save(path)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save file:\n{e}")
 
     def import_from_json(self):
         path, _ = QFileDialog.getOpenFileName(
             self,
-            "Open Circuit JSON",
+            "Open Circuit",
             "",
-            "JSON Files (*.json)"
+            "Circuit Files (*.json *.lcb)"
         )
         if not path:
             return
 
+        dialog = QProgressDialog("Loading circuit...", "Cancel", 0, 1000, self)
+        dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        dialog.setMinimumDuration(500)
+
+        def progress(done, total):
+            dialog.setValue(int(done * 1000 / total) if total else 1000)
+            QApplication.processEvents()
+            return not dialog.wasCanceled()
+
         try:
-            with open(path, "r") as f:
-                data = json.load(f)
-            self.editor.deserialize(data)
+            self.editor.load_file(path, progress)
+        except LoadCancelled:
+            pass
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load file:\n{e}")
+        finally:
+            dialog.close()
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    app.setApplicationName("Logic Circuit Simulator")
     window = LogicCircuitSimulatorWindow()
 
     window.show()
@@ -0,0 +1,78 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from editor import LogicCircuitEditor
+
+import math
+
+from engine.netlist import TYPE_NAMES
+from engine.spatial import GridIndex
+from gate_item import GateItem
+
+
+class PortIndex:
+    """Scene positions of every input and output port, for hit-testing and snapping.
+
+    Ports are keyed (gate id, "input" or "output") in a GridIndex and placed
+    from the cached pin offsets of their item class, so the index follows the
+    netlist through its observers rather than the Qt items, and covers gates
+    a virtualized scene has no item for.
+    """
+
+    def __init__(self, editor: 'LogicCircuitEditor', cell_size: float = 64.0):
+        self.editor = editor
+        self.netlist = editor.netlist
+        self.ports = GridIndex(cell_size)
+
+        self.rebuild()
+        self.netlist.observers.append(self.on_edit)
+
+    def detach(self):
+        self.netlist.observers.remove(self.on_edit)
+
+    def rebuild(self):
+        self.ports.clear()
+        for gid in self.netlist.gate_ids():
+            self._insert(gid)
+
+    def _insert(self, gid: int):
+        netlist = self.netlist
+        code = netlist.types[gid]
+        cls = GateItem.registry[TYPE_NAMES[code]]
+        offsets = cls.cached_pin_offsets(code)
+        x, y = netlist.xs[gid], netlist.ys[gid]
+        for kind in cls.pin_ports(code):
+            dx, dy = offsets[kind == "output"]
+            self.ports.insert_point((gid, kind), x + dx, y + dy)
+
+    def _remove(self, gid: int):
+        self.ports.remove((gid, "input"))
+        self.ports.remove((gid, "output"))
+
+    def on_edit(self, command: tuple):
+        name = command[0]
+        if name == 'clear':
+            self.ports.clear()
+        elif name == 'add_gate':
+            self._insert(self.netlist.n_gates - 1)
+        elif name in ('move_gate', 'restore_gate'):
+            self._insert(command[1])
+        elif name == 'remove_gate':
+            self._remove(command[1])
+        elif name == 'extend':
+            self.rebuild()
+
+    def position(self, gid: int, kind: str):
+        return self.ports.point((gid, kind))
+
+    def nearest(self, x: float, y: float, radius: float, kind: str = None):
+        """(gate id, kind) of the closest port within radius, optionally only of one kind; None if there is none."""
+        points = self.ports
+
+        def distance(key, px, py):
+            if kind is not None and key[1] != kind:
+                return math.inf
+            qx, qy = points.point(key)
+            return math.hypot(qx - px, qy - py)
+
+        return points.nearest(x, y, radius, distance)
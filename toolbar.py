@@ -2,6 +2,12 @@ import qtawesome
 from PySide6.QtGui import QAction, QActionGroup
 from PySide6.QtWidgets import QToolBar
 
+from engine.bus import bus_type
+from engine.subcircuit import DEFINITIONS, DEFINITION_OBSERVERS
+
+# Width of the bus gates offered; other widths load from files all the same
+BUS_WIDTH = 8
+
 
 class Toolbar(QToolBar):
     def __init__(self, editor):
@@ -9,7 +15,7 @@ class Toolbar(QToolBar):
 
         self.editor = editor
 
-        group = QActionGroup(self)
+        self.group = group = QActionGroup(self)
         group.setExclusive(True)
 
         actions = [
@@ -41,5 +47,33 @@ class Toolbar(QToolBar):
 
             gate.triggered.connect(lambda checked, act=gate.text(): self.set_tool(f'GATE_{act}'))
 
+        self.addSeparator()
+        buses = [
+            (f"BusAnd{BUS_WIDTH}", 'Bus And Gate'),
+            (f"BusOr{BUS_WIDTH}", 'Bus Or Gate'),
+            (f"BusNot{BUS_WIDTH}", 'Bus Not Gate'),
+            (f"Split{BUS_WIDTH}", 'Bus Splitter'),
+            (f"Merge{BUS_WIDTH}", 'Bus Merger'),
+        ]
+
+        for name, tip in buses:
+            bus_type(name)  # registers the types, and through gates.bus_gates their items
+            action = QAction(name, self, checkable=True, whatsThis=tip)
+            group.addAction(action)
+            self.addAction(action)
+            action.triggered.connect(lambda checked, act=name: self.set_tool(f'GATE_{act}'))
+
+        # Subcircuits get an entry each, including ones defined later
+        self.addSeparator()
+        for definition in DEFINITIONS.values():
+            self.add_subcircuit(definition)
+        DEFINITION_OBSERVERS.append(self.add_subcircuit)
+
+    def add_subcircuit(self, definition):
+        action = QAction(definition.name, self, checkable=True, whatsThis='Subcircuit')
+        self.group.addAction(action)
+        self.addAction(action)
+        action.triggered.connect(lambda checked, name=definition.name: self.set_tool(f'GATE_{name}'))
+
     def set_tool(self, object_name):
         self.editor.current_tool = object_name
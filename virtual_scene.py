@@ -0,0 +1,261 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from editor import LogicCircuitEditor
+
+import math
+from collections import Counter, defaultdict
+
+from PySide6.QtCore import QRectF, QLineF
+from PySide6.QtGui import QPen, QBrush, Qt
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+
+from engine.bus import WIDTHS
+from engine.netlist import REMOVED, TYPE_NAMES
+from engine.spatial import GridIndex
+from engine.subcircuit import is_internal_wire, owner
+from gate_item import GateItem
+
+# Extra scene distance materialized around the viewport so short pans don't pop
+MARGIN = 200
+GATE_W, GATE_H = 80, 50
+
+
+class WireLayer(QGraphicsItem):
+    """Draws every wire of a virtualized scene straight from the netlist.
+
+    When zoomed out past the level of detail threshold it draws the gates too,
+    as plain boxes, so no gate items are needed at all.
+    """
+
+    def __init__(self, virtual: 'VirtualScene'):
+        super().__init__()
+        self.virtual = virtual
+        self.pen = QPen(Qt.GlobalColor.black, 2)
+        self.bus_pen = QPen(Qt.GlobalColor.black, 4)
+        self.gate_brush = QBrush(Qt.GlobalColor.lightGray)
+        self.setZValue(-1)
+        self.setAcceptedMouseButtons(Qt.MouseButton.NoButton)
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        return self.virtual.bounds
+
+    def paint(self, painter, option: QStyleOptionGraphicsItem, widget=None):
+        r = option.exposedRect.adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN)
+        virtual = self.virtual
+
+        lines, bus_lines = [], []
+        types = virtual.netlist.types
+        for src, dst in virtual.wires.query(r.left(), r.top(), r.right(), r.bottom()):
+            (bus_lines if types[src] in WIDTHS else lines).append(QLineF(*virtual.wire_line(src, dst)))
+        painter.setPen(self.pen)
+        painter.drawLines(lines)
+        if bus_lines:
+            painter.setPen(self.bus_pen)
+            painter.drawLines(bus_lines)
+
+        if not virtual.editor.show_detail:
+            netlist = virtual.netlist
+            for gid in virtual.gates.query(r.left(), r.top(), r.right(), r.bottom()):
+                painter.fillRect(QRectF(netlist.xs[gid], netlist.ys[gid], GATE_W, GATE_H), self.gate_brush)
+
+
+class VirtualScene:
+    """Keeps Qt items only for the gates around the viewport.
+
+    Gates and wires stay in the netlist and in grid indexes that follow every
+    edit through the netlist's observers. GateItems are created, or recycled
+    from a per-class pool, as gates scroll into view, and wires are painted by
+    a single WireLayer, so the GUI layer scales with what is visible.
+    """
+
+    def __init__(self, editor: 'LogicCircuitEditor', cell_size: float = 256.0):
+        self.editor = editor
+        self.netlist = editor.netlist
+
+        self.gates = GridIndex(cell_size)
+        self.wires = GridIndex(cell_size)
+        self.wire_counts = Counter()  # duplicate wires share one index entry
+        self.pool = defaultdict(list)  # gate class -> detached items
+        self.bounds = QRectF()
+
+        self.layer = WireLayer(self)
+        editor.scene.addItem(self.layer)
+
+        self.rebuild()
+        self.netlist.observers.append(self.on_edit)
+
+    def detach(self):
+        self.netlist.observers.remove(self.on_edit)
+        for gid in list(self.editor.gate_items):
+            self.release(gid)
+        self.editor.scene.removeItem(self.layer)
+        self.pool.clear()
+
+    # Index maintenance
+
+    def rebuild(self):
+        netlist = self.netlist
+        self.gates.clear()
+        self.wires.clear()
+        self.wire_counts.clear()
+
+        for gid in netlist.gate_ids():
+            self.gates.insert_point(gid, netlist.xs[gid], netlist.ys[gid])
+        for src, dst in zip(netlist.wire_src, netlist.wire_dst):
+            self._index_wire(src, dst)
+
+        self._update_bounds()
+
+    def _update_bounds(self):
+        netlist = self.netlist
+        ids = [gid for gid in netlist.gate_ids()]
+        if not ids:
+            self._set_bounds(QRectF())
+            return
+
+        xs = [netlist.xs[gid] for gid in ids]
+        ys = [netlist.ys[gid] for gid in ids]
+        self._set_bounds(QRectF(min(xs), min(ys), max(xs) - min(xs) + GATE_W, max(ys) - min(ys) + GATE_H))
+
+    def _grow_bounds(self, x: float, y: float):
+        gate_rect = QRectF(x, y, GATE_W, GATE_H)
+        if not self.bounds.contains(gate_rect):
+            self._set_bounds(self.bounds.united(gate_rect) if not self.bounds.isNull() else gate_rect)
+
+    def _set_bounds(self, bounds: QRectF):
+        self.layer.prepareGeometryChange()
+        self.bounds = bounds.adjusted(-MARGIN, -MARGIN, MARGIN, MARGIN)
+        self.editor.scene.setSceneRect(self.bounds)
+
+    def _index_wire(self, src: int, dst: int):
+        if is_internal_wire(self.netlist, src, dst):
+            return
+        self.wire_counts[src, dst] += 1
+        self.wires.insert_segment((src, dst), *self.wire_line(src, dst))
+
+    def _reindex_wires_of(self, gid: int):
+        netlist = self.netlist
+        for src in netlist.fanin(gid):
+            if (src, gid) in self.wire_counts:
+                self.wires.insert_segment((src, gid), *self.wire_line(src, gid))
+        for dst in netlist.fanout(gid):
+            if (gid, dst) in self.wire_counts:
+                self.wires.insert_segment((gid, dst), *self.wire_line(gid, dst))
+
+    def on_edit(self, command: tuple):
+        name = command[0]
+        netlist = self.netlist
+
+        if name == 'clear':
+            for gid in list(self.editor.gate_items):
+                self.release(gid)
+            self.gates.clear()
+            self.wires.clear()
+            self.wire_counts.clear()
+        elif name == 'add_gate':
+            gid = netlist.n_gates - 1
+            self.gates.insert_point(gid, netlist.xs[gid], netlist.ys[gid])
+            self._grow_bounds(netlist.xs[gid], netlist.ys[gid])
+        elif name == 'move_gate':
+            _, gid, x, y = command
+            self.gates.insert_point(gid, x, y)
+            self._reindex_wires_of(gid)
+            self._grow_bounds(x, y)
+        elif name == 'remove_gate':
+            # Its wires were already reported as removed
+            gid = command[1]
+            self.gates.remove(gid)
+            if gid in self.editor.gate_items:  # removed by undo rather than through its item
+                self.release(gid)
+        elif name == 'restore_gate':
+            _, gid, _, x, y = command
+            self.gates.insert_point(gid, x, y)
+            self._grow_bounds(x, y)
+            self.refresh()
+        elif name == 'add_wire':
+            self._index_wire(command[1], command[2])
+        elif name == 'remove_wire':
+            key = (command[1], command[2])
+            if key in self.wire_counts:  # otherwise a subcircuit's internal wire
+                self.wire_counts[key] -= 1
+                if self.wire_counts[key] <= 0:
+                    del self.wire_counts[key]
+                    self.wires.remove(key)
+        elif name == 'extend':
+            # Bulk load: index everything once
+            self.rebuild()
+            self.refresh()
+
+        self.layer.update()
+
+    # Geometry
+
+    def wire_line(self, src: int, dst: int):
+        netlist = self.netlist
+        src_type, dst_type = netlist.types[src], netlist.types[dst]
+        _, (out_x, out_y) = GateItem.registry[TYPE_NAMES[src_type]].cached_pin_offsets(src_type)
+        (in_x, in_y), _ = GateItem.registry[TYPE_NAMES[dst_type]].cached_pin_offsets(dst_type)
+        return netlist.xs[src] + out_x, netlist.ys[src] + out_y, netlist.xs[dst] + in_x, netlist.ys[dst] + in_y
+
+    def wire_at(self, x: float, y: float, radius: float = 5.0):
+        def distance(key, px, py):
+            x1, y1, x2, y2 = self.wire_line(*key)
+            dx, dy = x2 - x1, y2 - y1
+            length = dx * dx + dy * dy
+            t = 0.0 if not length else max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length))
+            return math.hypot(x1 + t * dx - px, y1 + t * dy - py)
+
+        return self.wires.nearest(x, y, radius, distance)
+
+    # Materialization
+
+    def refresh(self):
+        editor = self.editor
+        editor.flush_moves()  # items about to be recycled still owe the netlist their position
+        if not editor.show_detail:
+            # Zoomed out: the layer draws everything, keep no items around
+            for gid in list(editor.gate_items):
+                self.release(gid)
+            self.layer.update()
+            return
+
+        visible = editor.mapToScene(editor.viewport().rect()).boundingRect()
+        r = visible.adjusted(-MARGIN - GATE_W, -MARGIN - GATE_H, MARGIN, MARGIN)
+        netlist = self.netlist
+        wanted = {owner(netlist, gid) for gid in self.gates.query(r.left(), r.top(), r.right(), r.bottom())}
+
+        for gid in [gid for gid in editor.gate_items if gid not in wanted]:
+            self.release(gid)
+        for gid in wanted:
+            if gid not in editor.gate_items and self.netlist.types[gid] != REMOVED:
+                self.acquire(gid)
+
+    def acquire(self, gid: int) -> GateItem:
+        editor = self.editor
+        netlist = self.netlist
+        cls = GateItem.registry[netlist.type_name(gid)]
+
+        pool = self.pool[cls]
+        if pool:
+            item = pool.pop()
+            item.bind(gid)
+        else:
+            item = cls(netlist.xs[gid], netlist.ys[gid], editor, gate_id=gid)
+        if item.label is not None:
+            item.label.setVisible(editor.show_detail)
+
+        editor.gates.append(item)
+        editor.scene.addItem(item)
+        return item
+
+    def release(self, gid: int):
+        editor = self.editor
+        item = editor.gate_items.pop(gid)
+        if editor.pending_endpoint and editor.pending_endpoint[0] is item:
+            editor._handle_wiring_event_cancel()
+        editor.gates.remove(item)
+        item.setSelected(False)
+        editor.scene.removeItem(item)
+        self.pool[type(item)].append(item)
@@ -0,0 +1,113 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from editor import LogicCircuitEditor
+
+from collections import deque
+
+from PySide6.QtCore import QTimer, QPointF
+from PySide6.QtGui import QPainter, QPen, QColor, QFont, Qt
+from PySide6.QtWidgets import QWidget
+
+from engine.netlist import HIGH, LOW
+from engine.waveform import signal_name
+
+ROW_HEIGHT = 24
+LABEL_WIDTH = 130
+MAX_ROWS = 32
+
+HIGH_PEN = QPen(QColor(40, 180, 40), 1.5)
+LOW_PEN = QPen(QColor(40, 120, 40), 1.5)
+UNKNOWN_PEN = QPen(QColor(200, 60, 60), 1.5)
+
+
+class WaveformPanel(QWidget):
+    """Traces of the last `span` time units for the first MAX_ROWS gates being recorded.
+
+    The panel polls the editor's recorder for new changes a few times a second
+    and keeps its own short history per row, so painting never walks the
+    recorder's whole buffer.
+    """
+
+    def __init__(self, editor: 'LogicCircuitEditor', span: int = 200):
+        super().__init__()
+        self.editor = editor
+        self.span = span
+        self.setMinimumHeight(ROW_HEIGHT * 4)
+
+        self.recorder = None
+        self.rows = []
+        self.history = {}  # gate id -> deque of (time, value), oldest first
+        self._seen = 0
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start(100)
+
+    def _attach(self, recorder):
+        self.recorder = recorder
+        self.rows = recorder.gates[:MAX_ROWS] if recorder is not None else []
+        self.history = {gid: deque([(recorder.start_time, recorder.baseline[gid])]) for gid in self.rows}
+        self._seen = 0
+        self.setMinimumHeight(ROW_HEIGHT * max(4, len(self.rows)))
+
+    def poll(self):
+        recorder = self.editor.recorder
+        if recorder is not self.recorder:
+            self._attach(recorder)
+        if recorder is None or not self.isVisible() or self._seen == recorder.total:
+            return
+
+        self._seen, changes = recorder.read(self._seen)
+        history = self.history
+        for time, gid, value in changes:
+            trace = history.get(gid)
+            if trace is not None:
+                trace.append((time, value))
+
+        # Keep one change from before the window so every trace has a starting value
+        start = recorder.time - self.span
+        for trace in history.values():
+            while len(trace) > 1 and trace[1][0] <= start:
+                trace.popleft()
+
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.GlobalColor.black)
+        if self.recorder is None:
+            painter.setPen(Qt.GlobalColor.gray)
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Not recording")
+            return
+
+        painter.setFont(QFont("monospace", 8))
+        netlist = self.editor.netlist
+        end = self.recorder.time
+        start = end - self.span
+        scale = (self.width() - LABEL_WIDTH - 8) / self.span
+
+        def x_of(t):
+            return LABEL_WIDTH + (max(t, start) - start) * scale
+
+        for row, gid in enumerate(self.rows):
+            top = row * ROW_HEIGHT
+            high, low = top + 4, top + ROW_HEIGHT - 4
+            painter.setPen(Qt.GlobalColor.gray)
+            painter.drawText(4, top + ROW_HEIGHT - 8, signal_name(netlist, gid))
+
+            trace = self.history[gid]
+            for i, (t, value) in enumerate(trace):
+                t_next = trace[i + 1][0] if i + 1 < len(trace) else end
+                x0, x1 = x_of(t), x_of(t_next)
+                if value == HIGH:
+                    painter.setPen(HIGH_PEN)
+                    painter.drawLine(QPointF(x0, high), QPointF(x1, high))
+                elif value == LOW:
+                    painter.setPen(LOW_PEN)
+                    painter.drawLine(QPointF(x0, low), QPointF(x1, low))
+                else:
+                    painter.setPen(UNKNOWN_PEN)
+                    painter.drawLine(QPointF(x0, (high + low) / 2), QPointF(x1, (high + low) / 2))
+                if i + 1 < len(trace):
+                    painter.drawLine(QPointF(x1, high), QPointF(x1, low))
@@ -8,31 +8,45 @@ if TYPE_CHECKING:
 from PySide6.QtGui import QPen, Qt
 from PySide6.QtWidgets import QGraphicsLineItem
 
+from engine.bus import is_bus
+
+WIRE_PEN = QPen(Qt.GlobalColor.black, 2)
+BUS_WIRE_PEN = QPen(Qt.GlobalColor.black, 4)
+
 
 class WireItem(QGraphicsLineItem):
-    def __init__(self, src_gate: 'GateItem', dst_gate: 'GateItem', editor: 'LogicCircuitEditor'):
+    def __init__(self, src_gate: 'GateItem', dst_gate: 'GateItem', editor: 'LogicCircuitEditor', mirror: bool = False,
+                 src_id: int = None, dst_id: int = None):
         super().__init__()
 
         self.editor = editor
 
         self.src_gate = src_gate
         self.dst_gate = dst_gate
-        self.setPen(QPen(Qt.GlobalColor.black, 2))
+        # Netlist gates at the two ends; they differ from the items' gate_id for subcircuit pins
+        self.src_id = src_gate.gate_id if src_id is None else src_id
+        self.dst_id = dst_gate.gate_id if dst_id is None else dst_id
+        self.setPen(BUS_WIRE_PEN if is_bus(editor.netlist, self.src_id) else WIRE_PEN)
 
         src_gate.connected_outputs.append(self)
         dst_gate.connected_inputs.append(self)
+        if not mirror:  # otherwise the wire is already in the netlist
+            editor.netlist.add_wire(self.src_id, self.dst_id)
         self.update_position()
         self.setZValue(-1)
 
     def update_position(self):
-        p1 = self.src_gate.output_point.sceneBoundingRect().center()
-        p2 = self.dst_gate.input_point.sceneBoundingRect().center()
-        self.setLine(p1.x(), p1.y(), p2.x(), p2.y())
+        x1, y1 = self.src_gate.port_pos(self.src_id, "output")
+        x2, y2 = self.dst_gate.port_pos(self.dst_id, "input")
+        self.setLine(x1, y1, x2, y2)
 
     def remove(self):
         self.src_gate.connected_outputs.remove(self)
         self.dst_gate.connected_inputs.remove(self)
+        with self.editor.journal.action():
+            self.editor.netlist.remove_wire(self.src_id, self.dst_id)
         self.scene().removeItem(self)
+        self.editor.wake_simulation()
 
     def mousePressEvent(self, event : 'QGraphicsSceneMouseEvent', /):
         if self.editor.current_tool == "Wire Cutter":